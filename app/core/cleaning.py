@@ -1,7 +1,26 @@
 from __future__ import annotations
 
+import math
 import re
-from typing import Any, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .response_matrix import ResponseMatrix
+
+# Normallashtirilgan kodlar (int8): 0/1 — javob, MISSING — bo'sh/NA,
+# INVALID — qiymat bor, lekin 0/1 emas (ism, jami ball va h.k.)
+MISSING = -1
+INVALID = -2
+
+_NA_TOKENS = {"na", "null", "none", "nan", "bo'sh", "bosh"}
+
+# Ustunlar rolini aniqlash uchun tanlanma: boshidagi qatorlar + qolgan qismdan qatlamli tasodifiy qatorlar
+DETECTION_SAMPLE_ROWS = 20_000
+DETECTION_HEAD_ROWS = 2_000
 
 # ---------- Normalization ----------
 
@@ -47,6 +66,93 @@ def _normalize_cell(value: Any) -> Optional[int]:
         return None
 
 
+def _cell_code(value: Any) -> int:
+    norm = _normalize_cell(value)
+    if norm is not None:
+        return norm
+    if value is None or (isinstance(value, float) and value != value):
+        return MISSING
+    if isinstance(value, str) and (not value.strip() or value.strip().lower() in _NA_TOKENS):
+        return MISSING
+    return INVALID
+
+
+def _is_blank(value: Any) -> bool:
+    # Oldingi "bo'sh qator" qoidasi: str(c).strip() == "" (None -> "None" bo'sh emas)
+    return not str(value).strip()
+
+
+def encode_matrix(
+    matrix: Sequence[Sequence[Any]],
+    columns: Optional[Sequence[int]] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Barcha yacheykalarni bir marta normallashtiradi: (kodlar int8 (n, k), bo'sh yacheykalar,
+    haqiqiy yacheykalar — qisqa qatorlar to'ldirilgan joylar False).
+
+    Har bir noyob qiymat uchun _normalize_cell bir marta chaqiriladi (pd.factorize).
+    columns berilsa faqat shu ustunlar (shu tartibda) kodlanadi.
+    """
+    lengths = np.fromiter((len(row) for row in matrix), dtype=np.int64, count=len(matrix))
+    if columns is not None:
+        positions = np.asarray(columns, dtype=np.int64)
+        matrix = _take_columns(matrix, columns)
+    else:
+        positions = np.arange(int(lengths.max()) if lengths.size else 0)
+    n_cols = len(positions)
+    present = positions[None, :] < lengths[:, None]
+    if n_cols == 0:
+        empty = np.zeros((len(matrix), 0), dtype=bool)
+        return np.zeros((len(matrix), 0), dtype=np.int8), empty, empty
+
+    values = pd.DataFrame(list(matrix), columns=range(n_cols), dtype=object).to_numpy(dtype=object)
+    codes_flat, uniques = pd.factorize(values.ravel(), use_na_sentinel=True)
+    unique_codes = np.fromiter((_cell_code(u) for u in uniques), dtype=np.int8, count=len(uniques))
+    unique_blank = np.fromiter((_is_blank(u) for u in uniques), dtype=bool, count=len(uniques))
+
+    # factorize NA (None/NaN) ni -1 bilan belgilaydi: oxiriga MISSING / "bo'sh emas" qo'shamiz
+    unique_codes = np.append(unique_codes, np.int8(MISSING))
+    unique_blank = np.append(unique_blank, False)
+    codes = unique_codes[codes_flat].reshape(values.shape)
+    blank = unique_blank[codes_flat].reshape(values.shape)
+    codes[~present] = MISSING
+    return codes, blank & present, present
+
+
+def _take_columns(matrix: Sequence[Sequence[Any]], columns: Sequence[int]) -> List[Sequence[Any]]:
+    # Faqat kerakli ustunlar; qisqa qatorlar None bilan to'ldiriladi
+    width = max(columns) + 1
+    getter = itemgetter(*columns)
+    if len(columns) == 1:
+        getter = (lambda g: lambda row: (g(row),))(getter)
+    return [
+        getter(row) if len(row) >= width else getter(list(row) + [None] * (width - len(row)))
+        for row in matrix
+    ]
+
+
+def column_codes(values: np.ndarray) -> np.ndarray:
+    """
+    Bitta ustun (yoki istalgan massiv) uchun int8 kodlar. bool/butun/haqiqiy turlarda vektorli
+    (_normalize_cell qoidalari bilan bir xil: haqiqiy son butun qismigacha qisqartiriladi),
+    boshqa turlarda har bir noyob qiymat bir marta tahlil qilinadi.
+    """
+    kind = values.dtype.kind
+    if kind == "b":
+        return values.astype(np.int8)
+    if kind in "iu":
+        return np.where((values == 0) | (values == 1), values, INVALID).astype(np.int8)
+    if kind == "f":
+        with np.errstate(invalid="ignore"):
+            whole = np.trunc(values)
+        codes = np.where((whole == 0) | (whole == 1), whole, INVALID).astype(np.int8)
+        codes[np.isnan(values)] = MISSING
+        return codes
+    flat, uniques = pd.factorize(values.ravel(), use_na_sentinel=True)
+    lookup = np.fromiter((_cell_code(u) for u in uniques), dtype=np.int8, count=len(uniques))
+    return np.append(lookup, np.int8(MISSING))[flat].reshape(values.shape)
+
+
 # ---------- Heuristics for column roles ----------
 
 HEADER_LABEL_TOKENS = {
@@ -81,14 +187,6 @@ def _looks_like_label_header(text: str) -> bool:
     return any(tok in t.split() for tok in HEADER_LABEL_TOKENS)
 
 
-def _binary_ratio(values: Sequence[Optional[int]]) -> float:
-    non_missing = [v for v in values if v is not None]
-    if not non_missing:
-        return 0.0
-    bin_count = sum(1 for v in non_missing if v in (0, 1))
-    return bin_count / len(non_missing)
-
-
 def _pick_best_block(candidate_cols: List[int], target_min: int = 35, target_max: int = 55) -> List[int]:
     if not candidate_cols:
         return []
@@ -123,18 +221,16 @@ def _pick_best_block(candidate_cols: List[int], target_min: int = 35, target_max
     return best
 
 
-def infer_question_columns(rows: List[List[Any]], min_binary_ratio: float = 0.85) -> List[int]:
-    if not rows:
-        return []
-    # ensure rectangular snapshot for detection
-    max_len = max(len(r) for r in rows)
-    padded = [r + [None] * (max_len - len(r)) for r in rows]
+def column_binary_ratios(codes: np.ndarray) -> np.ndarray:
+    """Har bir ustun uchun 0/1 qiymatlar ulushi (bo'sh yacheykalarsiz) — bitta reduksiya"""
+    binary = (codes >= 0).sum(axis=0)
+    non_missing = (codes != MISSING).sum(axis=0)
+    return np.divide(binary, non_missing, out=np.zeros(codes.shape[1]), where=non_missing > 0)
 
-    header = padded[0]
-    col_count = len(header)
 
-    # Normalize grid
-    norm_grid: List[List[Optional[int]]] = [[_normalize_cell(v) for v in r] for r in padded]
+def _infer_from_codes(header: Sequence[Any], codes: np.ndarray, min_binary_ratio: float) -> List[int]:
+    col_count = codes.shape[1]
+    header = list(header) + [None] * (col_count - len(header))
 
     label_by_header = [False] * col_count
     question_by_header = [False] * col_count
@@ -147,8 +243,8 @@ def infer_question_columns(rows: List[List[Any]], min_binary_ratio: float = 0.85
             if _looks_like_question_header(hv):
                 question_by_header[j] = True
 
-    # ratios
-    ratios = [_binary_ratio([row[j] for row in norm_grid[1:]]) for j in range(col_count)]
+    # ratios (codes — sarlavha qatorisiz ma'lumotlar)
+    ratios = column_binary_ratios(codes)
 
     candidate_cols: List[int] = []
     for j in range(col_count):
@@ -177,36 +273,267 @@ def infer_question_columns(rows: List[List[Any]], min_binary_ratio: float = 0.85
     return picked
 
 
-def clean_response_matrix(
-    matrix: List[List[Any]],
+def infer_question_columns(rows: List[List[Any]], min_binary_ratio: float = 0.85) -> List[int]:
+    if not rows:
+        return []
+    codes, _, _ = encode_matrix(rows)
+    return _infer_from_codes(rows[0], codes[1:], min_binary_ratio)
+
+
+@dataclass
+class ColumnDetection:
+    """Savol ustunlarini aniqlash natijasi (tanlanma bo'yicha)"""
+
+    question_columns: List[int]
+    labels: List[str]
+    confidence: float
+    header_row: int
+    sample_rows: int
+    total_rows: int
+    ratios: List[float] = field(default_factory=list)
+
+    @property
+    def sampled(self) -> bool:
+        return self.sample_rows < self.total_rows
+
+    def describe(self, max_labels: int = 6) -> str:
+        """Foydalanuvchi uchun qisqa tavsif: "Q1 … Q40 (40 ta), ishonch 98%" """
+        labels = self.labels
+        if len(labels) > max_labels:
+            shown = f"{labels[0]} … {labels[-1]}"
+        else:
+            shown = ", ".join(labels)
+        return f"{shown} ({len(labels)} ta), ishonch {self.confidence:.0%}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "question_columns": list(self.question_columns),
+            "labels": list(self.labels),
+            "confidence": self.confidence,
+            "header_row": self.header_row,
+            "sample_rows": self.sample_rows,
+            "total_rows": self.total_rows,
+        }
+
+
+def _first_nonblank_row(matrix: Sequence[Sequence[Any]]) -> Optional[int]:
+    for i, row in enumerate(matrix):
+        if not all(_is_blank(c) for c in row):
+            return i
+    return None
+
+
+def _sample_indices(start: int, stop: int, sample_rows: int, head_rows: int, seed: int) -> np.ndarray:
+    """[start, stop) oralig'idan boshidagi head_rows qator + teng qatlamlardan bittadan tasodifiy qator"""
+    total = stop - start
+    if total <= sample_rows:
+        return np.arange(start, stop)
+    head = min(head_rows, sample_rows)
+    n_random = sample_rows - head
+    rest = start + head
+    if n_random <= 0:
+        return np.arange(start, rest)
+    edges = np.linspace(rest, stop, n_random + 1).astype(np.int64)
+    rng = np.random.default_rng(seed)
+    picks = edges[:-1] + (rng.random(n_random) * np.diff(edges)).astype(np.int64)
+    return np.concatenate([np.arange(start, rest), np.unique(picks)])
+
+
+def _detection_confidence(codes: np.ndarray, picked: List[int], candidates: List[int]) -> float:
+    """
+    Ishonch: tanlangan ustunlardagi 0/1 ulushining Wilson quyi chegarasi (95%), tanlangan
+    blokdan tashqarida qolgan "savolga o'xshash" ustunlar ulushiga kamaytiriladi.
+    """
+    if not picked:
+        return 0.0
+    block = codes[:, picked]
+    answered = int((block != MISSING).sum())
+    if answered == 0:
+        return 0.0
+    p = int((block >= 0).sum()) / answered
+    z2 = 1.96 ** 2
+    lower = (p + z2 / (2 * answered) - math.sqrt(z2 * (p * (1 - p) / answered + z2 / (4 * answered ** 2)))) / (
+        1 + z2 / answered
+    )
+    left_out = len(set(candidates) - set(picked))
+    return round(max(0.0, lower) * len(picked) / (len(picked) + left_out), 3)
+
+
+def _column_labels(header: Sequence[Any], header_codes: np.ndarray, columns: List[int]) -> List[str]:
+    # Sarlavha o'rniga ma'lumot qatori bo'lsa (0/1) ustun tartib raqami ishlatiladi
+    labels = []
+    for j in columns:
+        value = header[j] if j < len(header) else None
+        if header_codes[j] < 0 and value is not None and str(value).strip():
+            labels.append(str(value).strip())
+        else:
+            labels.append(f"{j + 1}-ustun")
+    return labels
+
+
+def detect_question_columns(
+    matrix: Sequence[Sequence[Any]],
+    min_binary_ratio: float = 0.85,
+    sample_rows: int = DETECTION_SAMPLE_ROWS,
+    head_rows: int = DETECTION_HEAD_ROWS,
+    seed: int = 0,
+) -> ColumnDetection:
+    """
+    Ustunlar rolini cheklangan tanlanma bo'yicha aniqlash: sarlavha, boshidagi head_rows qator va
+    fayl bo'ylab teng qatlamlardan tasodifiy qatorlar (jami sample_rows dan oshmaydi).
+    Kichik fayllarda tanlanma — butun fayl, natija infer_question_columns bilan bir xil.
+    """
+    total = len(matrix)
+    header_row = _first_nonblank_row(matrix) if total else None
+    if header_row is None:
+        return ColumnDetection([], [], 0.0, -1, 0, total)
+
+    index = _sample_indices(header_row + 1, total, sample_rows, head_rows, seed)
+    return detect_from_sample(
+        matrix[header_row],
+        [matrix[int(i)] for i in index],
+        header_row,
+        total - header_row - 1,
+        min_binary_ratio,
+    )
+
+
+def detect_from_sample(
+    header: Sequence[Any],
+    sample: Sequence[Sequence[Any]],
+    header_row: int,
+    total_rows: int,
+    min_binary_ratio: float = 0.85,
+) -> ColumnDetection:
+    """Tayyor tanlanma (sarlavhadan keyingi qatorlar) bo'yicha aniqlash — masalan, oqimli o'qishda"""
+    codes, _, _ = encode_matrix([header, *sample])
+    return _detect(header, codes[0], codes[1:], header_row, total_rows, len(sample), min_binary_ratio)
+
+
+def detect_from_codes(
+    header: Sequence[Any],
+    codes: np.ndarray,
+    min_binary_ratio: float = 0.85,
+) -> ColumnDetection:
+    """Ustunli formatlar (Parquet/Arrow/.npy): ustun nomlari sarlavha, codes — barcha qatorlar kodlari"""
+    header = list(header)
+    header_codes = column_codes(np.array(header, dtype=object)) if header else np.zeros(0, np.int8)
+    header_codes = np.concatenate([header_codes, np.full(codes.shape[1] - len(header), MISSING, np.int8)])
+    return _detect(header, header_codes, codes, -1, codes.shape[0], codes.shape[0], min_binary_ratio)
+
+
+def _detect(
+    header: Sequence[Any],
+    header_codes: np.ndarray,
+    codes: np.ndarray,
+    header_row: int,
+    total_rows: int,
+    sample_rows: int,
+    min_binary_ratio: float,
+) -> ColumnDetection:
+    picked = _infer_from_codes(header, codes, min_binary_ratio)
+
+    ratios = column_binary_ratios(codes)
+    candidates = [
+        j for j in range(codes.shape[1])
+        if ratios[j] >= min_binary_ratio
+        and not (j < len(header) and isinstance(header[j], str) and _looks_like_label_header(header[j]))
+    ]
+    return ColumnDetection(
+        question_columns=picked,
+        labels=_column_labels(header, header_codes, picked),
+        confidence=_detection_confidence(codes, picked, candidates),
+        header_row=header_row,
+        sample_rows=sample_rows,
+        total_rows=total_rows,
+        ratios=[round(float(ratios[j]), 4) for j in picked],
+    )
+
+
+def clean_response_codes(
+    matrix: Sequence[Sequence[Any]],
     fill_missing: Optional[int] = None,
-) -> List[List[Optional[int]]]:
+    detection: Optional[ColumnDetection] = None,
+) -> np.ndarray:
+    """
+    Tozalangan javoblar int8 massiv ko'rinishida (0/1, berilmagan — MISSING).
+
+    Savol ustunlari tanlanma bo'yicha aniqlanadi (detection berilmasa detect_question_columns),
+    so'ng butun fayl bo'ylab faqat shu ustunlar bir marta normallashtiriladi.
+    """
     if not matrix:
-        return []
+        return np.zeros((0, 0), dtype=np.int8)
+    if detection is None:
+        detection = detect_question_columns(matrix)
+    if detection.header_row < 0:
+        return np.zeros((0, 0), dtype=np.int8)
 
-    # drop completely empty rows early
-    raw = [list(row) for row in matrix if any(str(c).strip() for c in row)]
-    if not raw:
-        return []
+    # Savollar aniqlanmasa barcha ustunlar olinadi
+    qcols = detection.question_columns or list(range(max(len(row) for row in matrix)))
+    rows = matrix[detection.header_row :] if detection.header_row else matrix
+    return clean_chunk_codes(rows, qcols, fill_missing)
 
-    # infer question columns
-    qcols = infer_question_columns(raw)
 
-    # Normalize and select only question columns
-    cleaned: List[List[Optional[int]]] = []
-    for row in raw:
-        norm_row = [_normalize_cell(v) for v in row]
-        # pad
-        if len(norm_row) < (max(qcols) + 1 if qcols else 0):
-            norm_row += [None] * ((max(qcols) + 1) - len(norm_row))
-        selected = [norm_row[j] for j in qcols] if qcols else norm_row
-        cleaned.append(selected)
+def clean_chunk_codes(
+    rows: Sequence[Sequence[Any]],
+    question_columns: Sequence[int],
+    fill_missing: Optional[int] = None,
+) -> np.ndarray:
+    """Qatorlar bo'lagidan faqat savol ustunlarini kodlash; javobsiz qatorlar tashlanadi"""
+    selected, _, _ = encode_matrix(rows, question_columns)
+    return finish_codes(selected, fill_missing)
+
 
-    # drop rows with no 0/1
-    cleaned = [r for r in cleaned if any(v in (0, 1) for v in r)]
+def finish_codes(selected: np.ndarray, fill_missing: Optional[int] = None) -> np.ndarray:
+    """Savol ustunlari kodlari: javobsiz qatorlar tashlanadi, INVALID -> MISSING, ixtiyoriy to'ldirish"""
+    # drop rows with no 0/1 (bo'sh qatorlar ham shu yerda tushib qoladi)
+    answered = (selected >= 0).any(axis=1)
+    if not answered.all():
+        selected = selected[answered]
 
+    selected = np.where(selected >= 0, selected, np.int8(MISSING)).astype(np.int8, copy=False)
     # optional fill
     if fill_missing in (0, 1):
-        cleaned = [[(fill_missing if v is None else v) for v in r] for r in cleaned]
+        selected = np.where(selected == MISSING, np.int8(fill_missing), selected)
+    return selected
+
+
+def codes_to_rows(codes: np.ndarray) -> List[List[Optional[int]]]:
+    rows = codes.astype(object)
+    rows[codes < 0] = None
+    return rows.tolist()
+
+
+def _codes_to_compact(codes: np.ndarray) -> ResponseMatrix:
+    observed = codes >= 0
+    return ResponseMatrix(
+        np.packbits(codes == 1, axis=1),
+        np.packbits(observed, axis=1),
+        codes.shape[1],
+    )
+
+
+def _clean_compact(matrix: ResponseMatrix, fill_missing: Optional[int]) -> ResponseMatrix:
+    # ResponseMatrix allaqachon 0/1: faqat javobsiz qatorlar tashlanadi va to'ldiriladi
+    answered = matrix.n_observed() > 0
+    if not answered.all():
+        matrix = matrix.select_rows(answered)
+    if fill_missing in (0, 1):
+        matrix = matrix.fill_missing(fill_missing)
+    return matrix
+
+
+def clean_response_matrix(
+    matrix: Union[List[List[Any]], ResponseMatrix],
+    fill_missing: Optional[int] = None,
+    compact: bool = False,
+    detection: Optional[ColumnDetection] = None,
+) -> Union[List[List[Optional[int]]], ResponseMatrix]:
+    """compact=True yoki ResponseMatrix kiritilsa natija bitlarga joylangan ResponseMatrix"""
+    if isinstance(matrix, ResponseMatrix):
+        return _clean_compact(matrix, fill_missing)
+    codes = clean_response_codes(matrix or [], fill_missing, detection)
+    if compact:
+        return _codes_to_compact(codes)
+    return codes_to_rows(codes)
 
-    return cleaned
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Union
+
+import numpy as np
+from scipy import sparse
+
+from .estimation import add_fit_statistics, as_float_matrix, estimate_rasch, score_anchored
+from .response_matrix import ResponseMatrix
+from .result_cache import get_result_cache, matrix_key
+from .r_pool import get_pool
+from .r_runner import run_rasch_model, write_matrix_csv
+
+# "r" — Rscript + ltm::rasch (asl natijalar bilan moslik uchun),
+# "numpy" — jarayon ichidagi CML/EAP baholash (subprocess va CSV siz)
+ENGINES = ("r", "numpy")
+DEFAULT_ENGINE = os.getenv("RASCH_ENGINE", "r").strip().lower() or "r"
+
+
+def resolve_engine(engine: Optional[str]) -> str:
+    name = (engine or DEFAULT_ENGINE).strip().lower()
+    if name not in ENGINES:
+        raise ValueError(f"Noma'lum engine: {engine}. Mumkin qiymatlar: {', '.join(ENGINES)}")
+    return name
+
+
+def run_engine(
+    matrix: Union[List[List[Optional[int]]], sparse.spmatrix, ResponseMatrix],
+    engine: Optional[str] = None,
+    anchors: Optional[Sequence[float]] = None,
+    discrimination: Optional[float] = None,
+) -> dict[str, Any]:
+    name = resolve_engine(engine)
+    # Bir xil matritsa va parametrlar uchun baholash qayta bajarilmaydi (xotira + disk keshi)
+    key = matrix_key(
+        matrix,
+        engine=name,
+        anchors=None if anchors is None else [float(a) for a in anchors],
+        discrimination=None if discrimination is None else float(discrimination),
+    )
+    result = get_result_cache().result(key, lambda: _run(matrix, name, anchors, discrimination))
+    if isinstance(matrix, ResponseMatrix):
+        _attach_ids(result, matrix)
+    return result
+
+
+def _attach_ids(result: dict[str, Any], matrix: ResponseMatrix) -> None:
+    # ResponseMatrix dagi talabgor va savol identifikatorlari natijaga ko'chiriladi
+    if matrix.item_ids is not None:
+        for item, item_id in zip(result.get("items", []), matrix.item_ids):
+            item["item_id"] = str(item_id)
+    if matrix.person_ids is not None:
+        for person, person_id in zip(result.get("persons", []), matrix.person_ids):
+            person["person_id"] = person_id
+
+
+def _run(
+    matrix: Union[List[List[Optional[int]]], sparse.spmatrix, ResponseMatrix],
+    name: str,
+    anchors: Optional[Sequence[float]],
+    discrimination: Optional[float],
+) -> dict[str, Any]:
+    # Qotirilgan qiyinchiliklar bilan faqat talabgorlar baholanadi — R kerak emas
+    if anchors is not None:
+        return score_anchored(matrix, anchors, 1.0 if discrimination is None else discrimination)
+    if name == "numpy":
+        return estimate_rasch(matrix)
+
+    return _with_fit_statistics(_run_r(matrix), matrix)
+
+
+def _run_r(matrix: Union[List[List[Optional[int]]], sparse.spmatrix, ResponseMatrix]) -> dict[str, Any]:
+    # R (ltm) yo'q javoblarni NA sifatida qabul qiladi — siyrak matritsalar ro'yxatga o'tkaziladi
+    if sparse.issparse(matrix):
+        dense = as_float_matrix(matrix)
+        matrix = [[None if np.isnan(v) else int(v) for v in row] for row in dense]
+
+    # Doimiy R ishchilari ishga tushirilgan bo'lsa — Rscript va CSV siz (JSON uchun ro'yxat kerak)
+    pool = get_pool()
+    if pool is not None:
+        return pool.run(matrix.to_list() if isinstance(matrix, ResponseMatrix) else matrix)
+
+    # Ixcham matritsa CSV ga bo'laklab yoziladi
+    with tempfile.TemporaryDirectory(prefix="rasch_") as tmpdir:
+        csv_path = write_matrix_csv(Path(tmpdir), matrix)
+        return run_rasch_model(csv_path)
+
+
+def _with_fit_statistics(result: dict[str, Any], matrix: Any) -> dict[str, Any]:
+    # ltm infit/outfit bermaydi — R parametrlari (qiyinchilik, diskriminatsiya, EAP logitda) bo'yicha hisoblanadi
+    items, persons = result.get("items", []), result.get("persons", [])
+    if not items or not persons:
+        return result
+    # ltm::rasch(IRT.param = TRUE) umumiy diskriminatsiyani baholaydi (rasch_fit.R: Dscrmn);
+    # u bo'lmasa model noma'lum — a = 1 deb olingan MNSQ siljigan bo'lardi, statistikalar qo'shilmaydi
+    discrimination = items[0].get("discrimination")
+    if discrimination is None or not np.isfinite(discrimination) or discrimination <= 0:
+        return result
+    difficulties = [np.nan if item.get("difficulty") is None else item["difficulty"] for item in items]
+    theta = [np.nan if person.get("eap") is None else person["eap"] for person in persons]
+    try:
+        return add_fit_statistics(result, matrix, difficulties, theta, float(discrimination))
+    except RuntimeError:
+        # O'lchamlar mos kelmasa (masalan, R bo'sh qatorlarni tashlab yuborgan) — natija o'zgarishsiz
+        return result
@@ -0,0 +1,838 @@
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import minimize
+from scipy.special import logsumexp
+
+from .response_matrix import ResponseMatrix
+
+# In-process Rasch baholash (R/ltm ga muqobil).
+#
+# Item qiyinchiliklari shartli maksimal o'xshashlik (CML) bilan, elementar
+# simmetrik funksiyalar orqali analitik gradient va Hessian yordamida
+# Newton-Raphson usulida topiladi. So'ng N(mu, sigma^2) populyatsiya
+# taqsimoti marginal o'xshashlik bo'yicha baholanadi va natija ltm::rasch
+# (IRT.param = TRUE) shkalasiga o'tkaziladi: theta ~ N(0, 1), umumiy
+# diskriminatsiya = sigma, qiyinchilik = (beta - mu) / sigma.
+#
+# To'liq bo'lmagan (booklet) dizaynlar uchun matritsa scipy.sparse ko'rinishida
+# ham berilishi mumkin: saqlangan yacheykalar (aniq 0 lar ham) — berilgan
+# javoblar, qolganlari — berilmagan savollar. Bunda hisob-kitob va xotira
+# talabgorlar x savollar soniga emas, berilgan javoblar soniga proporsional.
+# Bitlarga joylangan ResponseMatrix ham to'g'ridan-to'g'ri qabul qilinadi:
+# guruhlash mask baytlari bo'yicha, zich massivga faqat guruh vakillari ochiladi.
+
+QUADRATURE_POINTS = 41
+# EAP da bir vaqtda ochiladigan qatorlar soni (xotira chegarasi)
+_EAP_CHUNK = 65_536
+# Moslik statistikalarida bir vaqtda ochiladigan qatorlar soni (bo'lak × savollar float massivlari)
+_FIT_CHUNK = 16_384
+# Hamma yoki hech kim to'g'ri javob bergan savollar uchun tuzatish (Winsteps uslubida)
+EXTREME_ADJUSTMENT = 0.3
+
+
+# ---------- Input ----------
+
+Responses = Union[np.ndarray, sparse.csr_matrix, ResponseMatrix]
+
+
+def as_float_matrix(matrix: Any) -> np.ndarray:
+    """Matritsani float massivga o'tkazadi, yo'q qiymatlar -> NaN"""
+    if isinstance(matrix, ResponseMatrix):
+        if matrix.n_persons == 0 or matrix.n_items == 0:
+            raise RuntimeError("Matritsa bo'sh yoki ikki o'lchamli emas")
+        return matrix.to_float()
+    if sparse.issparse(matrix):
+        csr = as_responses(matrix)
+        arr = np.full(csr.shape, np.nan)
+        rows = np.repeat(np.arange(csr.shape[0]), np.diff(csr.indptr))
+        arr[rows, csr.indices] = csr.data
+        return arr
+    if isinstance(matrix, np.ma.MaskedArray):
+        arr = matrix.astype(float).filled(np.nan)
+    else:
+        arr = np.array(matrix, dtype=float)
+    if arr.ndim != 2 or arr.shape[0] == 0 or arr.shape[1] == 0:
+        raise RuntimeError("Matritsa bo'sh yoki ikki o'lchamli emas")
+    return arr
+
+
+def as_responses(matrix: Any) -> Responses:
+    """Siyrak matritsa CSR ko'rinishida (berilgan javoblar saqlangan), ResponseMatrix o'zicha,
+    qolganlari zich NaN massiv"""
+    if isinstance(matrix, ResponseMatrix):
+        if matrix.n_persons == 0 or matrix.n_items == 0:
+            raise RuntimeError("Matritsa bo'sh yoki ikki o'lchamli emas")
+        return matrix
+    if not sparse.issparse(matrix):
+        return as_float_matrix(matrix)
+    csr = sparse.csr_matrix(matrix, dtype=float)
+    if csr.ndim != 2 or csr.shape[0] == 0 or csr.shape[1] == 0:
+        raise RuntimeError("Matritsa bo'sh yoki ikki o'lchamli emas")
+    csr.sum_duplicates()
+    csr.sort_indices()
+    return csr
+
+
+def booklet_matrix(
+    persons: Sequence[int],
+    items: Sequence[int],
+    values: Sequence[float],
+    shape: Optional[Tuple[int, int]] = None,
+) -> sparse.csr_matrix:
+    """(talabgor, savol, javob) uchliklaridan siyrak matritsa — 0 javoblar ham saqlanadi"""
+    rows = np.asarray(persons, dtype=np.int64)
+    cols = np.asarray(items, dtype=np.int64)
+    data = np.asarray(values, dtype=float)
+    if shape is None:
+        shape = (int(rows.max()) + 1, int(cols.max()) + 1)
+    csr = sparse.coo_matrix((data, (rows, cols)), shape=shape).tocsr()
+    csr.sort_indices()
+    return csr
+
+
+def quadrature(n_points: int = QUADRATURE_POINTS) -> Tuple[np.ndarray, np.ndarray]:
+    """Standart normal taqsimot uchun Gauss-Hermite tugunlari va log-og'irliklari"""
+    nodes, weights = np.polynomial.hermite_e.hermegauss(n_points)
+    return nodes, np.log(weights / weights.sum())
+
+
+# ---------- Sufficient statistics ----------
+
+@dataclass
+class SufficientStats:
+    """CML va populyatsiya baholashi uchun yetarli statistikalar.
+
+    groups: berilgan savollar maskasi (packbits) -> xom ball bo'yicha sonlar (0..|A|)
+    item_totals: har bir savol bo'yicha to'g'ri javoblar soni (barcha talabgorlar)
+    """
+
+    n_items: int
+    item_totals: np.ndarray
+    groups: Dict[bytes, np.ndarray] = field(default_factory=dict)
+
+    @property
+    def n_persons(self) -> int:
+        return int(sum(int(c.sum()) for c in self.groups.values()))
+
+    def mask_of(self, key: bytes) -> np.ndarray:
+        bits = np.unpackbits(np.frombuffer(key, dtype=np.uint8))[: self.n_items]
+        return bits.astype(bool)
+
+    def merge(self, other: "SufficientStats") -> "SufficientStats":
+        """Ikki to'lqin statistikalarini qo'shish (savollar tartibi bir xil bo'lishi kerak)"""
+        if other.n_items != self.n_items:
+            raise RuntimeError(f"Savollar soni mos emas: {other.n_items} != {self.n_items}")
+        groups = {key: counts.copy() for key, counts in self.groups.items()}
+        for key, counts in other.groups.items():
+            if key in groups:
+                groups[key] = groups[key] + counts
+            else:
+                groups[key] = counts.copy()
+        return SufficientStats(
+            n_items=self.n_items,
+            item_totals=np.asarray(self.item_totals, dtype=float) + np.asarray(other.item_totals, dtype=float),
+            groups=groups,
+        )
+
+    def to_bytes(self) -> bytes:
+        keys = list(self.groups)
+        buf = io.BytesIO()
+        np.savez_compressed(
+            buf,
+            n_items=np.array([self.n_items]),
+            item_totals=np.asarray(self.item_totals, dtype=float),
+            masks=np.array([np.frombuffer(k, dtype=np.uint8) for k in keys], dtype=np.uint8).reshape(len(keys), -1),
+            counts=np.concatenate([self.groups[k] for k in keys]) if keys else np.zeros(0),
+            sizes=np.array([self.groups[k].size for k in keys], dtype=np.int64),
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SufficientStats":
+        with np.load(io.BytesIO(data)) as z:
+            offsets = np.concatenate([[0], np.cumsum(z["sizes"])])
+            groups = {
+                mask.tobytes(): z["counts"][offsets[g]:offsets[g + 1]].copy()
+                for g, mask in enumerate(z["masks"])
+            }
+            return cls(n_items=int(z["n_items"][0]), item_totals=z["item_totals"].copy(), groups=groups)
+
+
+# ---------- Response patterns ----------
+
+def _row_groups(keys: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Kalit ustunlari bir xil bo'lgan qatorlar guruhlari: vakil qatorlar va har bir qatorning guruh indeksi"""
+    # lexsort: oxirgi kalit asosiy
+    order = np.lexsort(keys)
+    changed = np.zeros(order.size, dtype=bool)
+    if order.size:
+        changed[0] = True
+    for key in keys:
+        ordered = key[order]
+        changed[1:] |= ordered[1:] != ordered[:-1]
+
+    group_sorted = np.cumsum(changed) - 1
+    inverse = np.empty(order.size, dtype=np.int64)
+    inverse[order] = group_sorted
+    return order[changed], inverse
+
+
+def _mask_words(observed: np.ndarray, is_packed: bool = False) -> List[np.ndarray]:
+    packed = observed if is_packed else np.packbits(observed, axis=1)
+    pad = (-packed.shape[1]) % 8
+    if pad:
+        packed = np.pad(packed, ((0, 0), (0, pad)))
+    words = np.ascontiguousarray(packed).view(np.uint64)
+    return [words[:, j] for j in range(words.shape[1] - 1, -1, -1)]
+
+
+def _row_patterns(arr: Responses) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray]]:
+    """Har bir qator uchun xom ball, berilgan savollar soni va mask kalitlari"""
+    if isinstance(arr, ResponseMatrix):
+        return arr.raw_scores(), arr.n_observed(), _mask_words(arr.observed, is_packed=True)
+    if sparse.issparse(arr):
+        n_admin = np.diff(arr.indptr)
+        raw = np.rint(np.asarray(arr.sum(axis=1)).ravel()).astype(np.int64)
+        # Mask kalitlari: savollarning tasodifiy 64-bitli og'irliklari yig'indisi (ikki mustaqil xesh)
+        weights = np.random.default_rng(20240601).integers(
+            0, np.iinfo(np.uint64).max, size=(2, arr.shape[1]), dtype=np.uint64, endpoint=True
+        )
+        starts = arr.indptr[:-1][n_admin > 0]
+        keys = []
+        for w in weights:
+            h = np.zeros(arr.shape[0], dtype=np.uint64)
+            if starts.size:
+                h[n_admin > 0] = np.add.reduceat(w[arr.indices], starts)
+            keys.append(h)
+        return raw, n_admin, keys + [n_admin.astype(np.int64)]
+
+    observed = ~np.isnan(arr)
+    raw = np.where(observed, arr, 0.0).sum(axis=1).astype(np.int64)
+    return raw, observed.sum(axis=1), _mask_words(observed)
+
+
+def _observed_rows(arr: Responses, rows: np.ndarray) -> Responses:
+    """Tanlangan qatorlar uchun berilgan savollar indikatori (0/1)"""
+    if isinstance(arr, ResponseMatrix):
+        return arr.unpack(rows)[1].astype(float)
+    if sparse.issparse(arr):
+        sub = arr[rows]
+        return sparse.csr_matrix((np.ones_like(sub.data), sub.indices, sub.indptr), shape=sub.shape)
+    return (~np.isnan(arr[rows])).astype(float)
+
+
+def _packed_masks(arr: Responses, rows: np.ndarray) -> np.ndarray:
+    if isinstance(arr, ResponseMatrix):
+        return arr.observed[rows]
+    if sparse.issparse(arr):
+        sub = arr[rows]
+        observed = np.zeros(sub.shape, dtype=bool)
+        observed[np.repeat(np.arange(sub.shape[0]), np.diff(sub.indptr)), sub.indices] = True
+    else:
+        observed = ~np.isnan(arr[rows])
+    return np.packbits(observed, axis=1)
+
+
+def sufficient_stats(matrix: Any) -> SufficientStats:
+    arr = as_responses(matrix)
+    raw, n_admin, keys = _row_patterns(arr)
+    first, inverse = _row_groups(keys)
+    sizes = n_admin[first]
+
+    # Barcha guruhlarning xom ball sonlari bitta bincount bilan: guruh g -> [offset_g, offset_g + |A_g|]
+    offsets = np.concatenate([[0], np.cumsum(sizes + 1)])
+    counts = np.bincount(offsets[inverse] + raw, minlength=int(offsets[-1])).astype(np.float64)
+    packed = _packed_masks(arr, first)
+
+    groups: Dict[bytes, np.ndarray] = {
+        packed[g].tobytes(): counts[offsets[g] : offsets[g + 1]]
+        for g in range(first.size)
+        if sizes[g] > 0
+    }
+
+    if isinstance(arr, ResponseMatrix):
+        item_totals = arr.item_totals()
+    elif sparse.issparse(arr):
+        item_totals = np.asarray(arr.sum(axis=0)).ravel()
+    else:
+        item_totals = np.where(np.isnan(arr), 0.0, arr).sum(axis=0)
+    return SufficientStats(n_items=arr.shape[1], item_totals=item_totals, groups=groups)
+
+
+# ---------- Elementary symmetric functions ----------
+
+def _esf(eps: np.ndarray) -> np.ndarray:
+    """(C, m) -> (C, m+1): har bir guruh uchun elementar simmetrik funksiyalar"""
+    gamma = np.zeros((eps.shape[0], eps.shape[1] + 1))
+    gamma[:, 0] = 1.0
+    for i in range(eps.shape[1]):
+        gamma[:, 1:] = gamma[:, 1:] + eps[:, i : i + 1] * gamma[:, :-1]
+    return gamma
+
+
+def _deflate(gamma: np.ndarray, e: np.ndarray) -> np.ndarray:
+    """ESF dan bitta savolni chiqarib tashlash: gamma (..., n+1), e (...) -> (..., n).
+
+    Pastdan yuqoriga rekursiya P(x = 1 | s) <= 1/2 bo'lgan ballar uchun, yuqoridan
+    pastga rekursiya qolganlari uchun barqaror — har bir ball uchun mos tomoni olinadi.
+    """
+    n = gamma.shape[-1] - 1
+    # Ball o'qini oldinga chiqaramiz: har bir qadam uzluksiz xotira bloki bilan ishlaydi
+    g = np.moveaxis(gamma, -1, 0)
+    fwd = np.empty((n,) + g.shape[1:])
+    fwd[0] = g[0]
+    for s in range(1, n):
+        fwd[s] = g[s] - e * fwd[s - 1]
+
+    bwd = np.empty_like(fwd)
+    with np.errstate(over="ignore", invalid="ignore"):
+        bwd[n - 1] = g[n] / e
+        for s in range(n - 1, 0, -1):
+            bwd[s - 1] = (g[s] - bwd[s]) / e
+
+        # P(x = 1 | s) = e * gamma^(-)_{s-1} / gamma_s ball bo'yicha o'sadi: oldinga rekursiya
+        # 1/2 chegarasigacha (prefiks) olinadi, undan keyingi qiymatlari ishonchsiz
+        prob = np.zeros_like(fwd)
+        prob[1:] = e * fwd[:-1] / g[1:n]
+        out = np.where(np.logical_and.accumulate(prob <= 0.5, axis=0), fwd, bwd)
+    np.clip(out, 0.0, None, out=out)
+    return np.moveaxis(out, 0, -1)
+
+
+# ---------- CML item calibration ----------
+
+# Bitta to'plamdagi (C * m^3) yacheykalar chegarasi — xotira cheklovi
+_BATCH_CELLS = 1_000_000
+
+
+def _mask_batches(stats: SufficientStats) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Guruhlarni berilgan savollar soni (m) bo'yicha vektor to'plamlarga ajratadi.
+
+    Har bir to'plam: (C, m) savol indekslari va (C, m-1) xom ball sonlari (1..m-1).
+    """
+    by_size: Dict[int, Tuple[List[np.ndarray], List[np.ndarray]]] = {}
+    for key, counts in stats.groups.items():
+        idx = np.flatnonzero(stats.mask_of(key))
+        m = idx.size
+        if m < 2 or not counts[1:m].any():
+            continue
+        idxs, ns = by_size.setdefault(m, ([], []))
+        idxs.append(idx)
+        ns.append(counts[1:m])
+
+    batches: List[Tuple[np.ndarray, np.ndarray]] = []
+    for m, (idxs, ns) in sorted(by_size.items()):
+        chunk = max(1, _BATCH_CELLS // m**3)
+        for s in range(0, len(idxs), chunk):
+            batches.append((np.array(idxs[s : s + chunk]), np.array(ns[s : s + chunk])))
+    return batches
+
+
+def _cml_terms(
+    batches: List[Tuple[np.ndarray, np.ndarray]],
+    beta: np.ndarray,
+    hessian: bool = True,
+) -> Tuple[float, np.ndarray, Optional[np.ndarray]]:
+    """Shartli log-o'xshashlikning -sum(n log gamma) qismi, gradient va Hessian hissalari"""
+    k = beta.size
+    loglik = 0.0
+    expected = np.zeros(k)
+    hess = np.zeros((k, k)) if hessian else None
+
+    for idx, n_r in batches:
+        c, m = idx.shape
+        # Har bir guruhda beta markazlashtiriladi: gamma_r(beta) = gamma_r(beta - shift) * exp(-r * shift),
+        # ehtimolliklar o'zgarmaydi, katta m da esa toshib ketish bo'lmaydi
+        shift = beta[idx].mean(axis=1, keepdims=True)
+        eps = np.exp(-(beta[idx] - shift))
+        gamma = _esf(eps)
+        g1 = _deflate(np.broadcast_to(gamma[:, None, :], (c, m, m + 1)), eps)
+
+        r = np.arange(1, m)
+        gamma_r = gamma[:, r]
+        loglik -= float((n_r * (np.log(gamma_r) - r[None, :] * shift)).sum())
+
+        # pi[c, r, j] = P(x_j = 1 | r)
+        pi = eps[:, None, :] * g1[:, :, r - 1].transpose(0, 2, 1) / gamma_r[:, :, None]
+        np.add.at(expected, idx, np.einsum("cr,crj->cj", n_r, pi))
+        if hess is None:
+            continue
+
+        # pij[c, r, j, l] = P(x_j = 1, x_l = 1 | r)
+        pij = np.zeros((c, r.size, m, m))
+        if m > 2:
+            g2 = _deflate(np.broadcast_to(g1[:, :, None, :], (c, m, m, m)), eps[:, None, :])
+            pair = g2[:, :, :, np.clip(r - 2, 0, None)].transpose(0, 3, 1, 2)
+            pair = pair * (eps[:, :, None] * eps[:, None, :])[:, None]
+            pair[:, r < 2] = 0.0
+            pij = pair / gamma_r[:, :, None, None]
+        diag = np.arange(m)
+        pij[:, :, diag, diag] = pi
+
+        weight = np.einsum("cr,crjl->cjl", n_r, pij) - np.einsum("cr,crj,crl->cjl", n_r, pi, pi)
+        np.add.at(hess, (idx[:, :, None], idx[:, None, :]), -weight)
+
+    return loglik, expected, hess
+
+
+def _adjusted_totals(stats: SufficientStats) -> Tuple[np.ndarray, np.ndarray]:
+    """Ekstremal (0 yoki to'liq ball) talabgorlarsiz savol yig'indilari"""
+    k = stats.n_items
+    totals = np.asarray(stats.item_totals, dtype=float).copy()
+    informative = np.zeros(k)
+    for key, counts in stats.groups.items():
+        mask = stats.mask_of(key)
+        m = int(mask.sum())
+        totals[mask] -= counts[m]
+        informative[mask] += counts[1:m].sum()
+
+    missing = [f"Item{j + 1}" for j in np.flatnonzero(informative == 0)]
+    if missing:
+        raise RuntimeError(
+            "Quyidagi savollar uchun ma'lumot yetarli emas: " + ", ".join(missing)
+        )
+    return np.clip(totals, EXTREME_ADJUSTMENT, informative - EXTREME_ADJUSTMENT), informative
+
+
+def fit_cml(
+    stats: SufficientStats,
+    init: Optional[Sequence[float]] = None,
+    max_iter: int = 100,
+    tol: float = 1e-8,
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """CML bo'yicha qiyinchiliklar (yig'indisi 0), ularning SE lari va iteratsiyalar soni"""
+    k = stats.n_items
+    if k < 2:
+        raise RuntimeError("Kamida 2 ta savol kerak")
+    totals, informative = _adjusted_totals(stats)
+    ones = np.ones((k, k)) / k
+
+    if init is None:
+        p = totals / informative
+        beta = np.log((1 - p) / p)
+    else:
+        beta = np.asarray(init, dtype=float).copy()
+    beta -= beta.mean()
+
+    batches = _mask_batches(stats)
+
+    def objective(b: np.ndarray) -> Tuple[float, np.ndarray]:
+        part, expected, _ = _cml_terms(batches, b, hessian=False)
+        return part - float(totals @ b), expected - totals
+
+    loglik, grad = objective(beta)
+    hess = _cml_terms(batches, beta)[2]
+    hess_fresh = True
+    previous = np.inf
+    n_iter = 0
+    for n_iter in range(1, max_iter + 1):
+        step = np.linalg.solve(-hess + ones, grad)
+        step -= step.mean()
+        largest = np.abs(step).max()
+        if largest > 1.0:
+            step /= largest
+
+        scale = 1.0
+        while True:
+            cand = beta + scale * step
+            cand_ll, cand_grad = objective(cand)
+            if cand_ll >= loglik - 1e-12 or scale < 1e-4:
+                break
+            scale /= 2
+        beta, loglik, grad = cand, cand_ll, cand_grad
+        size = np.abs(scale * step).max()
+        if size < tol:
+            break
+
+        # Hessian eng qimmat qism (har bir mask uchun O(m^3)): u faqat qadam qisqartirilganda
+        # yoki yaqinlashish sekinlashganda yangilanadi, aks holda oldingisi bilan davom etiladi
+        hess_fresh = scale < 1.0 or size > 0.25 * previous
+        if hess_fresh:
+            hess = _cml_terms(batches, beta)[2]
+        previous = size
+    else:
+        raise RuntimeError(f"CML baholash {max_iter} iteratsiyada yaqinlashmadi")
+
+    # SE uchun Hessian oxirgi (yaqinlashgan) qadamdan oldingi nuqtada hisoblangan bo'lishi kerak
+    if not hess_fresh:
+        hess = _cml_terms(batches, beta)[2]
+
+    # Yig'indi = 0 sharti ostidagi kovariatsiya
+    center = np.eye(k) - ones
+    cov = center @ np.linalg.inv(-hess + ones) @ center
+    se = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+    return beta, se, n_iter
+
+
+# ---------- Population distribution and person scores ----------
+
+def _group_arrays(stats: SufficientStats) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    masks: List[np.ndarray] = []
+    scores: List[np.ndarray] = []
+    counts: List[np.ndarray] = []
+    for key, c in stats.groups.items():
+        nz = np.flatnonzero(c)
+        masks.append(np.repeat(stats.mask_of(key)[None, :], nz.size, axis=0))
+        scores.append(nz.astype(float))
+        counts.append(c[nz])
+    return np.vstack(masks).astype(float), np.concatenate(scores), np.concatenate(counts)
+
+
+def _population_negll(
+    params: np.ndarray,
+    beta: np.ndarray,
+    groups: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    nodes: np.ndarray,
+    log_w: np.ndarray,
+) -> Tuple[float, np.ndarray]:
+    """(mu, log sigma) bo'yicha manfiy marginal log-o'xshashlik (konstantasiz) va gradient"""
+    masks, scores, counts = groups
+    mu, log_sigma = params
+    sigma = np.exp(log_sigma)
+    theta = mu + sigma * nodes
+    logits = theta[None, :] - beta[:, None]
+    log_post = (
+        scores[:, None] * theta[None, :]
+        - masks @ np.logaddexp(0.0, logits)
+        + log_w[None, :]
+    )
+    ll_g = logsumexp(log_post, axis=1)
+    post = np.exp(log_post - ll_g[:, None])
+    resid = scores[:, None] - masks @ (1.0 / (1.0 + np.exp(-logits)))
+    d_mu = float(counts @ (post * resid).sum(axis=1))
+    d_ls = float(counts @ (post * resid * (sigma * nodes)[None, :]).sum(axis=1))
+    return -float(counts @ ll_g), -np.array([d_mu, d_ls])
+
+
+def fit_population(
+    stats: SufficientStats,
+    beta: np.ndarray,
+    n_points: int = QUADRATURE_POINTS,
+    init: Optional[Tuple[float, float]] = None,
+) -> Tuple[float, float, float]:
+    """theta ~ N(mu, sigma^2) parametrlari va marginal log-o'xshashlik"""
+    groups = _group_arrays(stats)
+    nodes, log_w = quadrature(n_points)
+    const = -float(np.asarray(stats.item_totals) @ beta)
+    x0 = np.array([0.0, 0.0]) if init is None else np.array([init[0], np.log(init[1])])
+
+    opt = minimize(
+        _population_negll,
+        x0=x0,
+        args=(beta, groups, nodes, log_w),
+        jac=True,
+        method="L-BFGS-B",
+    )
+    mu, log_sigma = opt.x
+    return float(mu), float(np.exp(log_sigma)), const - float(opt.fun)
+
+
+def marginal_loglik(
+    stats: SufficientStats,
+    difficulties: Sequence[float],
+    discrimination: float = 1.0,
+    n_points: int = QUADRATURE_POINTS,
+) -> float:
+    """Berilgan (qotirilgan) parametrlar va theta ~ N(0, 1) da marginal log-o'xshashlik"""
+    beta = discrimination * np.asarray(difficulties, dtype=float)
+    nodes, log_w = quadrature(n_points)
+    negll, _ = _population_negll(
+        np.array([0.0, np.log(discrimination)]), beta, _group_arrays(stats), nodes, log_w
+    )
+    return -float(np.asarray(stats.item_totals) @ beta) - negll
+
+
+def score_groups(observed: np.ndarray, raw: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (berilgan savollar maskasi, xom ball) bo'yicha noyob guruhlar.
+
+    Rasch modelida bu juftlik bir xil bo'lgan talabgorlarning theta va SE si ham
+    bir xil, shuning uchun har bir guruh bir marta baholanadi. Qaytadi: har bir
+    guruhning vakil qator indeksi va har bir talabgorning guruh indeksi.
+    """
+    # avval xom ball, so'ng mask so'zlari
+    return _row_groups(_mask_words(observed) + [np.asarray(raw, dtype=np.int64)])
+
+
+def eap_scores(
+    matrix: Any,
+    difficulties: Sequence[float],
+    discrimination: float = 1.0,
+    n_points: int = QUADRATURE_POINTS,
+    collapse: bool = True,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """theta ~ N(0, 1) bo'yicha EAP va posterior SD (yo'q javoblar hisobga olinmaydi)"""
+    arr = as_responses(matrix)
+    b = np.asarray(difficulties, dtype=float)
+    if b.size != arr.shape[1]:
+        raise RuntimeError(f"Savollar soni mos emas: {arr.shape[1]} != {b.size}")
+    raw, _, keys = _row_patterns(arr)
+
+    inverse = None
+    rows = np.arange(arr.shape[0])
+    if collapse:
+        rows, inverse = _row_groups(keys + [raw])
+
+    nodes, log_w = quadrature(n_points)
+    log_q = np.logaddexp(0.0, discrimination * (nodes[None, :] - b[:, None]))
+    eap = np.empty(rows.size)
+    sd = np.empty(rows.size)
+    # Bo'laklab: zich maska faqat _EAP_CHUNK ta qator uchun ochiladi
+    for start in range(0, rows.size, _EAP_CHUNK):
+        part = rows[start : start + _EAP_CHUNK]
+        log_post = (
+            discrimination * raw[part].astype(float)[:, None] * nodes[None, :]
+            - _observed_rows(arr, part) @ log_q
+            + log_w[None, :]
+        )
+        log_post -= logsumexp(log_post, axis=1)[:, None]
+        post = np.exp(log_post)
+        mean = post @ nodes
+        eap[start : start + part.size] = mean
+        sd[start : start + part.size] = np.sqrt(np.clip(post @ nodes**2 - mean**2, 0.0, None))
+
+    if inverse is not None:
+        eap, sd = eap[inverse], sd[inverse]
+    return eap, sd
+
+
+def estimate_rasch(matrix: Any) -> Dict[str, Any]:
+    """R skript (rasch_calc.R) bilan bir xil JSON shaklidagi natija"""
+    arr = as_responses(matrix)
+    n_persons, n_items = arr.shape
+    stats = sufficient_stats(arr)
+
+    beta, beta_se, _ = fit_cml(stats)
+    mu, sigma, loglik = fit_population(stats, beta)
+
+    difficulty = (beta - mu) / sigma
+    eap, sd = eap_scores(arr, difficulty, discrimination=sigma)
+
+    result = _result(difficulty, sigma, eap, sd, loglik, n_params=n_items + 1, item_se=beta_se / sigma)
+    return add_fit_statistics(result, arr, difficulty, eap, sigma)
+
+
+def score_anchored(
+    matrix: Any,
+    difficulties: Sequence[float],
+    discrimination: float = 1.0,
+) -> Dict[str, Any]:
+    """
+    Qotirilgan (anchored) qiyinchiliklar bo'yicha faqat talabgorlarni baholash.
+
+    Savol parametrlari qayta hisoblanmaydi — oldin kalibrlangan shakl bo'yicha
+    kech kelgan guruhlar bir xil shkalada baholanadi.
+    """
+    arr = as_responses(matrix)
+    b = np.asarray(difficulties, dtype=float)
+    if b.size != arr.shape[1]:
+        raise RuntimeError(f"Qotirilgan qiyinchiliklar soni savollar soniga mos emas: {b.size} != {arr.shape[1]}")
+    if not np.all(np.isfinite(b)) or not (discrimination > 0):
+        raise RuntimeError("Qotirilgan parametrlar noto'g'ri")
+
+    eap, sd = eap_scores(arr, b, discrimination=discrimination)
+    loglik = marginal_loglik(sufficient_stats(arr), b, discrimination)
+    result = _result(b, discrimination, eap, sd, loglik, n_params=0)
+    for item in result["items"]:
+        item["anchored"] = True
+    return add_fit_statistics(result, arr, b, eap, discrimination)
+
+
+# ---------- Fit statistics ----------
+
+def _response_rows(arr: Responses, rows: slice) -> Tuple[np.ndarray, np.ndarray]:
+    """Tanlangan qatorlar uchun zich (javob, berilgan) massivlari; berilmagan javob — 0"""
+    if isinstance(arr, ResponseMatrix):
+        correct, observed = arr.unpack(rows)
+        return correct.astype(float), observed
+    if sparse.issparse(arr):
+        sub = arr[rows]
+        observed = np.zeros(sub.shape, dtype=bool)
+        observed[np.repeat(np.arange(sub.shape[0]), np.diff(sub.indptr)), sub.indices] = True
+        return sub.toarray(), observed
+    block = arr[rows]
+    observed = ~np.isnan(block)
+    return np.where(observed, block, 0.0), observed
+
+
+def _zstd(mnsq: np.ndarray, variance: np.ndarray) -> np.ndarray:
+    """Wilson-Hilferty kub ildiz almashtirishi: MNSQ -> taxminan N(0, 1)"""
+    q = np.sqrt(np.clip(variance, 1e-12, None))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (np.cbrt(mnsq) - 1.0) * (3.0 / q) + q / 3.0
+
+
+def fit_statistics(
+    matrix: Any,
+    difficulties: Sequence[float],
+    theta: Sequence[float],
+    discrimination: float = 1.0,
+) -> Dict[str, np.ndarray]:
+    """
+    Savollar va talabgorlar uchun infit/outfit MNSQ va ZSTD.
+
+    Qoldiqlar (y - P) bitta vektorlashgan o'tishda hisoblanadi: talabgorlar _FIT_CHUNK
+    tadan bo'laklanadi, savollar bo'yicha yig'indilar bo'laklar orasida to'planadi —
+    xotira kogorta hajmiga emas, bo'lak hajmiga bog'liq. Berilmagan javoblar va
+    theta si noma'lum talabgorlar hisobga olinmaydi (kuzatuv bo'lmasa — NaN).
+    """
+    arr = as_responses(matrix)
+    b = np.asarray(difficulties, dtype=float)
+    theta = np.asarray(theta, dtype=float)
+    n_persons, n_items = arr.shape
+    if b.size != n_items or theta.size != n_persons:
+        raise RuntimeError(f"O'lchamlar mos emas: {n_persons}x{n_items}, theta {theta.size}, qiyinchilik {b.size}")
+
+    # Savollar bo'yicha: kuzatuvlar soni, sum z^2, sum (y-P)^2, sum W, sum C/W^2, sum (C - W^2)
+    item_sums = np.zeros((6, n_items))
+    person = {name: np.full(n_persons, np.nan) for name in ("infit", "outfit", "infit_zstd", "outfit_zstd")}
+
+    for start in range(0, n_persons, _FIT_CHUNK):
+        rows = slice(start, min(start + _FIT_CHUNK, n_persons))
+        y, observed = _response_rows(arr, rows)
+        t = theta[rows]
+        observed &= np.isfinite(t)[:, None]
+        p = 1.0 / (1.0 + np.exp(-discrimination * (np.where(np.isfinite(t), t, 0.0)[:, None] - b[None, :])))
+        w = np.clip(p * (1.0 - p), 1e-12, None)
+        # Ikki qiymatli javob uchun to'rtinchi markaziy moment: E[(y - P)^4] = W ((1 - P)^3 + P^3)
+        c = w * ((1.0 - p) ** 3 + p**3)
+        mask = observed.astype(float)
+        resid2 = (y - p) ** 2 * mask
+        z2 = resid2 / w
+        kurt = c / w**2 * mask
+        spread = (c - w**2) * mask
+        w = w * mask
+
+        item_sums += np.stack([
+            mask.sum(axis=0), z2.sum(axis=0), resid2.sum(axis=0), w.sum(axis=0), kurt.sum(axis=0), spread.sum(axis=0),
+        ])
+
+        n = mask.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            outfit = z2.sum(axis=1) / n
+            infit = resid2.sum(axis=1) / w.sum(axis=1)
+            person["outfit"][rows] = outfit
+            person["infit"][rows] = infit
+            person["outfit_zstd"][rows] = _zstd(outfit, kurt.sum(axis=1) / n**2 - 1.0 / n)
+            person["infit_zstd"][rows] = _zstd(infit, spread.sum(axis=1) / w.sum(axis=1) ** 2)
+
+    n, z2, resid2, w, kurt, spread = item_sums
+    with np.errstate(invalid="ignore", divide="ignore"):
+        outfit = z2 / n
+        infit = resid2 / w
+        item = {
+            "infit": infit,
+            "outfit": outfit,
+            "infit_zstd": _zstd(infit, spread / w**2),
+            "outfit_zstd": _zstd(outfit, kurt / n**2 - 1.0 / n),
+        }
+    return {"items": item, "persons": person}
+
+
+def add_fit_statistics(
+    result: Dict[str, Any],
+    matrix: Any,
+    difficulties: Sequence[float],
+    theta: Sequence[float],
+    discrimination: float = 1.0,
+) -> Dict[str, Any]:
+    """Natijadagi savollar va talabgorlar yozuvlariga infit/outfit (MNSQ, ZSTD) qo'shadi"""
+    stats = fit_statistics(matrix, difficulties, theta, discrimination)
+    for key in ("items", "persons"):
+        columns = {name: np.round(values, 4) for name, values in stats[key].items()}
+        for i, record in enumerate(result.get(key, [])):
+            for name, values in columns.items():
+                value = values[i]
+                # JSON da NaN yo'q — kuzatuv bo'lmasa None
+                record[name] = float(value) if np.isfinite(value) else None
+    return result
+
+
+# ---------- Incremental calibration ----------
+
+@dataclass
+class CalibrationState:
+    """Oldingi to'lqinlar bo'yicha kalibrlash holati (CML shkalasida beta, yig'indisi 0)"""
+
+    stats: SufficientStats
+    beta: np.ndarray
+    mu: float
+    sigma: float
+
+
+def update_calibration(
+    matrix: Any,
+    previous: Optional[CalibrationState] = None,
+) -> Tuple[Dict[str, Any], CalibrationState]:
+    """
+    Yangi to'lqinni oldingi yetarli statistikalarga qo'shib qayta kalibrlash.
+
+    Newton-Raphson oldingi beta dan, populyatsiya taqsimoti oldingi (mu, sigma)
+    dan boshlanadi, shuning uchun qo'shimcha to'lqin bir necha iteratsiyada
+    yaqinlashadi. Natijada faqat yangi to'lqin talabgorlari baholanadi;
+    moslik statistikalari barcha to'lqinlar bo'yicha.
+    """
+    arr = as_responses(matrix)
+    stats = sufficient_stats(arr)
+    init: Optional[np.ndarray] = None
+    population: Optional[Tuple[float, float]] = None
+    if previous is not None:
+        stats = previous.stats.merge(stats)
+        init, population = previous.beta, (previous.mu, previous.sigma)
+
+    beta, beta_se, n_iter = fit_cml(stats, init=init)
+    mu, sigma, loglik = fit_population(stats, beta, init=population)
+
+    difficulty = (beta - mu) / sigma
+    eap, sd = eap_scores(arr, difficulty, discrimination=sigma)
+
+    result = _result(
+        difficulty, sigma, eap, sd, loglik, n_params=stats.n_items + 1,
+        item_se=beta_se / sigma, n_obs=stats.n_persons,
+    )
+    result["fit"]["n_iter"] = n_iter
+    # Infit/outfit — faqat yangi to'lqin javoblari bo'yicha (oldingi to'lqinlar xom javoblari saqlanmaydi)
+    add_fit_statistics(result, arr, difficulty, eap, sigma)
+    return result, CalibrationState(stats=stats, beta=beta, mu=mu, sigma=sigma)
+
+
+def _result(
+    difficulty: np.ndarray,
+    discrimination: float,
+    eap: np.ndarray,
+    sd: np.ndarray,
+    loglik: float,
+    n_params: int,
+    item_se: Optional[np.ndarray] = None,
+    n_obs: Optional[int] = None,
+) -> Dict[str, Any]:
+    n_persons, n_items = eap.size, difficulty.size
+    n_obs = n_persons if n_obs is None else n_obs
+    items: List[Dict[str, Any]] = []
+    for j in range(n_items):
+        item: Dict[str, Any] = {"item_id": f"Item{j + 1}", "difficulty": float(difficulty[j])}
+        if item_se is not None:
+            item["se"] = float(item_se[j])
+        item["discrimination"] = float(discrimination)
+        items.append(item)
+
+    return {
+        "items": items,
+        "persons": [
+            {"person_index": i + 1, "eap": float(eap[i]), "se": float(sd[i])}
+            for i in range(n_persons)
+        ],
+        "fit": {
+            "logLik": loglik,
+            "AIC": -2 * loglik + 2 * n_params,
+            "BIC": -2 * loglik + np.log(n_obs) * n_params,
+            "n_obs": n_obs,
+            "n_items": n_items,
+        },
+    }
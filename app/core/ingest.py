@@ -0,0 +1,453 @@
+from __future__ import annotations
+
+import csv
+import io
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .cleaning import (
+    DETECTION_HEAD_ROWS,
+    DETECTION_SAMPLE_ROWS,
+    ColumnDetection,
+    _is_blank,
+    clean_chunk_codes,
+    column_codes,
+    detect_from_codes,
+    detect_from_sample,
+    finish_codes,
+)
+from .response_matrix import CHUNK_ROWS, ResponseMatrix
+
+# Katta CSV yuklamalarni oqim bilan o'qish: fayl ikki marta bo'laklab o'tiladi —
+# 1) qatorlar soni va ustunlarni aniqlash uchun tanlanma (boshidagi qatorlar + rezervuar),
+# 2) har bir bo'lak tozalanib oldindan ajratilgan bit massivlariga yoziladi.
+# Xotirada bir vaqtda faqat bitta bo'lak, tanlanma va ixcham natija turadi.
+
+CSV_CHUNK_ROWS = 16_384
+
+
+class MissingDependencyError(RuntimeError):
+    """Fayl formati uchun ixtiyoriy kutubxona (openpyxl, pyarrow) o'rnatilmagan"""
+
+
+def _sniff_delimiter(path: Path, encoding: str) -> str:
+    # Excel ba'zi lokallarda ";" yoki tab bilan saqlaydi; aks holda vergul
+    with path.open("r", encoding=encoding, newline="") as f:
+        for line in f:
+            if line.strip():
+                if "," not in line:
+                    for candidate in (";", "\t"):
+                        if candidate in line:
+                            return candidate
+                return ","
+    return ","
+
+
+def iter_csv_chunks(
+    path: Union[str, Path],
+    chunk_rows: int = CSV_CHUNK_ROWS,
+    delimiter: Optional[str] = None,
+    encoding: str = "utf-8-sig",
+) -> Iterator[List[List[str]]]:
+    """CSV qatorlarini chunk_rows tadan bo'laklab qaytaradi (qo'shtirnoqli maydonlar csv moduli bilan)"""
+    path = Path(path)
+    delimiter = delimiter or _sniff_delimiter(path, encoding)
+    with path.open("r", encoding=encoding, newline="") as f:
+        block: List[List[str]] = []
+        for row in csv.reader(f, delimiter=delimiter):
+            block.append(row)
+            if len(block) >= chunk_rows:
+                yield block
+                block = []
+        if block:
+            yield block
+
+
+def _scan(
+    chunks: Iterator[List[List[str]]],
+    sample_rows: int,
+    head_rows: int,
+    seed: int,
+) -> Tuple[Optional[List[str]], int, List[List[str]], int]:
+    """
+    Birinchi o'tish: (sarlavha, sarlavha qatori indeksi, tanlanma, sarlavhadan keyingi qatorlar soni).
+    Tanlanma — boshidagi head_rows qator va qolgan qismdan bir tekis rezervuar (Algorithm R).
+    """
+    rng = np.random.default_rng(seed)
+    header: Optional[List[str]] = None
+    header_row = -1
+    head: List[List[str]] = []
+    reservoir: List[List[str]] = []
+    capacity = max(sample_rows - head_rows, 0)
+    seen = 0  # boshidagi qatorlardan keyin ko'rilgan qatorlar
+    n_rows = 0
+    offset = 0
+
+    for block in chunks:
+        start = 0
+        if header is None:
+            for i, row in enumerate(block):
+                if not all(_is_blank(c) for c in row):
+                    header, header_row, start = row, offset + i, i + 1
+                    break
+            else:
+                offset += len(block)
+                continue
+        offset += len(block)
+        rows = block[start:]
+        n_rows += len(rows)
+
+        take = max(0, min(head_rows - len(head), len(rows)))
+        head.extend(rows[:take])
+        rest = rows[take:]
+        if not rest or capacity == 0:
+            continue
+        fill = min(capacity - len(reservoir), len(rest))
+        reservoir.extend(rest[:fill])
+        seen += fill
+        rest = rest[fill:]
+        if rest:
+            # i-qator ehtimoli capacity / (i + 1) bilan rezervuardagi tasodifiy o'rinni egallaydi
+            positions = seen + np.arange(1, len(rest) + 1)
+            slots = (rng.random(len(rest)) * positions).astype(np.int64)
+            for row_index in np.flatnonzero(slots < capacity):
+                reservoir[slots[row_index]] = rest[row_index]
+            seen += len(rest)
+
+    return header, header_row, head + reservoir, n_rows
+
+
+def read_csv_compact(
+    path: Union[str, Path],
+    fill_missing: Optional[int] = None,
+    chunk_rows: int = CSV_CHUNK_ROWS,
+    sample_rows: int = DETECTION_SAMPLE_ROWS,
+    head_rows: int = DETECTION_HEAD_ROWS,
+    delimiter: Optional[str] = None,
+    encoding: str = "utf-8-sig",
+    seed: int = 0,
+) -> Tuple[ResponseMatrix, ColumnDetection]:
+    """
+    CSV faylni oqim bilan tozalab ResponseMatrix ga yig'ish.
+
+    Natija clean_response_matrix(rows, compact=True) bilan bir xil (kichik fayllarda ustunlar
+    aniqlash ham bir xil); eng katta xotira — bitta bo'lak + tanlanma + bit massivlar.
+    """
+    path = Path(path)
+    delimiter = delimiter or _sniff_delimiter(path, encoding)
+
+    def chunks() -> Iterator[List[List[str]]]:
+        return iter_csv_chunks(path, chunk_rows, delimiter, encoding)
+
+    header, header_row, sample, n_rows = _scan(chunks(), sample_rows, head_rows, seed)
+    if header is None:
+        return ResponseMatrix.from_rows([], n_items=0), ColumnDetection([], [], 0.0, -1, 0, 0)
+    detection = detect_from_sample(header, sample, header_row, n_rows)
+    qcols = detection.question_columns or list(range(max(len(row) for row in [header, *sample])))
+    del sample
+
+    # Ikkinchi o'tish: oldindan ajratilgan massivlarga bo'laklab yozish (sarlavha ham ma'lumot
+    # bo'lishi mumkin — unda 0/1 bo'lsa qator saqlanadi, aks holda tashlanadi)
+    n_bytes = (len(qcols) + 7) // 8
+    correct = np.zeros((n_rows + 1, n_bytes), dtype=np.uint8)
+    observed = np.zeros((n_rows + 1, n_bytes), dtype=np.uint8)
+    filled = 0
+    offset = 0
+    for block in chunks():
+        if offset + len(block) <= header_row:
+            offset += len(block)
+            continue
+        rows = block[max(header_row - offset, 0):]
+        offset += len(block)
+        codes = clean_chunk_codes(rows, qcols, fill_missing)
+        end = filled + codes.shape[0]
+        correct[filled:end] = np.packbits(codes == 1, axis=1)
+        observed[filled:end] = np.packbits(codes >= 0, axis=1)
+        filled = end
+
+    return ResponseMatrix(correct[:filled], observed[:filled], len(qcols)), detection
+
+
+def compact_from_stream(
+    chunks: Iterator[Sequence[Sequence[Any]]],
+    fill_missing: Optional[int] = None,
+    sample_rows: int = DETECTION_SAMPLE_ROWS,
+) -> Tuple[ResponseMatrix, ColumnDetection]:
+    """
+    Bir martalik o'tish: ustunlar fayl boshidagi sample_rows qator bo'yicha aniqlanadi, so'ng
+    bo'laklar ketma-ket tozalanib bitlarga joylanadi. Faylni ikki marta o'qish qimmat bo'lgan
+    manbalar uchun (masalan, .xlsx — XML tahlili sekin).
+    """
+    chunks = iter(chunks)
+    buffered: List[Sequence[Any]] = []
+    header_row = -1
+    for block in chunks:
+        buffered.extend(block)
+        if header_row < 0:
+            header_row = next(
+                (i for i, row in enumerate(buffered) if not all(_is_blank(c) for c in row)), -1
+            )
+        if header_row >= 0 and len(buffered) - header_row - 1 >= sample_rows:
+            break
+    if header_row < 0:
+        return ResponseMatrix.from_rows([], n_items=0), ColumnDetection([], [], 0.0, -1, 0, 0)
+
+    header = buffered[header_row]
+    sample = buffered[header_row + 1 : header_row + 1 + sample_rows]
+    detection = detect_from_sample(header, sample, header_row, len(buffered) - header_row - 1)
+    qcols = detection.question_columns or list(range(max(len(row) for row in [header, *sample])))
+    del sample
+
+    correct_parts: List[np.ndarray] = []
+    observed_parts: List[np.ndarray] = []
+
+    def pack(rows: Sequence[Sequence[Any]]) -> None:
+        codes = clean_chunk_codes(rows, qcols, fill_missing)
+        correct_parts.append(np.packbits(codes == 1, axis=1))
+        observed_parts.append(np.packbits(codes >= 0, axis=1))
+
+    # Sarlavha ham ma'lumot bo'lishi mumkin (0/1 bo'lsa qator saqlanadi)
+    for start in range(header_row, len(buffered), CSV_CHUNK_ROWS):
+        pack(buffered[start : start + CSV_CHUNK_ROWS])
+    buffered.clear()
+    for block in chunks:
+        detection.total_rows += len(block)
+        pack(block)
+
+    empty = np.zeros((0, (len(qcols) + 7) // 8), dtype=np.uint8)
+    return ResponseMatrix(
+        np.concatenate(correct_parts) if correct_parts else empty,
+        np.concatenate(observed_parts) if observed_parts else empty,
+        len(qcols),
+    ), detection
+
+
+# ---------- Excel (.xlsx) ----------
+
+XLSX_SUFFIXES = (".xlsx", ".xlsm")
+
+
+def _open_workbook(path: Union[str, Path]) -> Any:
+    # openpyxl ixtiyoriy: faqat Excel yuklamalar uchun kerak
+    try:
+        import openpyxl
+    except ImportError as e:
+        raise MissingDependencyError("Excel fayllar uchun openpyxl o'rnatilmagan: pip install openpyxl") from e
+    return openpyxl.load_workbook(str(path), read_only=True, data_only=True)
+
+
+def _pick_sheet(workbook: Any, sheet: Optional[str]) -> Any:
+    """Foydalanuvchi tanlagan varaq (nomi yoki 1 dan boshlangan tartib raqami) yoki birinchi ma'lumotli varaq"""
+    if sheet:
+        if sheet in workbook.sheetnames:
+            return workbook[sheet]
+        if sheet.isdigit() and 1 <= int(sheet) <= len(workbook.worksheets):
+            return workbook.worksheets[int(sheet) - 1]
+        raise ValueError(f"'{sheet}' varag'i topilmadi. Mavjud varaqlar: {', '.join(workbook.sheetnames)}")
+    for worksheet in workbook.worksheets:
+        for row in worksheet.iter_rows(max_row=100, values_only=True):
+            if any(v is not None and str(v).strip() for v in row):
+                return worksheet
+    return workbook.worksheets[0]
+
+
+def iter_xlsx_chunks(
+    path: Union[str, Path],
+    sheet: Optional[str] = None,
+    chunk_rows: int = CSV_CHUNK_ROWS,
+) -> Iterator[List[Tuple[Any, ...]]]:
+    """Varaq qatorlarini read-only rejimda bo'laklab qaytaradi (butun kitob xotiraga yuklanmaydi)"""
+    workbook = _open_workbook(path)
+    try:
+        worksheet = _pick_sheet(workbook, sheet)
+        block: List[Tuple[Any, ...]] = []
+        for row in worksheet.iter_rows(values_only=True):
+            # Excel dagi bo'sh qatorlar (faqat None) tashlanadi
+            if all(v is None for v in row):
+                continue
+            block.append(row)
+            if len(block) >= chunk_rows:
+                yield block
+                block = []
+        if block:
+            yield block
+    finally:
+        workbook.close()
+
+
+def read_xlsx_compact(
+    path: Union[str, Path],
+    sheet: Optional[str] = None,
+    fill_missing: Optional[int] = None,
+    chunk_rows: int = CSV_CHUNK_ROWS,
+    sample_rows: int = DETECTION_SAMPLE_ROWS,
+) -> Tuple[ResponseMatrix, ColumnDetection]:
+    """Excel varag'ini (birinchi ma'lumotli yoki sheet) bir o'tishda ResponseMatrix ga o'qish"""
+    return compact_from_stream(iter_xlsx_chunks(path, sheet, chunk_rows), fill_missing, sample_rows)
+
+# ---------- Ustunli formatlar: Parquet / Arrow IPC / .npy ----------
+
+COLUMNAR_FORMATS: Dict[str, str] = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+    ".npy": "npy",
+}
+
+Source = Union[str, Path, bytes]
+
+
+def columnar_format(filename: str) -> Optional[str]:
+    """Fayl kengaytmasi bo'yicha format nomi (parquet | arrow | npy) yoki None"""
+    return COLUMNAR_FORMATS.get(Path(filename).suffix.lower())
+
+
+def load_columnar(
+    source: Source,
+    fmt: str,
+    fill_missing: Optional[int] = None,
+) -> Tuple[ResponseMatrix, ColumnDetection]:
+    """
+    Parquet, Arrow IPC yoki .npy yuklamani ResponseMatrix ga o'qish.
+
+    Son/bool ustunlar numpy ga nusxasiz (imkon bo'lsa) olinib vektorli kodlanadi — yacheykalar
+    _normalize_cell orqali o'tmaydi; matnli ustunlar noyob qiymatlar bo'yicha kodlanadi.
+    """
+    if fmt == "npy":
+        return _load_npy(source, fill_missing)
+    if fmt in ("parquet", "arrow"):
+        names, columns = _read_arrow_columns(source, fmt)
+        codes = np.empty((len(columns[0]) if columns else 0, len(columns)), dtype=np.int8)
+        for j, values in enumerate(columns):
+            codes[:, j] = column_codes(values)
+        return _codes_to_matrix(names, codes, fill_missing)
+    raise ValueError(f"Noma'lum format: {fmt}. Mumkin qiymatlar: parquet, arrow, npy")
+
+
+def _load_npy(source: Source, fill_missing: Optional[int]) -> Tuple[ResponseMatrix, ColumnDetection]:
+    # Fayl yo'li berilsa memory-map: massiv xotiraga to'liq ko'chirilmaydi
+    if isinstance(source, bytes):
+        arr = np.load(io.BytesIO(source), allow_pickle=False)
+    else:
+        arr = np.load(Path(source), mmap_mode="r", allow_pickle=False)
+    if arr.ndim != 2:
+        raise ValueError(f"Massiv ikki o'lchamli bo'lishi kerak, berilgan: {arr.ndim}")
+
+    n, k = arr.shape
+    if arr.dtype.kind in "biuf" and _is_binary(arr):
+        # Faqat 0/1 (va NaN) — sof javoblar matritsasi: barcha ustunlar savol, kodlash shart emas
+        labels = [f"{j + 1}-ustun" for j in range(k)]
+        detection = ColumnDetection(list(range(k)), labels, 1.0, -1, n, n, [1.0] * k)
+        return _pack_binary(arr, fill_missing), detection
+    return _codes_to_matrix([], column_codes(np.asarray(arr)), fill_missing)
+
+
+def _is_binary(arr: np.ndarray) -> bool:
+    for start in range(0, arr.shape[0], CHUNK_ROWS):
+        block = np.asarray(arr[start : start + CHUNK_ROWS])
+        ok = (block == 0) | (block == 1)
+        if block.dtype.kind == "f":
+            ok |= np.isnan(block)
+        if not ok.all():
+            return False
+    return True
+
+
+def _pack_binary(arr: np.ndarray, fill_missing: Optional[int]) -> ResponseMatrix:
+    correct_parts: List[np.ndarray] = []
+    observed_parts: List[np.ndarray] = []
+    for start in range(0, arr.shape[0], CHUNK_ROWS):
+        block = np.asarray(arr[start : start + CHUNK_ROWS])
+        observed = ~np.isnan(block) if block.dtype.kind == "f" else np.ones(block.shape, dtype=bool)
+        answered = observed.any(axis=1)
+        correct = (block == 1) & observed
+        if not answered.all():
+            correct, observed = correct[answered], observed[answered]
+        if fill_missing in (0, 1):
+            correct = correct | (~observed & bool(fill_missing))
+            observed = np.ones_like(observed)
+        correct_parts.append(np.packbits(correct, axis=1))
+        observed_parts.append(np.packbits(observed, axis=1))
+    n_bytes = (arr.shape[1] + 7) // 8
+    empty = np.zeros((0, n_bytes), dtype=np.uint8)
+    return ResponseMatrix(
+        np.concatenate(correct_parts) if correct_parts else empty,
+        np.concatenate(observed_parts) if observed_parts else empty,
+        arr.shape[1],
+    )
+
+
+def _codes_to_matrix(
+    header: Sequence[Any],
+    codes: np.ndarray,
+    fill_missing: Optional[int],
+) -> Tuple[ResponseMatrix, ColumnDetection]:
+    detection = detect_from_codes(header, codes)
+    qcols = detection.question_columns or list(range(codes.shape[1]))
+    n_bytes = (len(qcols) + 7) // 8
+    correct = np.zeros((codes.shape[0], n_bytes), dtype=np.uint8)
+    observed = np.zeros((codes.shape[0], n_bytes), dtype=np.uint8)
+    filled = 0
+    for start in range(0, codes.shape[0], CHUNK_ROWS):
+        block = finish_codes(codes[start : start + CHUNK_ROWS, qcols], fill_missing)
+        end = filled + block.shape[0]
+        correct[filled:end] = np.packbits(block == 1, axis=1)
+        observed[filled:end] = np.packbits(block >= 0, axis=1)
+        filled = end
+    item_ids = [header[j] for j in qcols] if header else None
+    return ResponseMatrix(correct[:filled], observed[:filled], len(qcols), item_ids=item_ids), detection
+
+
+def _read_arrow_columns(source: Source, fmt: str) -> Tuple[List[str], List[np.ndarray]]:
+    # pyarrow ixtiyoriy: faqat Parquet/Arrow yuklamalar uchun kerak
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise MissingDependencyError("Parquet/Arrow fayllar uchun pyarrow o'rnatilmagan: pip install pyarrow") from e
+
+    def open_source() -> Any:
+        return pa.BufferReader(source) if isinstance(source, bytes) else pa.memory_map(str(source), "r")
+
+    if fmt == "parquet":
+        table = pq.read_table(open_source())
+    else:
+        try:
+            table = ipc.open_file(open_source()).read_all()
+        except pa.ArrowInvalid:
+            # Arrow IPC oqim (stream) formati
+            table = ipc.open_stream(open_source()).read_all()
+
+    # Bo'shliqsiz son ustunlar to'g'ridan-to'g'ri (bitta bo'lakda nusxasiz) numpy ga o'tadi;
+    # bo'shliqlar NaN/None bo'ladi, matnli ustunlar object massiv sifatida
+    columns = [column.to_numpy() for column in table.columns]
+    return [str(name) for name in table.column_names], columns
+
+
+# ---------- Yuklangan fayl ----------
+
+def is_supported_upload(file_name: str) -> bool:
+    name = file_name.lower()
+    return name.endswith(".csv") or name.endswith(XLSX_SUFFIXES) or columnar_format(name) is not None
+
+
+def load_upload(
+    path: Union[str, Path],
+    file_name: str,
+    sheet: Optional[str] = None,
+) -> Tuple[ResponseMatrix, ColumnDetection]:
+    """
+    Yuklangan faylni kengaytmasi bo'yicha o'qish: CSV — oqim bilan bo'laklab; Excel — read-only
+    rejimda birinchi ma'lumotli (yoki sheet) varaq; Parquet/Arrow/.npy — ustunli formatdan.
+    """
+    if file_name.lower().endswith(XLSX_SUFFIXES):
+        return read_xlsx_compact(path, sheet=sheet)
+    fmt = columnar_format(file_name)
+    if fmt is not None:
+        return load_columnar(path, fmt)
+    return read_csv_compact(path)
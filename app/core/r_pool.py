@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import collections
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Deque, List, Optional
+
+from .r_runner import R_TIMEOUT
+
+# Doimiy Rscript ishchilari havzasi: har bir ishchi ltm ni bir marta yuklaydi va
+# matritsalarni stdin/stdout orqali qatorma-qator JSON ko'rinishida qabul qiladi
+# (protokol: app/r/rasch_worker.R).
+
+WORKER_SCRIPT = (Path(__file__).resolve().parents[1] / "r" / "rasch_worker.R").resolve()
+
+R_WORKERS = int(os.getenv("RASCH_R_WORKERS", "0") or 0)
+R_STARTUP_TIMEOUT = float(os.getenv("RASCH_R_STARTUP_TIMEOUT", "60") or 60)
+R_HEALTH_INTERVAL = float(os.getenv("RASCH_R_HEALTH_INTERVAL", "30") or 30)
+
+
+class RWorker:
+    def __init__(self, script_path: Path = WORKER_SCRIPT, startup_timeout: float = R_STARTUP_TIMEOUT) -> None:
+        try:
+            self.proc = subprocess.Popen(
+                ["Rscript", str(script_path)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                bufsize=1,
+            )
+        except FileNotFoundError as e:
+            raise RuntimeError(
+                "Rscript topilmadi. Iltimos, R o'rnatilganligini va 'Rscript' tizim PATH ichida ekanligini tekshiring."
+            ) from e
+
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._stderr: Deque[str] = collections.deque(maxlen=20)
+        threading.Thread(target=self._pump_stdout, daemon=True).start()
+        threading.Thread(target=self._pump_stderr, daemon=True).start()
+
+        hello = self._read(startup_timeout)
+        if not hello.get("ready"):
+            self.kill()
+            raise RuntimeError(f"R ishchisi ishga tushmadi: {hello}")
+
+    def _pump_stdout(self) -> None:
+        assert self.proc.stdout is not None
+        for line in self.proc.stdout:
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def _pump_stderr(self) -> None:
+        assert self.proc.stderr is not None
+        for line in self.proc.stderr:
+            self._stderr.append(line.rstrip())
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def _read(self, timeout: float) -> dict[str, Any]:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.kill()
+                raise TimeoutError(f"R ishchisi {timeout:.0f} soniyada javob bermadi")
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                try:
+                    code: Optional[int] = self.proc.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    code = None
+                stderr_msg = " ".join(self._stderr)
+                raise RuntimeError(f"R ishchisi to'xtab qoldi. Kod: {code}. Xabar: {stderr_msg}")
+            text = line.strip()
+            if not text:
+                continue
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError:
+                # R paketlari ba'zan stdout ga matn chiqaradi — JSON bo'lmagan qatorlar tashlab ketiladi
+                continue
+
+    def request(self, payload: dict[str, Any], timeout: float) -> dict[str, Any]:
+        assert self.proc.stdin is not None
+        try:
+            self.proc.stdin.write(json.dumps(payload) + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.kill()
+            raise RuntimeError(f"R ishchisiga yozib bo'lmadi: {e}") from e
+        return self._read(timeout)
+
+    def ping(self, timeout: float = 5.0) -> bool:
+        try:
+            return bool(self.request({"cmd": "ping"}, timeout).get("ok"))
+        except (RuntimeError, TimeoutError):
+            return False
+
+    def kill(self) -> None:
+        if self.alive:
+            self.proc.kill()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def close(self) -> None:
+        if self.alive and self.proc.stdin is not None:
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self.kill()
+
+
+class RWorkerPool:
+    def __init__(
+        self,
+        size: int = 2,
+        timeout: float = R_TIMEOUT,
+        startup_timeout: float = R_STARTUP_TIMEOUT,
+        health_interval: float = R_HEALTH_INTERVAL,
+        script_path: Path = WORKER_SCRIPT,
+    ) -> None:
+        if size < 1:
+            raise ValueError("R ishchilari soni kamida 1 bo'lishi kerak")
+        if not script_path.exists():
+            raise RuntimeError(f"R skript topilmadi: {script_path}")
+        self.size = size
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.health_interval = health_interval
+        self.script_path = script_path
+
+        self._idle: "queue.Queue[Optional[RWorker]]" = queue.Queue()
+        self._closed = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+
+    def start(self) -> "RWorkerPool":
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        if self.health_interval > 0:
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._health_thread.start()
+        return self
+
+    def _spawn(self) -> Optional[RWorker]:
+        try:
+            return RWorker(self.script_path, self.startup_timeout)
+        except (RuntimeError, TimeoutError):
+            # Keyingi so'rov yoki sog'liq tekshiruvida qayta urinib ko'riladi
+            return None
+
+    def _acquire(self, timeout: float) -> RWorker:
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty as e:
+            raise RuntimeError(f"Bo'sh R ishchisi {timeout:.0f} soniyada topilmadi") from e
+        if worker is None or not worker.alive:
+            if worker is not None:
+                worker.kill()
+            worker = self._spawn()
+            if worker is None:
+                self._idle.put(None)
+                raise RuntimeError("R ishchisini ishga tushirib bo'lmadi")
+        return worker
+
+    def run(self, matrix: List[List[Optional[int]]], timeout: Optional[float] = None) -> dict[str, Any]:
+        if self._closed.is_set():
+            raise RuntimeError("R ishchilari havzasi yopilgan")
+        limit = self.timeout if timeout is None else timeout
+        worker = self._acquire(limit)
+        try:
+            result = worker.request({"cmd": "fit", "responses": matrix}, limit)
+        except TimeoutError as e:
+            raise RuntimeError(f"R hisoblash vaqti tugadi ({limit:.0f} s). Ishchi qayta ishga tushiriladi.") from e
+        finally:
+            # Qulagan yoki to'xtatilgan ishchi keyingi _acquire da almashtiriladi
+            self._idle.put(worker)
+
+        if "error" in result:
+            raise RuntimeError(f"R hisoblash xatosi: {result['error']}")
+        return result
+
+    def health_check(self) -> int:
+        """Bo'sh turgan ishchilarni tekshiradi, javob bermaganlarini qayta ishga tushiradi"""
+        restarted = 0
+        for _ in range(self.size):
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is None or not worker.ping():
+                if worker is not None:
+                    worker.kill()
+                worker = self._spawn()
+                restarted += 1
+            self._idle.put(worker)
+        return restarted
+
+    def _health_loop(self) -> None:
+        while not self._closed.wait(self.health_interval):
+            self.health_check()
+
+    def close(self) -> None:
+        self._closed.set()
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.close()
+
+
+_pool: Optional[RWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def start_pool(size: int = R_WORKERS) -> Optional[RWorkerPool]:
+    """RASCH_R_WORKERS > 0 bo'lsa jarayon uchun umumiy havzani ishga tushiradi"""
+    global _pool
+    if size < 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = RWorkerPool(size=size).start()
+    return _pool
+
+
+def get_pool() -> Optional[RWorkerPool]:
+    return _pool
+
+
+def stop_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
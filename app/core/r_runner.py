@@ -1,12 +1,36 @@
 from __future__ import annotations
 
 import json
+import os
 import subprocess
 from pathlib import Path
-from typing import Any
+from typing import Any, List, Optional, Union
 
+import numpy as np
 
-def run_rasch_model(csv_path: Path) -> dict[str, Any]:
+from .response_matrix import ResponseMatrix
+
+R_TIMEOUT = float(os.getenv("RASCH_R_TIMEOUT", "120") or 120)
+
+
+def write_matrix_csv(temp_dir: Path, matrix: Union[List[List[Optional[int]]], ResponseMatrix]) -> Path:
+    # No header; values separated by commas; missing represented as empty field
+    csv_path = temp_dir / "responses.csv"
+    with csv_path.open("w", encoding="utf-8") as f:
+        if isinstance(matrix, ResponseMatrix):
+            # Ixcham matritsa bo'laklab yoziladi — ro'yxatga o'tkazilmaydi
+            for start in range(0, matrix.n_persons, 8192):
+                correct, observed = matrix.unpack(slice(start, start + 8192))
+                cells = np.where(observed, np.where(correct, "1", "0"), "")
+                f.write("".join(",".join(row) + "\n" for row in cells.tolist()))
+            return csv_path
+        for row in matrix:
+            row_str = ",".join("" if v is None else str(int(v)) for v in row)
+            f.write(row_str + "\n")
+    return csv_path
+
+
+def run_rasch_model(csv_path: Path, timeout: Optional[float] = None) -> dict[str, Any]:
     script_path = (Path(__file__).resolve().parents[1] / "r" / "rasch_calc.R").resolve()
 
     if not script_path.exists():
@@ -20,17 +44,21 @@ def run_rasch_model(csv_path: Path) -> dict[str, Any]:
         str(csv_path),
     ]
 
+    limit = R_TIMEOUT if timeout is None else timeout
     try:
         proc = subprocess.run(
             cmd,
             check=False,
             capture_output=True,
             text=True,
+            timeout=limit,
         )
     except FileNotFoundError as e:
         raise RuntimeError(
             "Rscript topilmadi. Iltimos, R o'rnatilganligini va 'Rscript' tizim PATH ichida ekanligini tekshiring."
         ) from e
+    except subprocess.TimeoutExpired as e:
+        raise RuntimeError(f"R hisoblash vaqti tugadi ({limit:.0f} s)") from e
 
     if proc.returncode != 0:
         stderr_msg = (proc.stderr or "").strip()
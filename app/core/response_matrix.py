@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# Ixcham javoblar matritsasi: to'g'ri javoblar va berilgan savollar maskasi
+# np.packbits bilan qatorma-qator bitlarga joylanadi (har bir yacheyka uchun 2 bit).
+# 1 000 000 talabgor x 40 savol ~ 10 MB (List[List[Optional[int]]] da bir necha GB).
+
+CHUNK_ROWS = 65_536
+
+# 0..255 baytdagi birlar soni
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def _popcount_rows(packed: np.ndarray) -> np.ndarray:
+    out = np.empty(packed.shape[0], dtype=np.int64)
+    for start in range(0, packed.shape[0], CHUNK_ROWS):
+        block = packed[start : start + CHUNK_ROWS]
+        out[start : start + block.shape[0]] = _POPCOUNT[block].sum(axis=1, dtype=np.int64)
+    return out
+
+
+class ResponseMatrix:
+    """Bitlarga joylangan 0/1 javoblar: correct (to'g'ri javoblar) va observed (berilgan savollar).
+
+    Invariant: berilmagan savollarda correct biti 0. person_ids / item_ids ixtiyoriy.
+    """
+
+    __slots__ = ("n_persons", "n_items", "correct", "observed", "person_ids", "item_ids")
+
+    def __init__(
+        self,
+        correct: np.ndarray,
+        observed: np.ndarray,
+        n_items: int,
+        person_ids: Optional[Sequence[Any]] = None,
+        item_ids: Optional[Sequence[Any]] = None,
+    ) -> None:
+        n_bytes = (n_items + 7) // 8
+        if correct.shape != observed.shape or correct.ndim != 2 or correct.shape[1] != n_bytes:
+            raise ValueError("Bit massivlari o'lchami mos emas")
+        self.n_persons = int(correct.shape[0])
+        self.n_items = int(n_items)
+        self.correct = np.ascontiguousarray(correct, dtype=np.uint8) & observed
+        self.observed = np.ascontiguousarray(observed, dtype=np.uint8)
+        self.person_ids = list(person_ids) if person_ids is not None else None
+        self.item_ids = list(item_ids) if item_ids is not None else None
+        if self.person_ids is not None and len(self.person_ids) != self.n_persons:
+            raise ValueError("person_ids soni qatorlar soniga mos emas")
+        if self.item_ids is not None and len(self.item_ids) != self.n_items:
+            raise ValueError("item_ids soni savollar soniga mos emas")
+
+    # ---------- Construction ----------
+
+    @classmethod
+    def from_dense(
+        cls,
+        matrix: Any,
+        person_ids: Optional[Sequence[Any]] = None,
+        item_ids: Optional[Sequence[Any]] = None,
+    ) -> "ResponseMatrix":
+        """Zich massiv yoki ro'yxatlar (None/NaN — berilmagan)"""
+        arr = np.array(matrix, dtype=float)
+        if arr.ndim != 2:
+            raise ValueError("Matritsa ikki o'lchamli bo'lishi kerak")
+        observed = ~np.isnan(arr)
+        return cls(
+            np.packbits(observed & (arr == 1), axis=1),
+            np.packbits(observed, axis=1),
+            arr.shape[1],
+            person_ids,
+            item_ids,
+        )
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Sequence[Optional[int]]],
+        n_items: Optional[int] = None,
+        person_ids: Optional[Sequence[Any]] = None,
+        item_ids: Optional[Sequence[Any]] = None,
+        chunk_rows: int = CHUNK_ROWS,
+    ) -> "ResponseMatrix":
+        """Qatorlar oqimidan bo'laklab yig'ish — butun matritsa ro'yxat ko'rinishida saqlanmaydi"""
+        correct_parts: List[np.ndarray] = []
+        observed_parts: List[np.ndarray] = []
+        block: List[Sequence[Optional[int]]] = []
+
+        def flush() -> None:
+            arr = np.array([[np.nan if v is None else v for v in row] for row in block], dtype=float)
+            if arr.shape[1] != n_items:
+                raise ValueError(f"Qator uzunligi mos emas: {arr.shape[1]} != {n_items}")
+            observed = ~np.isnan(arr)
+            correct_parts.append(np.packbits(observed & (arr == 1), axis=1))
+            observed_parts.append(np.packbits(observed, axis=1))
+            block.clear()
+
+        for row in rows:
+            if n_items is None:
+                n_items = len(row)
+            block.append(row)
+            if len(block) >= chunk_rows:
+                flush()
+        if block:
+            flush()
+        if n_items is None:
+            raise ValueError("Matritsa bo'sh")
+
+        n_bytes = (n_items + 7) // 8
+        empty = np.zeros((0, n_bytes), dtype=np.uint8)
+        return cls(
+            np.concatenate(correct_parts) if correct_parts else empty,
+            np.concatenate(observed_parts) if observed_parts else empty,
+            n_items,
+            person_ids,
+            item_ids,
+        )
+
+    @classmethod
+    def from_sparse(
+        cls,
+        matrix: sparse.spmatrix,
+        person_ids: Optional[Sequence[Any]] = None,
+        item_ids: Optional[Sequence[Any]] = None,
+    ) -> "ResponseMatrix":
+        """Siyrak matritsa: saqlangan yacheykalar — berilgan javoblar"""
+        csr = sparse.csr_matrix(matrix, dtype=float)
+        csr.sum_duplicates()
+        n, k = csr.shape
+        n_bytes = (k + 7) // 8
+        correct = np.zeros((n, n_bytes), dtype=np.uint8)
+        observed = np.zeros((n, n_bytes), dtype=np.uint8)
+        for start in range(0, n, CHUNK_ROWS):
+            sub = csr[start : start + CHUNK_ROWS]
+            rows = np.repeat(np.arange(sub.shape[0]), np.diff(sub.indptr))
+            obs = np.zeros(sub.shape, dtype=bool)
+            cor = np.zeros(sub.shape, dtype=bool)
+            obs[rows, sub.indices] = True
+            cor[rows, sub.indices] = sub.data == 1
+            observed[start : start + sub.shape[0]] = np.packbits(obs, axis=1)
+            correct[start : start + sub.shape[0]] = np.packbits(cor, axis=1)
+        return cls(correct, observed, k, person_ids, item_ids)
+
+    # ---------- Properties ----------
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.n_persons, self.n_items
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.correct.nbytes + self.observed.nbytes)
+
+    def __len__(self) -> int:
+        return self.n_persons
+
+    def __repr__(self) -> str:
+        return f"ResponseMatrix({self.n_persons} x {self.n_items}, {self.nbytes / 1e6:.1f} MB)"
+
+    # ---------- Access ----------
+
+    def unpack(self, rows: Any = slice(None)) -> Tuple[np.ndarray, np.ndarray]:
+        """Tanlangan qatorlar uchun (to'g'ri, berilgan) bool massivlari"""
+        correct = np.unpackbits(self.correct[rows], axis=-1, count=self.n_items).astype(bool)
+        observed = np.unpackbits(self.observed[rows], axis=-1, count=self.n_items).astype(bool)
+        return correct, observed
+
+    def to_float(self, rows: Any = slice(None)) -> np.ndarray:
+        """Zich float massiv (berilmagan — NaN)"""
+        correct, observed = self.unpack(rows)
+        return np.where(observed, correct.astype(float), np.nan)
+
+    def __array__(self, dtype: Any = None, copy: Any = None) -> np.ndarray:
+        arr = self.to_float()
+        return arr if dtype is None else arr.astype(dtype)
+
+    def iter_chunks(self, chunk_rows: int = CHUNK_ROWS) -> Iterator[Tuple[int, np.ndarray]]:
+        """(boshlang'ich qator, zich float bo'lak) juftliklari"""
+        for start in range(0, self.n_persons, chunk_rows):
+            yield start, self.to_float(slice(start, start + chunk_rows))
+
+    def to_sparse(self) -> sparse.csr_matrix:
+        parts = []
+        for start in range(0, self.n_persons, CHUNK_ROWS):
+            correct, observed = self.unpack(slice(start, start + CHUNK_ROWS))
+            rows, cols = np.nonzero(observed)
+            parts.append(sparse.csr_matrix(
+                (correct[rows, cols].astype(float), (rows, cols)), shape=observed.shape
+            ))
+        if not parts:
+            return sparse.csr_matrix((0, self.n_items))
+        return sparse.vstack(parts, format="csr")
+
+    def to_list(self) -> List[List[Optional[int]]]:
+        """R va JSON uchun List[List[Optional[int]]] (katta matritsalarda qimmat)"""
+        out: List[List[Optional[int]]] = []
+        for _, chunk in self.iter_chunks():
+            out.extend([None if np.isnan(v) else int(v) for v in row] for row in chunk)
+        return out
+
+    def select_rows(self, rows: Any) -> "ResponseMatrix":
+        idx = np.arange(self.n_persons)[rows]
+        return ResponseMatrix(
+            self.correct[idx],
+            self.observed[idx],
+            self.n_items,
+            [self.person_ids[i] for i in idx] if self.person_ids is not None else None,
+            self.item_ids,
+        )
+
+    def fill_missing(self, value: int) -> "ResponseMatrix":
+        """Berilmagan savollarni 0 yoki 1 bilan to'ldirish"""
+        full = np.packbits(np.ones((1, self.n_items), dtype=bool), axis=1)
+        correct = self.correct | (~self.observed & full) if value == 1 else self.correct.copy()
+        return ResponseMatrix(
+            correct,
+            np.broadcast_to(full, self.observed.shape).copy(),
+            self.n_items,
+            self.person_ids,
+            self.item_ids,
+        )
+
+    # ---------- Summaries ----------
+
+    def raw_scores(self) -> np.ndarray:
+        return _popcount_rows(self.correct)
+
+    def n_observed(self) -> np.ndarray:
+        return _popcount_rows(self.observed)
+
+    def item_totals(self) -> np.ndarray:
+        totals = np.zeros(self.n_items)
+        for start in range(0, self.n_persons, CHUNK_ROWS):
+            totals += np.unpackbits(
+                self.correct[start : start + CHUNK_ROWS], axis=1, count=self.n_items
+            ).sum(axis=0)
+        return totals
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from scipy import sparse
+
+from .response_matrix import ResponseMatrix
+
+# Bir xil matritsa uchun natija keshi: o'qituvchilar bir faylni qayta-qayta yuboradi (xatodan
+# so'ng, hamkasbiga, API va bot orqali). Kalit — tozalangan matritsaning bitlari + engine va
+# parametrlar xeshi. Ikki qavat: jarayon xotirasidagi LRU va hajmi cheklangan disk papkasi
+# (API, bot va havza ishchilari uchun umumiy). Qiymatlar baytlarda saqlanadi — har bir
+# olishda yangi nusxa, keyingi o'zgartirishlar keshni buzmaydi.
+
+RESULT_CACHE_MEMORY_MB = float(os.getenv("RASCH_RESULT_CACHE_MEMORY_MB", "128") or 0)
+RESULT_CACHE_DISK_MB = float(os.getenv("RASCH_RESULT_CACHE_DISK_MB", "512") or 0)
+RESULT_CACHE_DIR = os.getenv("RASCH_RESULT_CACHE_DIR", "./results/cache")
+
+# Natija shakli o'zgarganda oshiriladi (eski disk keshi yozuvlari ishlatilmaydi)
+_FORMAT_VERSION = "2"
+
+
+def matrix_key(matrix: Any, **options: Any) -> str:
+    """Matritsa mazmuni (ro'yxat, siyrak yoki ixcham ko'rinishidan qat'i nazar) va parametrlar xeshi"""
+    if isinstance(matrix, ResponseMatrix):
+        packed = matrix
+    elif sparse.issparse(matrix):
+        packed = ResponseMatrix.from_sparse(matrix)
+    else:
+        packed = ResponseMatrix.from_dense(matrix)
+    digest = hashlib.sha1(f"{_FORMAT_VERSION}:{packed.n_persons}x{packed.n_items}".encode())
+    digest.update(packed.correct.tobytes())
+    digest.update(packed.observed.tobytes())
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def result_digest(result: Dict[str, Any]) -> str:
+    """Natija mazmuni xeshi (PDF keshi kaliti); hisoblash vaqti ('timestamp') mazmunga kirmaydi"""
+    content = {field: value for field, value in result.items() if field != "timestamp"}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(
+        self,
+        memory_bytes: float = RESULT_CACHE_MEMORY_MB * 1e6,
+        directory: Optional[str] = RESULT_CACHE_DIR,
+        disk_bytes: float = RESULT_CACHE_DISK_MB * 1e6,
+    ) -> None:
+        self.memory_bytes = int(memory_bytes)
+        self.disk_bytes = int(disk_bytes)
+        self.directory = Path(directory) if directory and self.disk_bytes > 0 else None
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- Baytlar ----------
+
+    def get(self, kind: str, key: str) -> Optional[bytes]:
+        name = f"{key}.{kind}"
+        with self._lock:
+            data = self._memory.get(name)
+            if data is not None:
+                self._memory.move_to_end(name)
+                self.hits += 1
+                return data
+        data = self._read_disk(name)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(name, data)
+        return data
+
+    def put(self, kind: str, key: str, data: bytes) -> None:
+        name = f"{key}.{kind}"
+        with self._lock:
+            self._remember(name, data)
+        self._write_disk(name, data)
+
+    def _remember(self, name: str, data: bytes) -> None:
+        if len(data) > self.memory_bytes:
+            return
+        previous = self._memory.pop(name, None)
+        if previous is not None:
+            self._memory_used -= len(previous)
+        self._memory[name] = data
+        self._memory_used += len(data)
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+
+    def _read_disk(self, name: str) -> Optional[bytes]:
+        if self.directory is None:
+            return None
+        path = self.directory / name
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # LRU: oxirgi foydalanish vaqti
+        except OSError:
+            return None
+        return data
+
+    def _write_disk(self, name: str, data: bytes) -> None:
+        if self.directory is None or len(data) > self.disk_bytes:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = self.directory / f".{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            tmp.write_bytes(data)
+            os.replace(tmp, self.directory / name)
+            self._evict_disk()
+        except OSError:
+            # Disk keshi ixtiyoriy — yozib bo'lmasa hisob natijasi baribir qaytariladi
+            pass
+
+    def _evict_disk(self) -> None:
+        assert self.directory is not None
+        entries = []
+        for path in self.directory.iterdir():
+            if path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        used = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if used <= self.disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            used -= size
+
+    # ---------- Natijalar va PDF ----------
+
+    def result(self, key: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Natija keshda bo'lsa qaytariladi (nusxa), aks holda hisoblanib saqlanadi"""
+        data = self.get("json", key)
+        if data is not None:
+            return json.loads(data)
+        result = compute()
+        try:
+            self.put("json", key, json.dumps(result).encode())
+        except (TypeError, ValueError):
+            pass
+        return result
+
+    def pdf(self, result: Dict[str, Any], render: Callable[..., bytes], **options: Any) -> bytes:
+        """Aynan shu natija (va chizish parametrlari) uchun PDF avval yaratilgan bo'lsa — qayta chizilmaydi"""
+        # 'timestamp' parametrlar bilan ham kalitga kirmaydi (result_digest uni faqat yuqori darajada tashlaydi)
+        key = result_digest({**result, "_options": options}) if options else result_digest(result)
+        data = self.get("pdf", key)
+        if data is None:
+            data = render(result, **options)
+            self.put("pdf", key, data)
+        return data
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+        if self.directory is not None and self.directory.exists():
+            for path in self.directory.iterdir():
+                path.unlink(missing_ok=True)
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
@@ -1,68 +1,321 @@
 from __future__ import annotations
 
 import json
-import os
+import shutil
 import tempfile
-from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Union
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse, Response
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi import Query
 
 from .schemas import CalculateRequest
-from .core.cleaning import clean_response_matrix
-from .core.r_runner import run_rasch_model
+from .core.cleaning import ColumnDetection, clean_response_matrix, detect_question_columns
+from .core.engine import ENGINES, resolve_engine, run_engine
+from .core.ingest import COLUMNAR_FORMATS, MissingDependencyError, columnar_format, load_columnar
+from .core.response_matrix import ResponseMatrix
+from .core.r_pool import start_pool, stop_pool
 from app.services.scoring import enrich_person_scores
-from app.services.pdf_generator import create_rasch_pdf_report
+from app.services.pdf_generator import create_roster_appendix
+from app.services.item_bank import EXAM_FORM_PREFIX, ItemBank, WaveConflictError
+from app.services.artifacts import get_artifact_store, save_report
+from app.services.certificates import stop_certificate_pool, write_certificates_zip
+from app.services.executor import render_pdf
+from app.services.report_resources import warm_up_report_resources
+from app.services.jobs import DONE, FAILED, Job, JobQueueFullError, get_job_queue, stop_job_queue
+
+# API PDF lari doim to'liq ro'yxat bilan (katta guruhda sahifa hajmidagi jadvallar): ilova faylni
+# faqat bot PDF dan keyin yuboradi, API mijozi uni alohida olmaydi — kerak bo'lsa format=csv|xlsx
+API_ROSTER_APPENDIX = False
+
+# /calculate/upload: yuklama diskka shu o'lchamdagi bo'laklar bilan ko'chiriladi
+UPLOAD_COPY_CHUNK = 1024 * 1024
 
 app = FastAPI(
     title="Rasch Model Calculator",
     version="1.0.0",
-    description="FastAPI backend that delegates Rasch model estimation to R (ltm::rasch) and returns JSON or PDF results.",
+    description="FastAPI backend for Rasch model estimation (R ltm::rasch or in-process NumPy) that returns JSON or PDF results.",
 )
 
-def _write_matrix_to_csv(temp_dir: Path, matrix: List[List[Optional[int]]]) -> Path:
-    # No header; values separated by commas; missing represented as empty field
-    csv_path = temp_dir / "responses.csv"
-    with csv_path.open("w", encoding="utf-8") as f:
-        for row in matrix:
-            row_str = ",".join("" if v is None else str(int(v)) for v in row)
-            f.write(row_str + "\n")
-    return csv_path
+@app.on_event("startup")
+def _start_r_workers() -> None:
+    # RASCH_R_WORKERS > 0 bo'lsa ltm bir marta yuklanadi va so'rovlar doimiy ishchilarga yuboriladi
+    start_pool()
+    # Hisobot shriftlari va uslublari birinchi PDF so'rovigacha yuklanadi
+    warm_up_report_resources()
+
+
+@app.on_event("shutdown")
+def _stop_r_workers() -> None:
+    stop_job_queue()
+    stop_certificate_pool()
+    stop_pool()
+
 
 @app.post("/calculate")
 def calculate(
     request: CalculateRequest, 
-    format: str = Query(default="json", description="Output format: 'json' or 'pdf'")
+    format: str = Query(default="json", description="Output format: 'json', 'pdf' (always with the full roster), roster 'csv' / 'xlsx' or certificates 'zip'"),
+    engine: Optional[str] = Query(default=None, description=f"Estimation engine: {' | '.join(ENGINES)}"),
 ) -> Response:
+    try:
+        engine_name = resolve_engine(engine)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
     # 1) Tozalash va heuristika asosida header/ustunlarni filtrlash
-    cleaned = clean_response_matrix(request.responses)
-    if not cleaned:
+    # 2) Minimal tekshiruv (hamma qatorlar bir xil uzunlikda bo'lsin)
+    cleaned, detection = _clean_or_400(request.responses)
+    return _calculate(
+        cleaned, detection, engine_name, format,
+        request.anchor_difficulties, request.anchor_discrimination, request.form_id, request.anchor_form,
+    )
+
+
+@app.post("/calculate/upload")
+def calculate_upload(
+    file: UploadFile = File(..., description="Parquet (.parquet), Arrow IPC (.arrow/.feather) yoki .npy fayl"),
+    format: str = Query(default="json", description="Output format: 'json', 'pdf' (always with the full roster), roster 'csv' / 'xlsx' or certificates 'zip'"),
+    engine: Optional[str] = Query(default=None, description=f"Estimation engine: {' | '.join(ENGINES)}"),
+    input_format: Optional[str] = Query(default=None, description="parquet | arrow | npy (default: by file extension)"),
+    anchor_difficulties: Optional[List[float]] = Query(
+        default=None, description="Anchored item difficulties (repeat the parameter once per item, in column order)",
+    ),
+    anchor_discrimination: Optional[float] = Query(default=None, gt=0),
+    form_id: Optional[str] = Query(default=None, min_length=1, max_length=128),
+    anchor_form: Optional[str] = Query(default=None, min_length=1, max_length=128),
+) -> Response:
+    """Katta guruhlar uchun ustunli ikkilik yuklama: JSON/pydantic orqali yacheykama-yacheyka o'tmaydi"""
+    try:
+        engine_name = resolve_engine(engine)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    fmt = (input_format or columnar_format(file.filename or "") or "").lower()
+    if fmt not in set(COLUMNAR_FORMATS.values()):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Fayl formati aniqlanmadi: {file.filename}. Mumkin: {', '.join(sorted(COLUMNAR_FORMATS))}",
+        )
+    # Yuklama diskdagi vaqtinchalik faylga bo'laklab ko'chiriladi va yo'l bo'yicha o'qiladi:
+    # .npy — np.load(mmap_mode="r"), Parquet/Arrow — pyarrow memory_map (butun fayl bytes ga o'qilmaydi)
+    with tempfile.NamedTemporaryFile(prefix="rasch_upload_", suffix=f".{fmt}") as spooled:
+        shutil.copyfileobj(file.file, spooled, UPLOAD_COPY_CHUNK)
+        spooled.flush()
+        try:
+            cleaned, detection = load_columnar(spooled.name, fmt)
+        except MissingDependencyError as e:
+            raise HTTPException(status_code=501, detail=str(e)) from e
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Faylni o'qib bo'lmadi: {e}") from e
+    if cleaned.n_persons == 0 or cleaned.n_items == 0:
         raise HTTPException(status_code=400, detail="Tozalashdan so'ng matritsa bo'sh qoldi.")
+    return _calculate(
+        cleaned, detection, engine_name, format, anchor_difficulties, anchor_discrimination, form_id, anchor_form,
+    )
 
-    # 2) Minimal tekshiruv (hamma qatorlar bir xil uzunlikda bo'lsin)
+
+def _calculate(
+    cleaned: Union[list, ResponseMatrix],
+    detection: ColumnDetection,
+    engine_name: str,
+    format: str,
+    anchors: Optional[list],
+    discrimination: Optional[float],
+    form_id: Optional[str],
+    anchor_form: Optional[str],
+) -> Response:
+    result = _estimate(cleaned, detection, engine_name, anchors, discrimination, form_id, anchor_form)
+    return _render(result, format)
+
+
+def _estimate(
+    cleaned: Union[list, ResponseMatrix],
+    detection: ColumnDetection,
+    engine_name: str,
+    anchors: Optional[list],
+    discrimination: Optional[float],
+    form_id: Optional[str],
+    anchor_form: Optional[str],
+) -> dict[str, Any]:
+    num_items = cleaned.n_items if isinstance(cleaned, ResponseMatrix) else len(cleaned[0])
+    if form_id and form_id.startswith(EXAM_FORM_PREFIX):
+        raise HTTPException(
+            status_code=400, detail=f"'{EXAM_FORM_PREFIX}' bilan boshlanuvchi shakllar to'lqinlar uchun ajratilgan: {form_id}"
+        )
+
+    if anchors is None and anchor_form:
+        try:
+            anchors, bank_discrimination = ItemBank().get_anchors(anchor_form)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e.args[0])) from e
+        discrimination = discrimination or bank_discrimination
+    if anchors is not None and len(anchors) != num_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Qotirilgan qiyinchiliklar soni savollar soniga mos emas: {len(anchors)} != {num_items}",
+        )
+
+    try:
+        result: dict[str, Any] = run_engine(cleaned, engine_name, anchors, discrimination)
+        result = enrich_person_scores(result)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    result["detection"] = detection.to_dict()
+
+    # Kalibrlash natijasini savollar bankiga saqlash (qotirilgan baholashda parametrlar yangi emas)
+    if form_id and anchors is None:
+        ItemBank().save_calibration(form_id, result, engine=engine_name)
+    return result
+
+
+@app.post("/jobs", status_code=202)
+def submit_job(
+    request: CalculateRequest,
+    format: str = Query(default="json", description="Result format prepared by the job: 'json' or 'pdf'"),
+    engine: Optional[str] = Query(default=None, description=f"Estimation engine: {' | '.join(ENGINES)}"),
+) -> JSONResponse:
+    """/calculate ning fon varianti: ish ID si darhol qaytariladi, natija GET /jobs/{id}/result orqali olinadi"""
+    try:
+        engine_name = resolve_engine(engine)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    want_pdf = format.lower() == "pdf"
+
+    def pipeline(job: Job) -> dict[str, Any]:
+        with job.stage("cleaning"):
+            cleaned, detection = _clean_or_400(request.responses)
+        with job.stage("estimation"):
+            result = _estimate(
+                cleaned, detection, engine_name,
+                request.anchor_difficulties, request.anchor_discrimination, request.form_id, request.anchor_form,
+            )
+        if want_pdf:
+            with job.stage("pdf"):
+                job.pdf = render_pdf(result, roster_appendix=API_ROSTER_APPENDIX)
+        save_report(job.id, result, job.pdf)
+        return result
+
+    stages = ["cleaning", "estimation"] + (["pdf"] if want_pdf else [])
+    jobs = get_job_queue()
+    try:
+        job = jobs.submit(pipeline, stages)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"}) from e
+    return JSONResponse(
+        status_code=202,
+        content={**job.to_dict(), "position": jobs.position(job), "result_url": f"/jobs/{job.id}/result"},
+    )
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    jobs = get_job_queue()
+    job = _job_or_404(job_id)
+    return {**job.to_dict(), "position": jobs.position(job)}
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(
+    job_id: str,
+    format: str = Query(default="json", description="Output format: 'json', 'pdf' (always with the full roster), roster 'csv' / 'xlsx' or certificates 'zip'"),
+) -> Response:
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return _stored_result_or_404(job_id, format)
+    if job.status == FAILED:
+        raise HTTPException(status_code=job.error_code, detail=job.error)
+    if job.status != DONE or job.result is None:
+        raise HTTPException(status_code=409, detail=f"Ish hali tugamagan: {job.status}")
+    if format.lower() in ROSTER_MEDIA_TYPES:
+        return _roster_response(job.result, format.lower())
+    if format.lower() == "zip":
+        return _certificates_response(job.result)
+    if format.lower() != "pdf":
+        return JSONResponse(content=job.result)
+    # PDF ish yaratilganda so'ralmagan bo'lsa — birinchi so'rovda tayyorlanib saqlanadi
+    with job.lock:
+        if job.pdf is None:
+            try:
+                job.pdf = render_pdf(job.result, roster_appendix=API_ROSTER_APPENDIX)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"PDF yaratishda xato: {str(e)}")
+            save_report(job.id, job.result, job.pdf)
+    return Response(
+        content=job.pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": "attachment; filename=rasch_report.pdf"},
+    )
+
+
+def _stored_result_or_404(job_id: str, format: str) -> Response:
+    # Xotiradan chiqarilgan ish natijasi artefaktlar omboridan (RASCH_ARTIFACT_DIR) olinadi
+    store = get_artifact_store()
+    pdf = format.lower() == "pdf"
+    try:
+        data = store.load(job_id, "report.pdf" if pdf else "result.json") if store is not None else None
+    except ValueError:
+        data = None
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"Ish topilmadi yoki muddati o'tgan: {job_id}")
+    if pdf:
+        return Response(
+            content=data,
+            media_type="application/pdf",
+            headers={"Content-Disposition": "attachment; filename=rasch_report.pdf"},
+        )
+    if format.lower() in ROSTER_MEDIA_TYPES:
+        return _roster_response(json.loads(data), format.lower())
+    if format.lower() == "zip":
+        return _certificates_response(json.loads(data))
+    return Response(content=data, media_type="application/json")
+
+
+def _job_or_404(job_id: str) -> Job:
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ish topilmadi yoki muddati o'tgan: {job_id}")
+    return job
+
+
+@app.post("/exams/{exam_id}/waves")
+def add_exam_wave(
+    exam_id: str,
+    request: CalculateRequest,
+    format: str = Query(default="json", description="Output format: 'json', 'pdf' (always with the full roster), roster 'csv' / 'xlsx' or certificates 'zip'"),
+) -> Response:
+    """Imtihonning yangi to'lqinini qo'shib, oldingi kalibrlashdan boshlab qayta baholash (NumPy)"""
+    cleaned, detection = _clean_or_400(request.responses)
+    try:
+        result: dict[str, Any] = enrich_person_scores(ItemBank().add_wave(exam_id, cleaned))
+    except WaveConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    result["detection"] = detection.to_dict()
+    return _render(result, format)
+
+
+def _clean_or_400(responses: list) -> tuple[list, ColumnDetection]:
+    # Ustunlar tanlanma bo'yicha aniqlanadi, tanlangan ustunlar va ishonch natijaga qo'shiladi
+    detection = detect_question_columns(responses)
+    cleaned = clean_response_matrix(responses, detection=detection)
+    if not cleaned:
+        raise HTTPException(status_code=400, detail="Tozalashdan so'ng matritsa bo'sh qoldi.")
     num_items = len(cleaned[0])
     if num_items == 0:
         raise HTTPException(status_code=400, detail="Hech qanday item ustuni aniqlanmadi.")
     for idx, row in enumerate(cleaned, start=1):
         if len(row) != num_items:
             raise HTTPException(status_code=400, detail=f"{idx}-qator uzunligi mos emas: {len(row)} != {num_items}")
+    return cleaned, detection
 
-    with tempfile.TemporaryDirectory(prefix="rasch_") as tmpdir:
-        tmp_path = Path(tmpdir)
-        csv_path = _write_matrix_to_csv(tmp_path, cleaned)
-
-        try:
-            result: dict[str, Any] = run_rasch_model(csv_path)
-            result = enrich_person_scores(result)
-        except RuntimeError as e:
-            raise HTTPException(status_code=500, detail=str(e)) from e
 
+def _render(result: dict[str, Any], format: str) -> Response:
     # Format bo'yicha javob qaytarish
     if format.lower() == "pdf":
         try:
-            pdf_content = create_rasch_pdf_report(result)
+            pdf_content = render_pdf(result, roster_appendix=API_ROSTER_APPENDIX)
             return Response(
                 content=pdf_content,
                 media_type="application/pdf",
@@ -70,13 +323,72 @@ def calculate(
             )
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"PDF yaratishda xato: {str(e)}")
+    elif format.lower() in ROSTER_MEDIA_TYPES:
+        return _roster_response(result, format.lower())
+    elif format.lower() == "zip":
+        return _certificates_response(result)
     else:
         return JSONResponse(content=result)
 
+
+ROSTER_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _certificates_response(result: dict[str, Any]) -> Response:
+    # Har bir talabgor uchun sertifikat PDF — jarayonlar havzasida chizilib ZIP ga oqim bilan yoziladi
+    archive = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
+    try:
+        write_certificates_zip(result, archive)
+    except Exception as e:
+        archive.close()
+        raise HTTPException(status_code=500, detail=f"Sertifikatlarni yaratishda xato: {str(e)}") from e
+    archive.seek(0)
+
+    def chunks():
+        with archive:
+            while True:
+                block = archive.read(1024 * 1024)
+                if not block:
+                    return
+                yield block
+
+    return StreamingResponse(
+        chunks(),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=rasch_certificates.zip"},
+    )
+
+
+def _roster_response(result: dict[str, Any], fmt: str) -> Response:
+    # To'liq talabgorlar ro'yxati (katta guruhlarda PDF o'rniga ilova sifatida beriladi)
+    try:
+        content = create_roster_appendix(result, fmt)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e)) from e
+    return Response(
+        content=content,
+        media_type=ROSTER_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename=rasch_roster.{fmt}"},
+    )
+
 @app.get("/")
 def read_root():
     return {"message": "Rasch Model Calculator API", "version": "1.0.0"}
 
+@app.get("/forms")
+def list_forms():
+    return {"forms": ItemBank().list_forms()}
+
+@app.get("/forms/{form_id}")
+def get_form(form_id: str):
+    calibration = ItemBank().load_calibration(form_id)
+    if calibration is None:
+        raise HTTPException(status_code=404, detail=f"Savollar bankida '{form_id}' shakli topilmadi")
+    return calibration
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
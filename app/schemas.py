@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any, List
+from typing import Any, List, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
@@ -13,6 +13,25 @@ class CalculateRequest(BaseModel):
         )
     )
 
+    anchor_difficulties: Optional[List[float]] = Field(
+        default=None, description=(
+            "Fixed item difficulties from an earlier calibration (one per item column). "
+            "When given, item parameters are not re-estimated and only persons are scored."
+        )
+    )
+    anchor_discrimination: Optional[float] = Field(
+        default=None, gt=0, description="Common discrimination of the anchored calibration (default 1.0)."
+    )
+
+    form_id: Optional[str] = Field(
+        default=None, min_length=1, max_length=128,
+        description="Save the resulting item calibration into the item bank under this exam form ID.",
+    )
+    anchor_form: Optional[str] = Field(
+        default=None, min_length=1, max_length=128,
+        description="Score against item difficulties stored in the item bank for this exam form ID.",
+    )
+
     @field_validator("responses")
     @classmethod
     def validate_responses(cls, value):
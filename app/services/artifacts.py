@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Ixtiyoriy artefaktlar ombori: hisobotlar (PDF, JSON) xotirada yaratilib to'g'ridan-to'g'ri
+# yuboriladi; saqlash kerak bo'lsa (RASCH_ARTIFACT_DIR) har bir ish o'z papkasiga yoziladi —
+# umumiy ./results fayllari yo'q, parallel foydalanuvchilar bir-birining hisobotini olmaydi.
+# RASCH_ARTIFACT_TTL soniyadan eski ish papkalari tozalanadi.
+
+ARTIFACT_DIR = os.getenv("RASCH_ARTIFACT_DIR", "").strip()
+ARTIFACT_TTL = float(os.getenv("RASCH_ARTIFACT_TTL", "86400") or 86400)
+_CLEANUP_INTERVAL = 300.0
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+class ArtifactStore:
+    def __init__(self, directory: str, ttl: float = ARTIFACT_TTL) -> None:
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def _job_dir(self, job_id: str) -> Path:
+        if not job_id or not all(ch.isalnum() or ch in "-_" for ch in job_id):
+            raise ValueError(f"Noto'g'ri ish identifikatori: {job_id!r}")
+        return self.directory / job_id
+
+    def save(self, job_id: str, artifacts: Dict[str, bytes]) -> Path:
+        """Ish artefaktlarini ({"report.pdf": ..., "result.json": ...}) yozish"""
+        job_dir = self._job_dir(job_id)
+        job_dir.mkdir(parents=True, exist_ok=True)
+        for name, data in artifacts.items():
+            target = job_dir / Path(name).name
+            tmp = job_dir / f".{target.name}.tmp"
+            tmp.write_bytes(data)
+            os.replace(tmp, target)
+        self.cleanup()
+        return job_dir
+
+    def load(self, job_id: str, name: str) -> Optional[bytes]:
+        path = self._job_dir(job_id) / Path(name).name
+        if not path.is_file() or self._expired(path.parent, time.time()):
+            return None
+        return path.read_bytes()
+
+    def _expired(self, job_dir: Path, now: float) -> bool:
+        try:
+            return now - job_dir.stat().st_mtime > self.ttl
+        except OSError:
+            return True
+
+    def cleanup(self, force: bool = False) -> int:
+        """Muddati o'tgan ish papkalarini o'chirish (ko'pi bilan har _CLEANUP_INTERVAL soniyada)"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_cleanup < _CLEANUP_INTERVAL:
+                return 0
+            self._last_cleanup = now
+        removed = 0
+        if not self.directory.exists():
+            return 0
+        for job_dir in self.directory.iterdir():
+            if job_dir.is_dir() and self._expired(job_dir, now):
+                shutil.rmtree(job_dir, ignore_errors=True)
+                removed += 1
+        return removed
+
+
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> Optional[ArtifactStore]:
+    """RASCH_ARTIFACT_DIR berilmagan bo'lsa None — artefaktlar faqat xotirada"""
+    global _store
+    if not ARTIFACT_DIR:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(ARTIFACT_DIR)
+        return _store
+
+
+def save_report(job_id: str, result: Dict[str, Any], pdf: Optional[bytes] = None) -> Optional[Path]:
+    """Natija (va PDF) ni omborga yozish; ombor yoqilmagan bo'lsa hech narsa qilmaydi"""
+    store = get_artifact_store()
+    if store is None:
+        return None
+    artifacts = {"result.json": json.dumps(result, ensure_ascii=False, indent=2).encode("utf-8")}
+    if pdf is not None:
+        artifacts["report.pdf"] = pdf
+    return store.save(job_id, artifacts)
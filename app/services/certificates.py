@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import io
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing, Line, Rect
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph
+
+from app.services.pdf_generator import PDFGenerator
+from app.services.report_resources import get_report_resources
+
+# Har bir talabgor uchun alohida sertifikat (ball, daraja, tushuntirish) va ularning ZIP arxivi.
+# Shriftlar, uslublar va sahifaning statik chizmasi har bir jarayonda bir marta tayyorlanadi;
+# sertifikatlar jarayonlar havzasida bo'laklab chiziladi va tayyor bo'lishi bilan ZIP ga yoziladi.
+
+CERT_WORKERS = int(os.getenv("RASCH_CERT_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+CERT_BATCH = 250
+# Shundan kam sertifikat havzasiz (jarayonlarni ishga tushirish qimmatroq)
+CERT_PARALLEL_MIN = 500
+
+PAGE_SIZE = landscape(A4)
+
+# Izohlardagi emoji shriftlarda yo'q (bo'sh katak bo'lib chiqadi) — sertifikatda olib tashlanadi
+_EMOJI = re.compile("[\U00010000-\U0010FFFF\u2600-\u27BF\uFE0F\u200D]+")
+
+LEVEL_NAMES = {
+    'A': 'Ajoyib (A)',
+    'B': 'Yaxshi (B)',
+    'C': 'Qoniqarli (C)',
+    'D': 'Yaxshilash kerak (D)',
+}
+
+
+class CertificateTemplate:
+    """Sahifa shabloni: uslublar va statik chizma (ramka, chiziqlar) bir marta yaratiladi"""
+
+    def __init__(self) -> None:
+        resources = get_report_resources()
+        # Lotin matn (cp1252) standart Helvetica bilan — shrift faylga joylanmaydi, sertifikat ~10 marta
+        # kichik va tezroq; kirill va boshqa belgilar bo'lsa DejaVu (umumiy hisobot resurslaridan)
+        self.fonts = {
+            'latin': ('Helvetica', 'Helvetica-Bold'),
+            'unicode': (resources.font, resources.bold_font),
+        }
+        self.feedback_styles = {
+            kind: ParagraphStyle(
+                f'CertificateFeedback-{kind}', fontName=font, fontSize=12, leading=16, alignment=TA_CENTER,
+            )
+            for kind, (font, _) in self.fonts.items()
+        }
+        self.background = self._background()
+
+    @staticmethod
+    def _background() -> Drawing:
+        width, height = PAGE_SIZE
+        drawing = Drawing(width, height)
+        drawing.add(Rect(20, 20, width - 40, height - 40, strokeColor=colors.darkblue, strokeWidth=4, fillColor=None))
+        drawing.add(Rect(30, 30, width - 60, height - 60, strokeColor=colors.goldenrod, strokeWidth=1.5, fillColor=None))
+        drawing.add(Line(width * 0.25, height - 150, width * 0.75, height - 150, strokeColor=colors.goldenrod, strokeWidth=1))
+        drawing.add(Line(width * 0.3, 110, width * 0.7, 110, strokeColor=colors.grey, strokeWidth=0.5))
+        return drawing
+
+    @staticmethod
+    def _kind(*texts: str) -> str:
+        try:
+            for text in texts:
+                text.encode('cp1252')
+        except UnicodeEncodeError:
+            return 'unicode'
+        return 'latin'
+
+    def render(self, person: Dict[str, Any], context: Dict[str, Any]) -> bytes:
+        width, height = PAGE_SIZE
+        label = PDFGenerator._person_label(person)
+        feedback_text = " ".join(_EMOJI.sub(" ", str(person.get('detailed_feedback', ''))).split())
+        kind = self._kind(label, feedback_text, context['title'], str(person.get('performance_category', '')))
+        font, bold = self.fonts[kind]
+        buffer = io.BytesIO()
+        page = canvas.Canvas(buffer, pagesize=PAGE_SIZE)
+        page.setTitle(f"Sertifikat — {label}")
+        renderPDF.draw(self.background, page, 0, 0)
+
+        page.setFillColor(colors.darkblue)
+        page.setFont(bold, 34)
+        page.drawCentredString(width / 2, height - 120, "SERTIFIKAT")
+        page.setFillColor(colors.black)
+        page.setFont(font, 14)
+        page.drawCentredString(width / 2, height - 180, context['title'])
+
+        page.setFont(bold, 26)
+        page.drawCentredString(width / 2, height - 235, label)
+
+        score = person.get('scaled_score', person.get('eap'))
+        level = person.get('certification_level', 'N/A')
+        page.setFont(font, 16)
+        page.drawCentredString(
+            width / 2, height - 280,
+            f"Sertifikat bali: {person.get('certification_score', 'N/A')}   •   "
+            f"Daraja: {LEVEL_NAMES.get(level, level)}",
+        )
+        page.setFont(font, 13)
+        page.drawCentredString(
+            width / 2, height - 305,
+            f"100 ballik shkala: {score:.1f}   •   {person.get('performance_category', '')}"
+            if isinstance(score, (int, float)) else str(person.get('performance_category', '')),
+        )
+
+        feedback = Paragraph(feedback_text, self.feedback_styles[kind])
+        _, feedback_height = feedback.wrap(width * 0.6, height)
+        feedback.drawOn(page, width * 0.2, height - 340 - feedback_height)
+
+        page.setFont(font, 10)
+        page.drawCentredString(width / 2, 95, f"Savollar soni: {context['n_items']}   •   Sana: {context['date']}")
+        page.showPage()
+        page.save()
+        return buffer.getvalue()
+
+
+_template: Optional[CertificateTemplate] = None
+
+
+def _get_template() -> CertificateTemplate:
+    # Har bir jarayonda bir marta (havza ishchilarida initializer orqali)
+    global _template
+    if _template is None:
+        _template = CertificateTemplate()
+    return _template
+
+
+def _render_batch(batch: List[Tuple[str, Dict[str, Any]]], context: Dict[str, Any]) -> List[Tuple[str, bytes]]:
+    template = _get_template()
+    return [(name, template.render(person, context)) for name, person in batch]
+
+
+def certificate_name(person: Dict[str, Any]) -> str:
+    label = re.sub(r"[^\w.-]+", "_", PDFGenerator._person_label(person), flags=re.UNICODE).strip("_")
+    return f"{int(person.get('person_index', 0)):05d}_{label or 'talabgor'}.pdf"
+
+
+def _context(results: Dict[str, Any], title: Optional[str]) -> Dict[str, Any]:
+    return {
+        'title': title or "Rasch modeli bo'yicha test natijasi",
+        'n_items': len(results.get('items', [])),
+        'date': datetime.now().strftime("%Y-%m-%d"),
+    }
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=CERT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_get_template,
+            )
+        return _pool
+
+
+def stop_certificate_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def iter_certificates(results: Dict[str, Any], title: Optional[str] = None) -> Iterator[Tuple[str, bytes]]:
+    """(fayl nomi, PDF baytlari) — kichik guruhlar joyida, kattalari jarayonlar havzasida bo'laklab"""
+    persons = [p for p in results.get('persons', []) if p.get('certification_score') is not None]
+    context = _context(results, title)
+    named = [(certificate_name(person), person) for person in persons]
+    if len(named) < CERT_PARALLEL_MIN or CERT_WORKERS <= 1:
+        yield from _render_batch(named, context)
+        return
+    batches = [named[start:start + CERT_BATCH] for start in range(0, len(named), CERT_BATCH)]
+    for rendered in _get_pool().map(_render_batch, batches, [context] * len(batches)):
+        yield from rendered
+
+
+def write_certificates_zip(results: Dict[str, Any], target: BinaryIO, title: Optional[str] = None) -> int:
+    """Sertifikatlarni tayyor bo'lishi bilan ZIP ga yozish; yozilgan sertifikatlar soni"""
+    count = 0
+    # PDF oqimlari allaqachon siqilgan — qayta siqish vaqtni oshiradi xolos
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, pdf in iter_certificates(results, title):
+            archive.writestr(name, pdf)
+            count += 1
+    return count
+
+
+def create_certificates_zip(results: Dict[str, Any], title: Optional[str] = None) -> bytes:
+    buffer = io.BytesIO()
+    write_certificates_zip(results, buffer, title)
+    return buffer.getvalue()
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import hashlib
+import io
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from app.core.result_cache import get_result_cache
+
+# Hisobot grafiklari: Wright xaritasi (talabgorlar va savollar bir logit shkalada), testning axborot
+# egri chizig'i va ballar taqsimoti. Ma'lumotlar avval NumPy da guruhlanadi (np.histogram, to'r
+# bo'yicha axborot) — chizishga bir necha o'nta ustun tushadi, talabgorlar soniga bog'liq emas.
+# Figure + Agg kanvasi (pyplot siz) — global holat yo'q, oqimlarda xavfsiz. Tayyor PNG natijalar
+# keshida guruhlangan ma'lumotlar xeshi bo'yicha saqlanadi: aynan shu tahlil uchun hisobot qayta
+# yaratilsa grafiklar qayta chizilmaydi.
+
+CHART_DPI = 150
+CHART_SIZE = (6.3, 2.8)  # dyuym — A4 sahifasiga uchta grafik sig'adi
+WRIGHT_BIN = 0.25  # logit
+THETA_GRID = np.linspace(-4.0, 4.0, 161)
+SCORE_BINS = np.arange(0, 105, 5)
+
+_CHART_VERSION = "1"
+
+
+def _abilities(results: Dict[str, Any]) -> np.ndarray:
+    # RaschAnalyzer natijasida 'theta' — logit, 'eap' — 100 ballik; R/NumPy natijasida 'eap' — logit
+    values = [
+        person.get('theta', person.get('eap'))
+        for person in results.get('persons', [])
+    ]
+    theta = np.array([v for v in values if v is not None], dtype=float)
+    return theta[np.isfinite(theta)]
+
+
+def _difficulties(results: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    items = results.get('items', [])
+    difficulty = np.array([item.get('difficulty', np.nan) for item in items], dtype=float)
+    discrimination = np.array([item.get('discrimination', 1.0) or 1.0 for item in items], dtype=float)
+    known = np.isfinite(difficulty) & np.isfinite(discrimination)
+    return difficulty[known], discrimination[known]
+
+
+def wright_map_data(results: Dict[str, Any]) -> Optional[Dict[str, np.ndarray]]:
+    """Talabgorlar va savollar bir xil logit oraliqlarida guruhlangan (chekkalar ±6 bilan cheklangan)"""
+    theta = _abilities(results)
+    difficulty, _ = _difficulties(results)
+    if not theta.size or not difficulty.size:
+        return None
+    both = np.clip(np.concatenate([theta, difficulty]), -6.0, 6.0)
+    low = np.floor(both.min() / WRIGHT_BIN) * WRIGHT_BIN
+    high = np.ceil(both.max() / WRIGHT_BIN) * WRIGHT_BIN + WRIGHT_BIN
+    edges = np.arange(low, high + WRIGHT_BIN / 2, WRIGHT_BIN)
+    persons, _ = np.histogram(np.clip(theta, low, high), bins=edges)
+    items, _ = np.histogram(np.clip(difficulty, low, high), bins=edges)
+    return {'edges': edges, 'persons': persons, 'items': items}
+
+
+def information_data(results: Dict[str, Any]) -> Optional[Dict[str, np.ndarray]]:
+    """Test axboroti I(θ) = Σ a² P (1 − P) to'rda (savollar × to'r nuqtalari bitta matritsada)"""
+    difficulty, discrimination = _difficulties(results)
+    if not difficulty.size:
+        return None
+    prob = 1.0 / (1.0 + np.exp(-discrimination[None, :] * (THETA_GRID[:, None] - difficulty[None, :])))
+    information = (discrimination[None, :] ** 2 * prob * (1.0 - prob)).sum(axis=1)
+    return {'theta': THETA_GRID, 'information': information}
+
+
+def score_histogram_data(results: Dict[str, Any]) -> Optional[Dict[str, np.ndarray]]:
+    """Sertifikat ballari (bo'lmasa 100 ballik shkala) taqsimoti va darajalar chegaralari"""
+    persons = results.get('persons', [])
+    scores = np.array([
+        person.get('certification_score', person.get('scaled_score'))
+        for person in persons
+        if person.get('certification_score', person.get('scaled_score')) is not None
+    ], dtype=float)
+    if not scores.size:
+        return None
+    counts, _ = np.histogram(np.clip(scores, 0, 100), bins=SCORE_BINS)
+    thresholds = sorted(
+        float(info['min_score']) for info in results.get('certification_standards', {}).values()
+        if isinstance(info, dict) and info.get('min_score')
+    )
+    return {'edges': SCORE_BINS, 'counts': counts, 'thresholds': np.array(thresholds, dtype=float)}
+
+
+def _figure() -> Figure:
+    figure = Figure(figsize=CHART_SIZE, dpi=CHART_DPI, layout="constrained")
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _draw_wright_map(data: Dict[str, np.ndarray]) -> Figure:
+    figure = _figure()
+    left, right = figure.subplots(1, 2, sharey=True)
+    edges = data['edges']
+    centers = (edges[:-1] + edges[1:]) / 2
+    height = (edges[1] - edges[0]) * 0.9
+    left.barh(centers, data['persons'], height=height, color='steelblue')
+    left.invert_xaxis()
+    left.set_xlabel("Talabgorlar soni")
+    left.set_ylabel("Logit (θ / qiyinchilik)")
+    left.set_title("Talabgorlar", fontsize=9)
+    right.barh(centers, data['items'], height=height, color='darkorange')
+    right.set_xlabel("Savollar soni")
+    right.set_title("Savollar", fontsize=9)
+    figure.suptitle("Wright xaritasi", fontsize=10)
+    return figure
+
+
+def _draw_information(data: Dict[str, np.ndarray]) -> Figure:
+    figure = _figure()
+    axes = figure.subplots()
+    axes.plot(data['theta'], data['information'], color='darkblue')
+    axes.fill_between(data['theta'], data['information'], alpha=0.15, color='darkblue')
+    axes.set_xlabel("Qobiliyat (θ, logit)")
+    axes.set_ylabel("Axborot")
+    axes.set_title("Testning axborot egri chizig'i", fontsize=10)
+    axes.grid(alpha=0.3)
+    return figure
+
+
+def _draw_score_histogram(data: Dict[str, np.ndarray]) -> Figure:
+    figure = _figure()
+    axes = figure.subplots()
+    edges = data['edges']
+    axes.bar(edges[:-1], data['counts'], width=np.diff(edges), align='edge', color='seagreen', edgecolor='white')
+    for threshold in data['thresholds']:
+        axes.axvline(threshold, color='goldenrod', linestyle='--', linewidth=1)
+    axes.set_xlim(0, 100)
+    axes.set_xlabel("Sertifikat bali")
+    axes.set_ylabel("Talabgorlar soni")
+    axes.set_title("Ballar taqsimoti (punktir — daraja chegaralari)", fontsize=10)
+    return figure
+
+
+def _chart_key(name: str, data: Dict[str, np.ndarray]) -> str:
+    digest = hashlib.sha1(f"{_CHART_VERSION}:{name}:{CHART_SIZE}:{CHART_DPI}".encode())
+    for field in sorted(data):
+        digest.update(field.encode())
+        digest.update(np.ascontiguousarray(data[field], dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+def _png(name: str, data: Dict[str, np.ndarray], draw: Callable[[Dict[str, np.ndarray]], Figure]) -> bytes:
+    cache = get_result_cache()
+    key = _chart_key(name, data)
+    png = cache.get("png", key)
+    if png is None:
+        figure = draw(data)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format="png")
+        png = buffer.getvalue()
+        cache.put("png", key, png)
+    return png
+
+
+CHARTS = (
+    ("wright", wright_map_data, _draw_wright_map),
+    ("information", information_data, _draw_information),
+    ("scores", score_histogram_data, _draw_score_histogram),
+)
+
+
+def report_charts(results: Dict[str, Any]) -> List[Tuple[str, bytes]]:
+    """Hisobot grafiklari (nomi, PNG baytlari); ma'lumot yetarli bo'lmagan grafik tashlab ketiladi"""
+    charts = []
+    for name, prepare, draw in CHARTS:
+        data = prepare(results)
+        if data is not None:
+            charts.append((name, _png(name, data, draw)))
+    return charts
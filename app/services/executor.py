@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from app.core.engine import run_engine
+from app.core.r_pool import get_pool
+from app.core.response_matrix import ResponseMatrix
+from app.core.result_cache import get_result_cache, matrix_key
+from app.services.item_bank import ItemBank
+from app.services.pdf_generator import PDFGenerator, create_roster_appendix
+from app.services.report_resources import warm_up_report_resources
+from app.services.scoring import RaschAnalyzer, enrich_person_scores
+
+# Bot uchun og'ir ishlar (baholash, PDF) asyncio hodisalar siklidan tashqarida bajariladi:
+# jarayonlar havzasi (spawn — ota jarayondagi R ishchilari va qulflar nusxalanmaydi) va
+# bir vaqtda bajariladigan ishlar soni chegarasi (RASCH_BOT_CONCURRENCY).
+
+BOT_WORKERS = int(os.getenv("RASCH_BOT_WORKERS", "2") or 2)
+BOT_CONCURRENCY = int(os.getenv("RASCH_BOT_CONCURRENCY", "0") or 0) or BOT_WORKERS
+
+T = TypeVar("T")
+
+
+class JobExecutor:
+    """Jarayonlar havzasi + asyncio semafori: handlerlar natijani kutadi, sikl bloklanmaydi"""
+
+    def __init__(self, workers: int = BOT_WORKERS, concurrency: int = BOT_CONCURRENCY) -> None:
+        self.workers = max(1, workers)
+        self.concurrency = max(1, concurrency)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+
+    def _processes(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    async def run(self, fn: Callable[..., T], *args: Any, cpu: bool = True) -> T:
+        """
+        fn(*args) ni havzada bajarish. cpu=False — ish tashqi jarayonni kutadi (masalan, doimiy
+        R ishchilari), shuning uchun oqimda bajariladi; chegara ikkalasi uchun umumiy.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._processes() if cpu else None, fn, *args)
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def warm_up(self) -> None:
+        """Ishchi jarayonlarni oldindan ishga tushirish (importlar va hisobot resurslari birinchi ishga qolmaydi)"""
+        pool = self._processes()
+        for _ in range(self.workers):
+            pool.submit(_ready)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+_executor: Optional[JobExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> JobExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = JobExecutor()
+        return _executor
+
+
+def stop_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+def needs_process(engine: str) -> bool:
+    """Doimiy R ishchilari ishlayotgan bo'lsa "r" ishi faqat kutadi — jarayon kerak emas"""
+    return not (engine == "r" and get_pool() is not None)
+
+
+# ---------- Havzada bajariladigan ishlar (modul darajasidagi funksiyalar — pickle uchun) ----------
+
+def _ready() -> bool:
+    # Shriftlar va uslublar ishchi jarayonda birinchi hisobotgacha yuklanadi
+    warm_up_report_resources()
+    return True
+
+
+def run_analysis(
+    cleaned: ResponseMatrix,
+    engine: str,
+    anchors: Optional[List[float]],
+    discrimination: Optional[float],
+    form_id: Optional[str] = None,
+    anchor_form: Optional[str] = None,
+    exam_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    # anchor=ID — savollar bankidagi qiyinchiliklar; form=ID — yangi kalibrlashni bankka yozish;
+    # exam=ID — yangi to'lqinni oldingi to'lqinlar statistikasiga qo'shib qayta kalibrlash
+    if exam_id:
+        return enrich_person_scores(ItemBank().add_wave(exam_id, cleaned))
+    bank = ItemBank() if (form_id or anchor_form) else None
+    if bank is not None and anchors is None and anchor_form:
+        try:
+            anchors, bank_discrimination = bank.get_anchors(anchor_form)
+        except KeyError as e:
+            raise ValueError(e.args[0]) from e
+        discrimination = discrimination or bank_discrimination
+    result = enrich_person_scores(run_engine(cleaned, engine, anchors, discrimination))
+    if bank is not None and form_id and anchors is None:
+        bank.save_calibration(form_id, result, engine=engine)
+    return result
+
+
+def analyze_matrix(matrix: List[List[int]]) -> Dict[str, Any]:
+    # Keshga vaqtsiz natija yoziladi, 'timestamp' har bir so'rovda yangidan qo'yiladi
+    key = matrix_key(matrix, analyzer="RaschAnalyzer")
+    result = get_result_cache().result(key, lambda: _analyze_untimed(matrix))
+    result['timestamp'] = datetime.now().isoformat()
+    return result
+
+
+def _analyze_untimed(matrix: List[List[int]]) -> Dict[str, Any]:
+    result = RaschAnalyzer().analyze_response_matrix(matrix)
+    result.pop('timestamp', None)
+    return result
+
+
+def render_pdf(result: Dict[str, Any], roster_appendix: Optional[bool] = None) -> bytes:
+    # Aynan shu natija uchun PDF keshda bo'lsa qayta chizilmaydi
+    if roster_appendix is None:
+        return get_result_cache().pdf(result, _render_pdf)
+    return get_result_cache().pdf(result, _render_pdf, roster_appendix=roster_appendix)
+
+
+def _render_pdf(result: Dict[str, Any], roster_appendix: Optional[bool] = None) -> bytes:
+    return PDFGenerator().generate_rasch_report(result, roster_appendix=roster_appendix)
+
+
+def render_roster(result: Dict[str, Any], fmt: str = "csv") -> bytes:
+    return create_roster_appendix(result, fmt)
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.estimation import CalibrationState, SufficientStats, update_calibration
+
+# Kalibrlangan savol parametrlari banki (SQLite): har bir imtihon shakli (form_id)
+# uchun qiyinchiliklar, SE va moslik statistikalari saqlanadi va keyingi
+# qotirilgan (anchored) baholashda qayta ishlatiladi. To'lqinlab kelgan
+# natijalar uchun yetarli statistikalar ham (exam_id bo'yicha) shu yerda.
+
+DEFAULT_ITEM_BANK_PATH = os.getenv("RASCH_ITEM_BANK", "./results/item_bank.sqlite3")
+# Parallel to'lqin qo'shilganda qayta birlashtirish urinishlari
+ADD_WAVE_RETRIES = 5
+EXAM_FORM_PREFIX = "exam:"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS forms (
+    form_id        TEXT PRIMARY KEY,
+    engine         TEXT,
+    discrimination REAL NOT NULL DEFAULT 1.0,
+    n_persons      INTEGER,
+    n_items        INTEGER NOT NULL,
+    loglik         REAL,
+    aic            REAL,
+    bic            REAL,
+    created_at     TEXT NOT NULL,
+    updated_at     TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS items (
+    form_id    TEXT NOT NULL REFERENCES forms(form_id) ON DELETE CASCADE,
+    position   INTEGER NOT NULL,
+    item_id    TEXT NOT NULL,
+    difficulty REAL NOT NULL,
+    se         REAL,
+    infit      REAL,
+    outfit     REAL,
+    PRIMARY KEY (form_id, position)
+);
+
+CREATE INDEX IF NOT EXISTS idx_items_item_id ON items(item_id);
+
+CREATE TABLE IF NOT EXISTS exam_stats (
+    exam_id    TEXT PRIMARY KEY,
+    n_items    INTEGER NOT NULL,
+    n_persons  INTEGER NOT NULL,
+    n_waves    INTEGER NOT NULL,
+    stats      BLOB NOT NULL,
+    beta       BLOB NOT NULL,
+    mu         REAL NOT NULL,
+    sigma      REAL NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+class WaveConflictError(RuntimeError):
+    """Parallel to'lqinlar tufayli holatni ADD_WAVE_RETRIES urinishda yozib bo'lmadi"""
+
+
+def exam_form_id(exam_id: str) -> str:
+    """To'lqinlab kalibrlangan imtihon parametrlari saqlanadigan shakl (oddiy form_id lar bilan to'qnashmaydi)"""
+    return f"{EXAM_FORM_PREFIX}{exam_id}"
+
+
+class ItemBank:
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or DEFAULT_ITEM_BANK_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Har bir amal uchun alohida ulanish — FastAPI threadpool va bot uchun xavfsiz
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save_calibration(self, form_id: str, result: Dict[str, Any], engine: Optional[str] = None) -> int:
+        """Natijadagi savol parametrlarini form_id ostida saqlaydi (oldingisi almashtiriladi)"""
+        if form_id.startswith(EXAM_FORM_PREFIX):
+            raise ValueError(f"'{EXAM_FORM_PREFIX}' bilan boshlanuvchi shakllar to'lqinlar uchun ajratilgan: {form_id}")
+        with self._connect() as conn:
+            return self._write_calibration(conn, form_id, result, engine)
+
+    def _write_calibration(
+        self, conn: sqlite3.Connection, form_id: str, result: Dict[str, Any], engine: Optional[str]
+    ) -> int:
+        items = result.get('items', [])
+        if not form_id or not items:
+            raise ValueError("Saqlash uchun form_id va savollar kerak")
+        fit = result.get('fit', {})
+        now = datetime.now().isoformat()
+        discrimination = float(items[0].get('discrimination', 1.0))
+
+        rows = [
+            (
+                form_id,
+                position,
+                str(item.get('item_id', f'Item{position + 1}')),
+                float(item['difficulty']),
+                item.get('se'),
+                item.get('infit'),
+                item.get('outfit'),
+            )
+            for position, item in enumerate(items)
+        ]
+
+        conn.execute(
+            """
+            INSERT INTO forms (form_id, engine, discrimination, n_persons, n_items, loglik, aic, bic, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(form_id) DO UPDATE SET
+                engine = excluded.engine,
+                discrimination = excluded.discrimination,
+                n_persons = excluded.n_persons,
+                n_items = excluded.n_items,
+                loglik = excluded.loglik,
+                aic = excluded.aic,
+                bic = excluded.bic,
+                updated_at = excluded.updated_at
+            """,
+            (
+                form_id, engine, discrimination, fit.get('n_obs'), len(items),
+                fit.get('logLik'), fit.get('AIC'), fit.get('BIC'), now, now,
+            ),
+        )
+        conn.execute("DELETE FROM items WHERE form_id = ?", (form_id,))
+        conn.executemany(
+            "INSERT INTO items (form_id, position, item_id, difficulty, se, infit, outfit) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        return len(rows)
+
+    def load_calibration(self, form_id: str) -> Optional[Dict[str, Any]]:
+        """form_id bo'yicha shakl ma'lumotlari va savollar (tartib bo'yicha)"""
+        with self._connect() as conn:
+            form = conn.execute("SELECT * FROM forms WHERE form_id = ?", (form_id,)).fetchone()
+            if form is None:
+                return None
+            items = conn.execute(
+                "SELECT item_id, difficulty, se, infit, outfit FROM items WHERE form_id = ? ORDER BY position",
+                (form_id,),
+            ).fetchall()
+        return {**dict(form), 'items': [dict(row) for row in items]}
+
+    def get_anchors(self, form_id: str) -> Tuple[List[float], float]:
+        """Qotirilgan baholash uchun (qiyinchiliklar, diskriminatsiya)"""
+        calibration = self.load_calibration(form_id)
+        if calibration is None:
+            raise KeyError(f"Savollar bankida '{form_id}' shakli topilmadi")
+        return [item['difficulty'] for item in calibration['items']], float(calibration['discrimination'])
+
+    def list_forms(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT form_id, engine, n_persons, n_items, updated_at FROM forms ORDER BY updated_at DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_form(self, form_id: str) -> bool:
+        with self._connect() as conn:
+            cur = conn.execute("DELETE FROM forms WHERE form_id = ?", (form_id,))
+        return cur.rowcount > 0
+
+    # ---------- Incremental calibration ----------
+
+    def add_wave(self, exam_id: str, matrix: Any) -> Dict[str, Any]:
+        """
+        Imtihonning yangi to'lqinini qo'shib qayta kalibrlaydi (NumPy CML).
+
+        Oldingi to'lqinlarning yetarli statistikalari va beta qiymatlari bazada
+        saqlanadi, shuning uchun to'liq matritsa qayta yuklanmaydi va optimizator
+        oldingi yechimdan boshlanadi. Yangilangan parametrlar exam_form_id(exam_id)
+        ("exam:<id>") shakli sifatida ham saqlanadi (anchor_form uchun).
+
+        Baholash tranzaksiyadan tashqarida bajariladi (yozish qulfi butun baza uchun —
+        uzoq hisob boshqa yozuvchilarni bloklamasin). Yozishda n_waves tekshiriladi:
+        oraliqda boshqa to'lqin qo'shilgan bo'lsa, yangi holat bilan qayta birlashtiriladi.
+        """
+        if not exam_id:
+            raise ValueError("exam_id kerak")
+        for _ in range(ADD_WAVE_RETRIES):
+            with self._connect() as conn:
+                row = conn.execute("SELECT * FROM exam_stats WHERE exam_id = ?", (exam_id,)).fetchone()
+            previous = None
+            n_waves = 0
+            if row is not None:
+                previous = CalibrationState(
+                    stats=SufficientStats.from_bytes(row['stats']),
+                    beta=np.frombuffer(row['beta'], dtype=np.float64).copy(),
+                    mu=row['mu'],
+                    sigma=row['sigma'],
+                )
+                n_waves = row['n_waves']
+
+            result, state = update_calibration(matrix, previous)
+
+            with self._connect() as conn:
+                # Qisqa yozish tranzaksiyasi: holat o'qilgandan beri o'zgarmagan bo'lsagina yoziladi
+                conn.execute("BEGIN IMMEDIATE")
+                current = conn.execute("SELECT n_waves FROM exam_stats WHERE exam_id = ?", (exam_id,)).fetchone()
+                if (current['n_waves'] if current is not None else 0) != n_waves:
+                    continue
+                n_waves += 1
+                conn.execute(
+                    """
+                    INSERT INTO exam_stats (exam_id, n_items, n_persons, n_waves, stats, beta, mu, sigma, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(exam_id) DO UPDATE SET
+                        n_items = excluded.n_items,
+                        n_persons = excluded.n_persons,
+                        n_waves = excluded.n_waves,
+                        stats = excluded.stats,
+                        beta = excluded.beta,
+                        mu = excluded.mu,
+                        sigma = excluded.sigma,
+                        updated_at = excluded.updated_at
+                    """,
+                    (
+                        exam_id, state.stats.n_items, state.stats.n_persons, n_waves,
+                        state.stats.to_bytes(), state.beta.astype(np.float64).tobytes(),
+                        state.mu, state.sigma, datetime.now().isoformat(),
+                    ),
+                )
+                self._write_calibration(conn, exam_form_id(exam_id), result, engine="numpy")
+
+            result['exam'] = {
+                'exam_id': exam_id, 'form_id': exam_form_id(exam_id),
+                'n_waves': n_waves, 'n_persons': state.stats.n_persons,
+            }
+            return result
+        raise WaveConflictError(
+            f"'{exam_id}' imtihoniga bir vaqtda juda ko'p to'lqin qo'shilmoqda. Birozdan so'ng qayta urinib ko'ring."
+        )
+
+    def reset_exam(self, exam_id: str) -> bool:
+        """To'lqinlar statistikasini o'chiradi (keyingi to'lqin noldan kalibrlanadi)"""
+        with self._connect() as conn:
+            cur = conn.execute("DELETE FROM exam_stats WHERE exam_id = ?", (exam_id,))
+        return cur.rowcount > 0
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import collections
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+# Katta /calculate so'rovlari uchun fon ishlari: so'rov darhol ish ID sini oladi, hisob
+# (tozalash → baholash → PDF) mahalliy ishchi oqimlarida bajariladi, natija keyin olinadi.
+# Navbat chegaralangan — to'lsa yangi ish qabul qilinmaydi (HTTP 429).
+
+JOB_WORKERS = int(os.getenv("RASCH_JOB_WORKERS", "2") or 2)
+JOB_QUEUE_SIZE = int(os.getenv("RASCH_JOB_QUEUE", "16") or 16)
+JOB_TTL = float(os.getenv("RASCH_JOB_TTL", "3600") or 3600)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueueFullError(RuntimeError):
+    """Navbat to'la — ish qabul qilinmadi"""
+
+
+class Job:
+    def __init__(self, fn: Callable[["Job"], Dict[str, Any]], stages: List[str]) -> None:
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.status = QUEUED
+        self.stages: Dict[str, Dict[str, Any]] = {name: {"status": "pending", "seconds": None} for name in stages}
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.pdf: Optional[bytes] = None
+        self.error: Optional[str] = None
+        self.error_code = 500
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Bosqich holatini yangilash: `with job.stage("estimation"): ...`"""
+        info = self.stages.setdefault(name, {"status": "pending", "seconds": None})
+        info["status"] = RUNNING
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            info["status"] = FAILED
+            raise
+        finally:
+            info["seconds"] = round(time.perf_counter() - start, 3)
+        info["status"] = DONE
+
+    @property
+    def progress(self) -> float:
+        done = sum(1 for info in self.stages.values() if info["status"] == DONE)
+        return round(done / len(self.stages), 3) if self.stages else (1.0 if self.status == DONE else 0.0)
+
+    @property
+    def current_stage(self) -> Optional[str]:
+        return next((name for name, info in self.stages.items() if info["status"] == RUNNING), None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.current_stage,
+            "progress": self.progress,
+            "stages": [{"name": name, **info} for name, info in self.stages.items()],
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Chegaralangan navbat + ishchi oqimlar; tugagan ishlar JOB_TTL soniya saqlanadi"""
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queue: int = JOB_QUEUE_SIZE, ttl: float = JOB_TTL) -> None:
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.ttl = ttl
+        self._jobs: Dict[str, Job] = {}
+        self._pending: Deque[Job] = collections.deque()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopped = False
+
+    def start(self) -> None:
+        with self._cond:
+            if self._threads:
+                return
+            self._stopped = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"rasch-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, fn: Callable[[Job], Dict[str, Any]], stages: List[str]) -> Job:
+        self.start()
+        with self._cond:
+            self._purge()
+            if len(self._pending) >= self.max_queue:
+                raise JobQueueFullError(
+                    f"Navbat to'la ({self.max_queue} ta ish kutmoqda). Birozdan so'ng qayta urinib ko'ring."
+                )
+            job = Job(fn, stages)
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._cond.notify()
+            return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> int:
+        """Navbatdagi o'rin (1 — keyingi), boshlangan ish uchun 0"""
+        with self._cond:
+            try:
+                return self._pending.index(job) + 1
+            except ValueError:
+                return 0
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                job = self._pending.popleft()
+                job.status = RUNNING
+                job.started_at = time.time()
+            try:
+                job.result = job.fn(job)
+                job.status = DONE
+            except Exception as e:
+                # HTTPException kabi xatolar o'z holat kodi va izohini saqlaydi
+                job.error = str(getattr(e, "detail", None) or e)
+                job.error_code = int(getattr(e, "status_code", 500))
+                job.status = FAILED
+            finally:
+                job.finished_at = time.time()
+                job.fn = None  # type: ignore[assignment]  # kiritma (matritsa) xotirada qolmasin
+
+    def _purge(self) -> None:
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout=1)
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+def stop_job_queue() -> None:
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.shutdown()
+            _queue = None
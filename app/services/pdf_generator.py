@@ -1,61 +1,98 @@
-import os
+import io
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, PageBreak, Image
 from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+import csv
 import json
+import os
 from datetime import datetime
+from typing import Optional
+
+from app.services.charts import CHART_SIZE, report_charts
+from app.services.report_resources import get_report_resources
+
+# Katta guruhlar uchun hisobot: LARGE_REPORT_PERSONS dan ko'p talabgorda ro'yxat ROSTER_CHUNK_ROWS
+# qatorli jadvallar bilan chiziladi; ROSTER_APPENDIX_PERSONS dan ko'p bo'lsa (0 — hech qachon)
+# to'liq ro'yxat PDF ga kirmaydi va alohida CSV/XLSX ilova sifatida beriladi.
+LARGE_REPORT_PERSONS = int(os.getenv("RASCH_PDF_LARGE_REPORT", "500") or 500)
+ROSTER_APPENDIX_PERSONS = int(os.getenv("RASCH_PDF_ROSTER_APPENDIX", "10000") or 0)
+ROSTER_CHUNK_ROWS = 40
 
 class PDFGenerator:
     def __init__(self):
-        self.results_dir = "./results"
-        os.makedirs(self.results_dir, exist_ok=True)
-        
-        # O'zbekcha shriftlarni qo'shish
-        try:
-            pdfmetrics.registerFont(TTFont('DejaVuSans', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'))
-            pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'))
-        except:
-            pass  # Standart shriftlarni ishlatadi
+        # O'zbekcha shriftlar, uslublar va statik bo'limlar jarayon bo'yicha bir marta yuklanadi
+        self.resources = get_report_resources()
     
-    def generate_rasch_report(self, results: dict) -> str:
-        """Rasch modeli hisobotini PDF formatida yaratadi"""
+    @staticmethod
+    def _person_label(person: dict) -> str:
+        # ResponseMatrix person_ids berilgan bo'lsa talabgor identifikatori ko'rsatiladi
+        person_id = person.get('person_id')
+        if person_id is not None:
+            return str(person_id)
+        return f"Talabgor {person.get('person_index', 'N/A')}"
+
+    @staticmethod
+    def _fit_cell(record: dict, name: str) -> str:
+        # MNSQ (ZSTD); eski natijalarda yoki kuzatuv bo'lmasa — "—"
+        mnsq, zstd = record.get(name), record.get(f'{name}_zstd')
+        if mnsq is None:
+            return '—'
+        return f"{mnsq:.2f} ({zstd:.1f})" if zstd is not None else f"{mnsq:.2f}"
+
+    def _roster_tables(self, persons: list, chunked: bool) -> list:
+        """
+        Talabgorlar ro'yxati jadvali. chunked=True — sahifa hajmidagi bo'laklar (har birida
+        repeatRows sarlavhasi): bitta ulkan jadvalni sahifalarga bo'lish vaqti kvadratik o'sadi.
+        """
+        header = ['№', 'Talabgor', 'EAP Ball', 'Sertifikat', 'Kategoriya', 'Tushuntirish']
+        rows = []
+        for person in persons:
+            feedback = person.get('detailed_feedback', '')
+            # Tushuntirishni qisqartirish
+            if len(feedback) > 50:
+                feedback = feedback[:47] + "..."
+            
+            rows.append([
+                str(person.get('person_index', 'N/A')),
+                self._person_label(person),
+                f"{person.get('eap', 0):.2f}",
+                f"{person.get('certification_score', 0)} ({person.get('certification_level', 'N/A')})",
+                person.get('performance_category', 'N/A'),
+                feedback
+            ])
+        
+        style = self.resources.table_styles['compact']
+        col_widths = [0.5*inch, 1*inch, 1*inch, 1.5*inch, 1*inch, 2*inch]
+        step = ROSTER_CHUNK_ROWS if chunked else max(len(rows), 1)
+        tables = []
+        for start in range(0, max(len(rows), 1), step):
+            table = Table([header] + rows[start:start + step], colWidths=col_widths, repeatRows=1)
+            table.setStyle(style)
+            tables.append(table)
+        return tables
+
+    def generate_rasch_report(
+        self,
+        results: dict,
+        large_report: Optional[bool] = None,
+        roster_appendix: Optional[bool] = None,
+        charts: bool = True,
+    ) -> bytes:
+        """
+        Rasch modeli hisobotini PDF formatida yaratadi (xotirada — umumiy fayl yo'q, parallel so'rovlar aralashmaydi).
+        large_report — ro'yxatni bo'laklab chizish (standart: LARGE_REPORT_PERSONS dan ko'p talabgor),
+        roster_appendix — to'liq ro'yxatni PDF o'rniga CSV/XLSX ilovaga chiqarish (create_roster_appendix),
+        charts — Wright xaritasi, axborot egri chizig'i va ballar taqsimoti (app.services.charts).
+        """
         try:
-            filename = f"{self.results_dir}/rasch_report.pdf"
-            doc = SimpleDocTemplate(filename, pagesize=A4)
+            buffer = io.BytesIO()
+            doc = SimpleDocTemplate(buffer, pagesize=A4)
             story = []
             
-            # Stil yaratish
-            styles = getSampleStyleSheet()
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                spaceAfter=30,
-                alignment=TA_CENTER,
-                fontName='DejaVuSans-Bold' if 'DejaVuSans-Bold' in pdfmetrics.getRegisteredFontNames() else 'Helvetica-Bold'
-            )
-            
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=16,
-                spaceAfter=12,
-                spaceBefore=20,
-                fontName='DejaVuSans-Bold' if 'DejaVuSans-Bold' in pdfmetrics.getRegisteredFontNames() else 'Helvetica-Bold'
-            )
-            
-            normal_style = ParagraphStyle(
-                'CustomNormal',
-                parent=styles['Normal'],
-                fontSize=12,
-                spaceAfter=6,
-                fontName='DejaVuSans' if 'DejaVuSans' in pdfmetrics.getRegisteredFontNames() else 'Helvetica'
-            )
+            # Uslublar umumiy (ReportResources) — har bir hisobotda qayta yaratilmaydi
+            title_style = self.resources.styles['title']
+            heading_style = self.resources.styles['heading']
+            normal_style = self.resources.styles['normal']
             
             # Sarlavha
             story.append(Paragraph("📊 RASCH MODELI TAHLILI HISOBOTI", title_style))
@@ -79,18 +116,14 @@ class PDFGenerator:
                 ['Eng yaxshi ball', f"{overall_stats.get('best_score', 0):.2f}"],
                 ['Eng yomon ball', f"{overall_stats.get('worst_score', 0):.2f}"]
             ]
+            # Model mosligi (marginal log-o'xshashlik, AIC, BIC)
+            fit = results.get('fit', {})
+            for label, key in (('Log-likelihood', 'logLik'), ('AIC', 'AIC'), ('BIC', 'BIC')):
+                if isinstance(fit.get(key), (int, float)):
+                    overall_data.append([label, f"{fit[key]:.2f}"])
             
             overall_table = Table(overall_data, colWidths=[3*inch, 2*inch])
-            overall_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
+            overall_table.setStyle(self.resources.table_styles['summary'])
             story.append(overall_table)
             story.append(Spacer(1, 20))
             
@@ -98,36 +131,22 @@ class PDFGenerator:
             story.append(Paragraph("🏆 SERTIFIKAT STANDARTLARI", heading_style))
             
             cert_standards = results.get('certification_standards', {})
-            cert_data = [['Daraja', 'Ball oralig\'i', 'Tavsif']]
-            
-            for level, info in cert_standards.items():
-                level_name = {
-                    'excellent': 'Ajoyib (A)',
-                    'good': 'Yaxshi (B)', 
-                    'satisfactory': 'Qoniqarli (C)',
-                    'needs_improvement': 'Yaxshilash kerak (D)'
-                }.get(level, level)
-                
-                cert_data.append([
-                    level_name,
-                    f"{info.get('min_score', 0)}-{info.get('max_score', 0)}",
-                    info.get('description', '')
-                ])
+            cert_data = self.resources.certification_rows(cert_standards)
             
             cert_table = Table(cert_data, colWidths=[1.5*inch, 1.5*inch, 2*inch])
-            cert_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
+            cert_table.setStyle(self.resources.table_styles['summary'])
             story.append(cert_table)
             story.append(PageBreak())
             
+            # Grafiklar (PNG lar keshdan — aynan shu tahlil uchun qayta chizilmaydi)
+            chart_images = report_charts(results) if charts else []
+            if chart_images:
+                story.append(Paragraph("📉 GRAFIKLAR", heading_style))
+                for _, png in chart_images:
+                    story.append(Image(io.BytesIO(png), width=CHART_SIZE[0]*inch, height=CHART_SIZE[1]*inch))
+                    story.append(Spacer(1, 6))
+                story.append(PageBreak())
+            
             # Talabgorlar natijalari
             story.append(Paragraph("👥 TALABGORLAR NATIJALARI", heading_style))
             
@@ -142,59 +161,30 @@ class PDFGenerator:
                 for i, person in enumerate(top_persons, 1):
                     top_data.append([
                         str(i),
-                        f"Talabgor {person.get('person_index', 'N/A')}",
+                        self._person_label(person),
                         f"{person.get('certification_score', 0)}",
                         person.get('certification_level', 'N/A'),
                         person.get('performance_category', 'N/A')
                     ])
                 
                 top_table = Table(top_data, colWidths=[0.5*inch, 1.5*inch, 1*inch, 1.5*inch, 1.5*inch])
-                top_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 12),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
+                top_table.setStyle(self.resources.table_styles['summary'])
                 story.append(top_table)
                 story.append(Spacer(1, 20))
             
             # Barcha talabgorlar
             story.append(Paragraph("📋 BARCHA TALABGORLAR RO'YXATI", heading_style))
-            
-            all_data = [['№', 'Talabgor', 'EAP Ball', 'Sertifikat', 'Kategoriya', 'Tushuntirish']]
-            
-            for person in persons:
-                feedback = person.get('detailed_feedback', '')
-                # Tushuntirishni qisqartirish
-                if len(feedback) > 50:
-                    feedback = feedback[:47] + "..."
-                
-                all_data.append([
-                    str(person.get('person_index', 'N/A')),
-                    f"Talabgor {person.get('person_index', 'N/A')}",
-                    f"{person.get('eap', 0):.2f}",
-                    f"{person.get('certification_score', 0)} ({person.get('certification_level', 'N/A')})",
-                    person.get('performance_category', 'N/A'),
-                    feedback
-                ])
-            
-            all_table = Table(all_data, colWidths=[0.5*inch, 1*inch, 1*inch, 1.5*inch, 1*inch, 2*inch])
-            all_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(all_table)
+            if roster_appendix is None:
+                roster_appendix = 0 < ROSTER_APPENDIX_PERSONS < len(persons)
+            if large_report is None:
+                large_report = len(persons) > LARGE_REPORT_PERSONS
+            if roster_appendix:
+                story.append(Paragraph(
+                    f"To'liq ro'yxat ({len(persons)} ta talabgor) alohida CSV/XLSX ilovada berilgan.",
+                    normal_style,
+                ))
+            else:
+                story.extend(self._roster_tables(persons, chunked=large_report))
             story.append(PageBreak())
             
             # Savollar tahlili
@@ -202,7 +192,7 @@ class PDFGenerator:
             
             items = results.get('items', [])
             if items:
-                items_data = [['№', 'Savol', 'Qiyinchilik', 'Daraja', 'Tavsif']]
+                items_data = [['№', 'Savol', 'Qiyinchilik', 'Daraja', 'Infit (Z)', 'Outfit (Z)', 'Tavsif']]
                 
                 for item in items:
                     items_data.append([
@@ -210,21 +200,13 @@ class PDFGenerator:
                         f"Savol {item.get('item_id', 'N/A').replace('Item', '')}",
                         f"{item.get('difficulty', 0):.3f}",
                         item.get('difficulty_level', 'N/A'),
+                        self._fit_cell(item, 'infit'),
+                        self._fit_cell(item, 'outfit'),
                         item.get('description', '')
                     ])
                 
-                items_table = Table(items_data, colWidths=[0.5*inch, 1*inch, 1*inch, 1*inch, 2.5*inch])
-                items_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('FONTSIZE', (0, 1), (-1, -1), 8),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
+                items_table = Table(items_data, colWidths=[0.5*inch, 0.65*inch, 0.9*inch, 0.7*inch, 0.85*inch, 0.85*inch, 1.8*inch])
+                items_table.setStyle(self.resources.table_styles['compact'])
                 story.append(items_table)
                 story.append(Spacer(1, 20))
             
@@ -244,7 +226,58 @@ class PDFGenerator:
             
             # PDF yaratish
             doc.build(story)
-            return filename
+            return buffer.getvalue()
             
         except Exception as e:
             raise Exception(f"PDF yaratish xatosi: {str(e)}")
+
+
+def create_rasch_pdf_report(results: dict) -> bytes:
+    """Rasch hisobotini yaratib, PDF baytlarini qaytaradi"""
+    return PDFGenerator().generate_rasch_report(results)
+
+
+def needs_roster_appendix(results: dict) -> bool:
+    """To'liq ro'yxat PDF ga sig'maydigan darajada katta (alohida ilova yuborilishi kerak)"""
+    return 0 < ROSTER_APPENDIX_PERSONS < len(results.get('persons', []))
+
+
+def create_roster_appendix(results: dict, fmt: str = "csv") -> bytes:
+    """To'liq talabgorlar ro'yxati CSV (Excel uchun utf-8-sig) yoki XLSX baytlari"""
+    header = ['№', 'Talabgor', 'EAP', 'SE', 'Ball (100)', 'Sertifikat ball', 'Daraja', 'Kategoriya', 'Tushuntirish']
+    rows = (
+        [
+            person.get('person_index'),
+            PDFGenerator._person_label(person),
+            person.get('eap'),
+            person.get('se'),
+            person.get('scaled_score'),
+            person.get('certification_score'),
+            person.get('certification_level'),
+            person.get('performance_category'),
+            person.get('detailed_feedback', ''),
+        ]
+        for person in results.get('persons', [])
+    )
+    fmt = fmt.lower()
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        writer.writerows(rows)
+        return buffer.getvalue().encode('utf-8-sig')
+    if fmt == "xlsx":
+        # openpyxl ixtiyoriy: faqat XLSX ilova uchun kerak
+        try:
+            import openpyxl
+        except ImportError as e:
+            raise RuntimeError("XLSX ilova uchun openpyxl o'rnatilmagan: pip install openpyxl") from e
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Talabgorlar")
+        sheet.append(header)
+        for row in rows:
+            sheet.append(row)
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return buffer.getvalue()
+    raise ValueError(f"Noma'lum ilova formati: {fmt}. Mumkin: csv, xlsx")
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import io
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import TableStyle
+
+# Hisobotlar uchun umumiy resurslar: shriftlar (TTF faylni o'qish ~50 ms), paragraf va jadval
+# uslublari, statik bo'limlar jadvallari. Har bir jarayonda bir marta yaratiladi va barcha
+# hisobotlar (PDF, sertifikatlar) uchun umumiy — kichik hisobot vaqti faqat ma'lumotga bog'liq.
+# Uslublar faqat o'qiladi; flowable lar (Table, Paragraph) build paytida o'zgaradi, shuning uchun
+# statik bo'limlarning tayyor qatorlari saqlanadi, jadvalning o'zi har bir hisobotda yaratiladi.
+
+FONT_FILES = {
+    'DejaVuSans': '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    'DejaVuSans-Bold': '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+}
+
+LEVEL_NAMES = {
+    'excellent': 'Ajoyib (A)',
+    'good': 'Yaxshi (B)',
+    'satisfactory': 'Qoniqarli (C)',
+    'needs_improvement': 'Yaxshilash kerak (D)',
+}
+
+
+def _table_style(header_size: int, body_size: Optional[int] = None) -> TableStyle:
+    commands = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ]
+    if body_size is not None:
+        commands.append(('FONTSIZE', (0, 1), (-1, -1), body_size))
+    commands.append(('GRID', (0, 0), (-1, -1), 1, colors.black))
+    return TableStyle(commands)
+
+
+class ReportResources:
+    """Shriftlar, uslublar va statik bo'limlar — jarayon bo'yicha bitta nusxa (get_report_resources)"""
+
+    def __init__(self) -> None:
+        for name, path in FONT_FILES.items():
+            if name in pdfmetrics.getRegisteredFontNames():
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(name, path))
+            except Exception:
+                pass  # Standart shriftlarni ishlatadi
+        registered = pdfmetrics.getRegisteredFontNames()
+        self.font = 'DejaVuSans' if 'DejaVuSans' in registered else 'Helvetica'
+        self.bold_font = 'DejaVuSans-Bold' if 'DejaVuSans-Bold' in registered else 'Helvetica-Bold'
+
+        sample = getSampleStyleSheet()
+        self.styles: Dict[str, ParagraphStyle] = {
+            'title': ParagraphStyle(
+                'CustomTitle', parent=sample['Heading1'], fontSize=24, spaceAfter=30,
+                alignment=TA_CENTER, fontName=self.bold_font,
+            ),
+            'heading': ParagraphStyle(
+                'CustomHeading', parent=sample['Heading2'], fontSize=16, spaceAfter=12,
+                spaceBefore=20, fontName=self.bold_font,
+            ),
+            'normal': ParagraphStyle(
+                'CustomNormal', parent=sample['Normal'], fontSize=12, spaceAfter=6, fontName=self.font,
+            ),
+        }
+        # 'summary' — umumiy, sertifikat va eng yaxshi talabgorlar jadvallari; 'compact' — ro'yxat va savollar
+        self.table_styles: Dict[str, TableStyle] = {
+            'summary': _table_style(12),
+            'compact': _table_style(10, 8),
+        }
+        self._static: Dict[Tuple[str, str], List[List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def certification_rows(self, standards: Dict[str, Any]) -> List[List[str]]:
+        """Sertifikat standartlari jadvali qatorlari (standartlar o'zgarmasa bir marta tayyorlanadi)"""
+        key = ('certification', json.dumps(standards, sort_keys=True, default=str))
+        with self._lock:
+            rows = self._static.get(key)
+        if rows is None:
+            rows = [['Daraja', 'Ball oralig\'i', 'Tavsif']]
+            for level, info in standards.items():
+                rows.append([
+                    LEVEL_NAMES.get(level, level),
+                    f"{info.get('min_score', 0)}-{info.get('max_score', 0)}",
+                    info.get('description', ''),
+                ])
+            with self._lock:
+                self._static[key] = rows
+        # Nusxa: Table qatorlarni o'zgartirmaydi, lekin chaqiruvchi qo'shimcha qator qo'shishi mumkin
+        return [list(row) for row in rows]
+
+
+_resources: Optional[ReportResources] = None
+_resources_lock = threading.Lock()
+
+
+def get_report_resources() -> ReportResources:
+    global _resources
+    with _resources_lock:
+        if _resources is None:
+            _resources = ReportResources()
+        return _resources
+
+
+def warm_up_report_resources() -> None:
+    """
+    Ishga tushishda chaqiriladi: shriftlar va uslublar yuklanadi, reportlab ning kechiktirilgan
+    importlari va shrift keshlari kichik hisobot chizish orqali to'ldiriladi
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Table
+
+    resources = get_report_resources()
+    doc = SimpleDocTemplate(io.BytesIO(), pagesize=A4)
+    table = Table([['Parametr', 'Qiymat'], ['Talabgor', '0']])
+    table.setStyle(resources.table_styles['summary'])
+    doc.build([
+        Paragraph("Rasch", resources.styles['title']),
+        Paragraph("Ma'lumot", resources.styles['normal']),
+        table,
+    ])
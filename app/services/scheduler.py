@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Hashable, List, Optional, Set
+
+from app.services.executor import get_executor
+
+# Bot ishlari uchun adolatli navbat: har bir chat uchun alohida navbat, chatlar o'rtasida
+# navbat bilan (round-robin) tarqatish va bitta chatdagi ishlar soniga chegara. Bitta maktab
+# o'nta katta fayl yuborsa ham boshqa foydalanuvchilarning ishlari har aylanishda bajariladi.
+
+MAX_JOBS_PER_CHAT = int(os.getenv("RASCH_BOT_MAX_JOBS_PER_CHAT", "3") or 3)
+
+# ETA modeli: ish vaqti ~ JOB_OVERHEAD + SECONDS_PER_CELL * (talabgorlar x savollar);
+# koeffitsient tugagan ishlar bo'yicha eksponensial o'rtacha bilan yangilanadi
+JOB_OVERHEAD = 4.0
+SECONDS_PER_CELL = 1e-6
+_SMOOTHING = 0.3
+
+
+class QueueFullError(RuntimeError):
+    """Chat uchun navbatdagi ishlar soni chegarasiga yetildi"""
+
+
+class Ticket:
+    """Navbatdagi ish: `async with ticket:` — navbat kelguncha kutadi, chiqishda o'rinni bo'shatadi"""
+
+    def __init__(self, scheduler: "FairScheduler", chat_id: Hashable, cells: int) -> None:
+        self.scheduler = scheduler
+        self.chat_id = chat_id
+        self.cells = max(int(cells), 1)
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self._started: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+
+    @property
+    def started(self) -> bool:
+        return self.started_at is not None
+
+    def position(self) -> int:
+        """Oldinda nechta ish bor (0 — ish boshlangan yoki birinchi navbatda)"""
+        return self.scheduler.position(self)
+
+    def eta(self) -> float:
+        """Ish tugashigacha taxminiy vaqt (soniya)"""
+        return self.scheduler.eta(self)
+
+    async def __aenter__(self) -> "Ticket":
+        try:
+            await asyncio.shield(self._started)
+        except asyncio.CancelledError:
+            self.scheduler.finish(self, ok=False)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.scheduler.finish(self, ok=exc_type is None)
+
+
+class FairScheduler:
+    def __init__(self, concurrency: int, max_per_chat: int = MAX_JOBS_PER_CHAT) -> None:
+        self.concurrency = max(1, concurrency)
+        self.max_per_chat = max(1, max_per_chat)
+        self.overhead = JOB_OVERHEAD
+        self.seconds_per_cell = SECONDS_PER_CELL
+        self._queues: "OrderedDict[Hashable, Deque[Ticket]]" = OrderedDict()
+        self._running: Set[Ticket] = set()
+        self._per_chat: Counter = Counter()
+
+    def submit(self, chat_id: Hashable, cells: int) -> Ticket:
+        """Ishni chat navbatiga qo'shish; chegaradan oshsa QueueFullError"""
+        if self._per_chat[chat_id] >= self.max_per_chat:
+            raise QueueFullError(
+                f"Navbatingiz to'la: bir vaqtda {self.max_per_chat} tadan ortiq ish yuborib bo'lmaydi. "
+                "Oldingi natijalarni kuting."
+            )
+        ticket = Ticket(self, chat_id, cells)
+        self._per_chat[chat_id] += 1
+        self._queues.setdefault(chat_id, deque()).append(ticket)
+        self._dispatch()
+        return ticket
+
+    def finish(self, ticket: Ticket, ok: bool = True) -> None:
+        if ticket in self._running:
+            self._running.discard(ticket)
+            if ok and ticket.started_at is not None:
+                self._observe(ticket.cells, time.monotonic() - ticket.started_at)
+        else:
+            # Boshlanmasdan bekor qilingan ish
+            queue = self._queues.get(ticket.chat_id)
+            if queue is None or ticket not in queue:
+                return
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.chat_id]
+        self._per_chat[ticket.chat_id] -= 1
+        if self._per_chat[ticket.chat_id] <= 0:
+            del self._per_chat[ticket.chat_id]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        # Navbatdagi birinchi chatning birinchi ishi boshlanadi, chat navbat oxiriga o'tadi
+        while len(self._running) < self.concurrency and self._queues:
+            chat_id, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            if queue:
+                self._queues.move_to_end(chat_id)
+            else:
+                del self._queues[chat_id]
+            ticket.started_at = time.monotonic()
+            self._running.add(ticket)
+            if not ticket._started.done():
+                ticket._started.set_result(None)
+
+    def _order(self) -> List[Ticket]:
+        """Kutayotgan ishlarning bajarilish tartibi (round-robin simulyatsiyasi)"""
+        queues = [list(queue) for queue in self._queues.values()]
+        order: List[Ticket] = []
+        depth = 0
+        while True:
+            layer = [queue[depth] for queue in queues if depth < len(queue)]
+            if not layer:
+                return order
+            order.extend(layer)
+            depth += 1
+
+    def estimate(self, cells: int) -> float:
+        return self.overhead + self.seconds_per_cell * cells
+
+    def _observe(self, cells: int, elapsed: float) -> None:
+        rate = max(elapsed - self.overhead, 0.0) / max(cells, 1)
+        self.seconds_per_cell = (1 - _SMOOTHING) * self.seconds_per_cell + _SMOOTHING * rate
+
+    def position(self, ticket: Ticket) -> int:
+        if ticket.started:
+            return 0
+        order = self._order()
+        return order.index(ticket) + 1 if ticket in order else 0
+
+    def eta(self, ticket: Ticket) -> float:
+        now = time.monotonic()
+        if ticket.started:
+            return max(self.estimate(ticket.cells) - (now - (ticket.started_at or now)), 0.0)
+        # Oldindagi ishlar va bajarilayotganlarning qolgan vaqti slotlar bo'yicha taqsimlanadi
+        ahead = self._order()
+        ahead = ahead[: ahead.index(ticket)] if ticket in ahead else ahead
+        remaining = sum(
+            max(self.estimate(t.cells) - (now - (t.started_at or now)), 0.0) for t in self._running
+        )
+        waiting = sum(self.estimate(t.cells) for t in ahead)
+        return (remaining + waiting) / self.concurrency + self.estimate(ticket.cells)
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+
+def format_eta(seconds: float) -> str:
+    if seconds < 60:
+        return f"~{max(int(round(seconds)), 1)} s"
+    if seconds < 3600:
+        return f"~{int(round(seconds / 60))} daq"
+    return f"~{seconds / 3600:.1f} soat"
+
+
+def queue_note(ticket: Ticket) -> Optional[str]:
+    """Foydalanuvchi uchun navbat xabari (ish darhol boshlansa None)"""
+    if ticket.started:
+        return None
+    return f"⏳ Navbatdagi o'rningiz: {ticket.position()}, taxminiy tugash vaqti {format_eta(ticket.eta())}"
+
+
+async def send_queue_note(ticket: Ticket, reply: Callable[[str], Awaitable[Any]]) -> None:
+    """
+    Navbat xabarini yuborish. Xabar yuborilmasa (tarmoq xatosi, vaqt tugashi) ish navbatdan
+    olinadi — aks holda `async with ticket` ga yetib kelmagan ish o'rinni va chat hisobini egallab qoladi
+    """
+    note = queue_note(ticket)
+    if not note:
+        return
+    try:
+        await reply(note)
+    except BaseException:
+        ticket.scheduler.finish(ticket, ok=False)
+        raise
+
+
+def estimate_cells(file_size: int) -> int:
+    """Fayl hajmidan taxminiy yacheykalar soni (CSV da "0," — 2 bayt) — fayl o'qilishidan oldin ETA uchun"""
+    return max(file_size // 2, 1)
+
+
+_scheduler: Optional[FairScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> FairScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler(concurrency=get_executor().concurrency)
+        return _scheduler
@@ -1,38 +1,63 @@
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional
-import json
+import hashlib
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
+from app.core.estimation import add_fit_statistics, as_float_matrix, eap_scores, marginal_loglik, sufficient_stats
+
+CERTIFICATION_STANDARDS = {
+    'excellent': {'min_score': 90, 'max_score': 100, 'description': 'Ajoyib natija'},
+    'good': {'min_score': 75, 'max_score': 89, 'description': 'Yaxshi natija'},
+    'satisfactory': {'min_score': 60, 'max_score': 74, 'description': 'Qoniqarli natija'},
+    'needs_improvement': {'min_score': 0, 'max_score': 59, 'description': 'Yaxshilash kerak'}
+}
+
+# Xom ball -> shkala jadvallari keshi (parametrlar to'plamlari soni bo'yicha chegaralangan)
+SCORE_TABLE_CACHE_SIZE = int(os.getenv("RASCH_SCORE_TABLE_CACHE", "32") or 32)
+
 class RaschAnalyzer:
-    def __init__(self):
-        self.results_dir = "./results"
-        os.makedirs(self.results_dir, exist_ok=True)
-    
-    def analyze_response_matrix(self, response_matrix: List[List[int]]) -> Dict:
+    def analyze_response_matrix(self, response_matrix: List[List[int]], item_difficulties: Optional[List[float]] = None) -> Dict:
         """
-        Rasch modeli tahlilini amalga oshiradi va milliy sertifikat kabi ball berish tizimini qo'shadi
+        Rasch modeli tahlilini amalga oshiradi va milliy sertifikat kabi ball berish tizimini qo'shadi.
+        item_difficulties berilsa (oldingi kalibrlash), savollar qayta baholanmaydi — faqat talabgorlar.
         """
         try:
-            # Ma'lumotlarni DataFrame ga o'tkazish
-            df = pd.DataFrame(response_matrix)
+            # Ma'lumotlarni DataFrame ga o'tkazish (yo'q javoblar, siyrak booklet matritsalari -> NaN)
+            df = pd.DataFrame(as_float_matrix(response_matrix))
             
             # Rasch modeli hisoblarini amalga oshirish
             n_items = len(df.columns)
             n_persons = len(df)
             
-            # Item qiyinchilik darajalari (R da hisoblangan)
-            item_difficulties = self._calculate_item_difficulties(df)
+            # Item qiyinchilik darajalari (R da hisoblangan yoki qotirilgan)
+            anchored = item_difficulties is not None
+            if anchored:
+                if len(item_difficulties) != n_items:
+                    raise ValueError(f"Qotirilgan qiyinchiliklar soni savollar soniga mos emas: {len(item_difficulties)} != {n_items}")
+                item_difficulties = [float(d) for d in item_difficulties]
+            else:
+                item_difficulties = self._calculate_item_difficulties(df)
             
+            # Xom ball -> ball jadvali (parametrlar to'plami bo'yicha keshlanadi)
+            table = raw_score_table(item_difficulties)
+
             # Shaxs ballari (EAP - Expected A Posteriori)
-            person_scores = self._calculate_person_scores(df, item_difficulties)
+            person_scores = self._calculate_person_scores(df, item_difficulties, table)
             
             # Milliy sertifikat kabi ball berish tizimi
             certification_scores = self._calculate_certification_scores(person_scores)
             
             # Talabgorlar haqida aniqroq ma'lumot
             detailed_analysis = self._generate_detailed_analysis(df, person_scores, item_difficulties)
+
+            # Model mosligi: theta ~ N(0, 1) bo'yicha marginal log-o'xshashlik (qotirilgan bo'lsa parametrlar 0 ta)
+            matrix = df.to_numpy(dtype=float)
+            log_lik = marginal_loglik(sufficient_stats(matrix), item_difficulties)
+            n_params = 0 if anchored else n_items
             
             # Natijalarni saqlash
             results = {
@@ -41,48 +66,26 @@ class RaschAnalyzer:
                         'item_id': f'Item{i+1}',
                         'difficulty': round(diff, 6),
                         'difficulty_level': self._get_difficulty_level(diff),
-                        'description': f'Savol {i+1} - {self._get_difficulty_level(diff)} qiyinchilik'
+                        'description': f'Savol {i+1} - {self._get_difficulty_level(diff)} qiyinchilik',
+                        'anchored': anchored
                     }
                     for i, diff in enumerate(item_difficulties)
                 ],
-                'persons': [
-                    {
-                        'person_index': i+1,
-                        'eap': round(score, 6),
-                        'se': round(se, 6),
-                        'certification_score': cert_score,
-                        'certification_level': self._get_certification_level(cert_score),
-                        'performance_category': self._get_performance_category(score),
-                        'detailed_feedback': self._generate_person_feedback(score, se, cert_score)
-                    }
-                    for i, (score, se, cert_score) in enumerate(zip(
-                        person_scores['eap'], 
-                        person_scores['se'], 
-                        certification_scores
-                    ))
-                ],
+                'persons': self._build_person_records(person_scores, certification_scores, table),
                 'fit': {
-                    'logLik': -186.808894,
-                    'AIC': 485.617787,
-                    'BIC': 544.111044,
+                    'logLik': round(log_lik, 6),
+                    'AIC': round(-2 * log_lik + 2 * n_params, 6),
+                    'BIC': round(-2 * log_lik + np.log(n_persons) * n_params, 6),
                     'n_obs': n_persons,
                     'n_items': n_items
                 },
-                'certification_standards': {
-                    'excellent': {'min_score': 90, 'max_score': 100, 'description': 'Ajoyib natija'},
-                    'good': {'min_score': 75, 'max_score': 89, 'description': 'Yaxshi natija'},
-                    'satisfactory': {'min_score': 60, 'max_score': 74, 'description': 'Qoniqarli natija'},
-                    'needs_improvement': {'min_score': 0, 'max_score': 59, 'description': 'Yaxshilash kerak'}
-                },
+                'certification_standards': CERTIFICATION_STANDARDS,
                 'detailed_analysis': detailed_analysis,
                 'timestamp': datetime.now().isoformat()
             }
             
-            # JSON faylini saqlash
-            with open(f"{self.results_dir}/rasch_result.json", 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2, ensure_ascii=False)
-            
-            return results
+            # Savollar va talabgorlar uchun infit/outfit (MNSQ, ZSTD) — theta logit shkalasida
+            return add_fit_statistics(results, matrix, item_difficulties, person_scores['theta'])
             
         except Exception as e:
             raise Exception(f"Tahlil xatosi: {str(e)}")
@@ -95,7 +98,10 @@ class RaschAnalyzer:
         for i in range(n_items):
             # Rasch modeli formulasi: log(p/(1-p)) = theta - beta
             correct_responses = df.iloc[:, i].sum()
-            total_responses = len(df)
+            total_responses = df.iloc[:, i].count()  # faqat javob berganlar
+            if total_responses == 0:
+                difficulties.append(0.0)
+                continue
             p = correct_responses / total_responses
             if p == 0:
                 difficulty = 5.0  # Eng qiyin
@@ -110,51 +116,104 @@ class RaschAnalyzer:
         difficulties = (difficulties - difficulties.mean()) / difficulties.std() * 1.5
         return difficulties.tolist()
     
-    def _calculate_person_scores(self, df: pd.DataFrame, item_difficulties: List[float]) -> Dict:
-        """Shaxs ballarini hisoblash (EAP)"""
-        n_persons = len(df)
-        eap_scores = []
-        se_scores = []
-        
-        for i in range(n_persons):
-            # Shaxsning javoblari
-            responses = df.iloc[i].values
-            # EAP hisoblash
-            score = 0
-            for j, response in enumerate(responses):
-                if response == 1:
-                    score += 1 - item_difficulties[j] / 10
-                else:
-                    score -= item_difficulties[j] / 10
-            
-            # Normalizatsiya
-            score = (score / len(responses)) * 100
-            eap_scores.append(score)
-            
-            # Standart xato
-            se = np.sqrt(np.var(responses)) * 5
-            se_scores.append(se)
-        
-        return {'eap': eap_scores, 'se': se_scores}
+    def _calculate_person_scores(self, df: pd.DataFrame, item_difficulties: List[float], table: Optional[Dict] = None) -> Dict:
+        """
+        Shaxs ballarini hisoblash (EAP).
+
+        Barcha savollarga javob berganlar uchun natija faqat xom ballga bog'liq va
+        raw_score_table jadvalidan olinadi. Qolganlari uchun posterior Gauss-Hermite
+        tugunlari bo'yicha hisoblanadi (yo'q javoblar maskalanadi); theta va uning
+        posterior SD si test xarakteristik egri chizig'i orqali 100 ballik shkalaga o'tkaziladi.
+        """
+        matrix = df.to_numpy(dtype=float)
+        missing = np.isnan(matrix)
+        complete = ~missing.any(axis=1)
+        raw = np.where(complete, np.where(missing, 0.0, matrix).sum(axis=1), -1).astype(int)
+
+        theta = np.empty(len(matrix))
+        theta_se = np.empty(len(matrix))
+        eap = np.empty(len(matrix))
+        se = np.empty(len(matrix))
+
+        if table is not None and complete.any():
+            idx = raw[complete]
+            theta[complete], theta_se[complete] = table['theta'][idx], table['theta_se'][idx]
+            eap[complete], se[complete] = table['eap'][idx], table['se'][idx]
+        else:
+            raw[:] = -1
+            complete[:] = False
+
+        rest = ~complete
+        if rest.any():
+            theta[rest], theta_se[rest] = eap_scores(matrix[rest], item_difficulties)
+            scaled, slope = expected_percent_score(theta[rest], item_difficulties)
+            eap[rest], se[rest] = scaled, slope * theta_se[rest]
+
+        return {
+            'eap': eap.tolist(),
+            'se': se.tolist(),
+            'theta': theta.tolist(),
+            'theta_se': theta_se.tolist(),
+            'raw_score': raw.tolist()
+        }
+    
+    def _build_person_records(self, person_scores: Dict, certification_scores: List[int], table: Optional[Dict] = None) -> List[Dict]:
+        """
+        Talabgorlar ro'yxati. To'liq javob berganlarning tavsiflari jadvaldan olinadi;
+        qolganlari uchun daraja, kategoriya va tushuntirish har bir noyob ball uchun
+        bir marta hisoblanadi.
+        """
+        details: Dict[Tuple, Dict] = {}
+        raw_scores = person_scores.get('raw_score') or [-1] * len(person_scores['eap'])
+        records = []
+        for i, (score, se, theta, theta_se, cert_score, raw) in enumerate(zip(
+            person_scores['eap'],
+            person_scores['se'],
+            person_scores['theta'],
+            person_scores['theta_se'],
+            certification_scores,
+            raw_scores
+        )):
+            if table is not None and raw >= 0:
+                detail = table['details'][raw]
+            else:
+                key = (score, se, cert_score)
+                if key not in details:
+                    details[key] = self._person_details(score, se, cert_score)
+                detail = details[key]
+            records.append({
+                'person_index': i+1,
+                'eap': round(score, 6),
+                'se': round(se, 6),
+                'theta': round(theta, 6),
+                'theta_se': round(theta_se, 6),
+                **detail
+            })
+        return records
+    
+    def _person_details(self, score: float, se: float, cert_score: int) -> Dict:
+        """Ballga bog'liq tavsiflar: sertifikat darajasi, kategoriya va tushuntirish"""
+        return {
+            'certification_score': cert_score,
+            'certification_level': self._get_certification_level(cert_score),
+            'performance_category': self._get_performance_category(score),
+            'detailed_feedback': self._generate_person_feedback(score, se, cert_score)
+        }
     
     def _calculate_certification_scores(self, person_scores: Dict) -> List[int]:
         """Milliy sertifikat kabi ball berish"""
-        certification_scores = []
-        
-        for score in person_scores['eap']:
-            # 100 ballik tizimga o'tkazish
-            if score >= 90:
-                cert_score = 100
-            elif score >= 75:
-                cert_score = int(75 + (score - 75) * 1.67)  # 75-89 -> 75-100
-            elif score >= 60:
-                cert_score = int(60 + (score - 60) * 1.07)  # 60-74 -> 60-75
-            else:
-                cert_score = int(score * 1.0)  # 0-59 -> 0-59
-            
-            certification_scores.append(cert_score)
-        
-        return certification_scores
+        scores = np.asarray(person_scores['eap'], dtype=float)
+        # 100 ballik tizimga o'tkazish
+        cert_scores = np.select(
+            [scores >= 90, scores >= 75, scores >= 60],
+            [
+                100.0,
+                75 + (scores - 75) * 1.67,  # 75-89 -> 75-100
+                60 + (scores - 60) * 1.07,  # 60-74 -> 60-75
+            ],
+            default=scores * 1.0  # 0-59 -> 0-59
+        )
+        return np.trunc(cert_scores).astype(int).tolist()
     
     def _get_difficulty_level(self, difficulty: float) -> str:
         """Qiyinchilik darajasini aniqlash"""
@@ -232,7 +291,7 @@ class RaschAnalyzer:
         
         # Umumiy statistika
         total_correct = df.sum().sum()
-        total_possible = n_persons * n_items
+        total_possible = df.count().sum()  # berilgan javoblar (booklet dizaynlarda n_persons * n_items emas)
         overall_accuracy = (total_correct / total_possible) * 100
         
         # Eng yaxshi va eng yomon natijalar
@@ -273,3 +332,120 @@ class RaschAnalyzer:
                 'for_improvement': "Eng ko'p xato qilingan savollarni qayta ko'rib chiqing"
             }
         }
+
+
+def expected_percent_score(theta: np.ndarray, difficulties: List[float], discrimination: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Test xarakteristik egri chizig'i: theta dagi kutilgan to'g'ri javoblar ulushi (0-100)
+    va uning theta bo'yicha hosilasi (standart xatoni o'tkazish uchun)
+    """
+    b = np.asarray(difficulties, dtype=float)
+    p = 1.0 / (1.0 + np.exp(-discrimination * (np.asarray(theta, dtype=float)[:, None] - b[None, :])))
+    return 100.0 * p.mean(axis=1), 100.0 * discrimination * (p * (1.0 - p)).mean(axis=1)
+
+
+_score_tables: "OrderedDict[str, Dict]" = OrderedDict()
+_score_tables_lock = threading.Lock()
+
+
+def item_parameters_key(difficulties: List[float], discrimination: float = 1.0) -> str:
+    """Savol parametrlari to'plamining xeshi (jadval keshi kaliti)"""
+    digest = hashlib.sha1(np.ascontiguousarray(difficulties, dtype=np.float64).tobytes())
+    digest.update(np.float64(discrimination).tobytes())
+    return digest.hexdigest()
+
+
+def _build_raw_score_table(difficulties: List[float], discrimination: float) -> Dict:
+    n_items = len(difficulties)
+    # r-qatorda birinchi r ta savol to'g'ri: Rasch modelida xom ball yetarli statistika
+    patterns = np.tri(n_items + 1, n_items, k=-1)
+    theta, theta_se = eap_scores(patterns, difficulties, discrimination, collapse=False)
+    scaled, slope = expected_percent_score(theta, difficulties, discrimination)
+    scaled_se = slope * theta_se
+
+    analyzer = RaschAnalyzer()
+    cert_scores = analyzer._calculate_certification_scores({'eap': scaled.tolist()})
+    details = [
+        analyzer._person_details(float(score), float(se), cert)
+        for score, se, cert in zip(scaled, scaled_se, cert_scores)
+    ]
+
+    table = {
+        'theta': theta,
+        'theta_se': theta_se,
+        'eap': scaled,
+        'se': scaled_se,
+        'certification_score': np.asarray(cert_scores),
+    }
+    for values in table.values():
+        values.setflags(write=False)
+    table['details'] = details
+    return table
+
+
+def raw_score_table(difficulties: List[float], discrimination: float = 1.0) -> Dict:
+    """
+    To'liq javob bergan talabgorlar uchun xom ball (0..n) -> theta, SE, 100 ballik ball,
+    sertifikat bali, darajasi va kategoriyasi jadvali. Har bir parametrlar to'plami
+    uchun bir marta hisoblanadi va LRU keshda saqlanadi; qatorlar xom ball bo'yicha indekslanadi.
+    """
+    key = item_parameters_key(difficulties, discrimination)
+    with _score_tables_lock:
+        table = _score_tables.get(key)
+        if table is not None:
+            _score_tables.move_to_end(key)
+            return table
+
+    table = _build_raw_score_table(difficulties, discrimination)
+    with _score_tables_lock:
+        _score_tables[key] = table
+        _score_tables.move_to_end(key)
+        while len(_score_tables) > SCORE_TABLE_CACHE_SIZE:
+            _score_tables.popitem(last=False)
+    return table
+
+
+def enrich_person_scores(result: Dict) -> Dict:
+    """
+    R yoki NumPy natijasidagi EAP (theta) qiymatlariga 100 ballik shkala,
+    sertifikat bali, darajasi va tushuntirishni qo'shadi
+    """
+    items = result.get('items', [])
+    persons = result.get('persons', [])
+    if not items or not persons:
+        return result
+
+    analyzer = RaschAnalyzer()
+    difficulties = [float(item.get('difficulty', 0.0)) for item in items]
+    discrimination = float(items[0].get('discrimination', 1.0))
+
+    theta = np.array([p.get('eap') if p.get('eap') is not None else np.nan for p in persons], dtype=float)
+    theta_se = np.array([p.get('se') if p.get('se') is not None else np.nan for p in persons], dtype=float)
+    known = ~np.isnan(theta)
+
+    scaled = np.full(theta.shape, np.nan)
+    slope = np.full(theta.shape, np.nan)
+    unique_theta, inverse = np.unique(theta[known], return_inverse=True)
+    unique_scaled, unique_slope = expected_percent_score(unique_theta, difficulties, discrimination)
+    scaled[known], slope[known] = unique_scaled[inverse], unique_slope[inverse]
+    # Delta usuli: 100 ballik shkaladagi standart xato
+    scaled_se = slope * theta_se
+
+    cert_scores = analyzer._calculate_certification_scores({'eap': np.nan_to_num(scaled).tolist()})
+    # R factor.scores ham naqsh bo'yicha hisoblaydi: bir xil (eap, se) li talabgorlar
+    # uchun tavsiflar bir marta yaratiladi
+    details: Dict[Tuple, Dict] = {}
+    for i, person in enumerate(persons):
+        if not known[i]:
+            continue
+        score = float(scaled[i])
+        se = float(scaled_se[i]) if not np.isnan(scaled_se[i]) else 0.0
+        key = (score, se, cert_scores[i])
+        if key not in details:
+            details[key] = analyzer._person_details(score, se, cert_scores[i])
+        person['scaled_score'] = round(score, 6)
+        person['scaled_se'] = round(se, 6)
+        person.update(details[key])
+
+    result.setdefault('certification_standards', CERTIFICATION_STANDARDS)
+    return result
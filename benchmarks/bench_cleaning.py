@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+clean_response_matrix benchmarki: 100 000 x 60 yuklama (Ism, Fam + 58 ta savol, CSV dan
+o'qilgandek satrlar). Oldingi qatorma-qator yo'l (har bir yacheyka ikki marta
+_normalize_cell orqali) bilan vektorlashtirilgan yo'l solishtiriladi.
+
+    python benchmarks/bench_cleaning.py [--rows 100000] [--items 58]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.core.cleaning import (
+    _looks_like_label_header,
+    _looks_like_question_header,
+    _normalize_cell,
+    _pick_best_block,
+    clean_response_matrix,
+)
+
+
+def make_upload(n_rows: int, n_items: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    header = ["Ism", "Fam"] + [f"Q{j}" for j in range(1, n_items + 1)]
+    cells = np.where(rng.random((n_rows, n_items)) < 0.6, "1", "0").astype(object)
+    cells[rng.random((n_rows, n_items)) < 0.02] = ""
+    rows = [header]
+    for i in range(n_rows):
+        rows.append([f"Ism{i}", f"Fam{i}"] + cells[i].tolist())
+    return rows
+
+
+def legacy_clean(matrix):
+    """Oldingi amalga oshirish: padded nusxa, har bir yacheyka ikki marta normallashtiriladi"""
+    raw = [list(row) for row in matrix if any(str(c).strip() for c in row)]
+    max_len = max(len(r) for r in raw)
+    padded = [r + [None] * (max_len - len(r)) for r in raw]
+    header = padded[0]
+    norm_grid = [[_normalize_cell(v) for v in r] for r in padded]
+
+    def binary_ratio(values):
+        non_missing = [v for v in values if v is not None]
+        if not non_missing:
+            return 0.0
+        return sum(1 for v in non_missing if v in (0, 1)) / len(non_missing)
+
+    ratios = [binary_ratio([row[j] for row in norm_grid[1:]]) for j in range(max_len)]
+    candidates = []
+    for j, hv in enumerate(header):
+        if isinstance(hv, str) and _looks_like_label_header(hv):
+            continue
+        if (isinstance(hv, str) and _looks_like_question_header(hv)) or ratios[j] >= 0.85:
+            candidates.append(j)
+    qcols = _pick_best_block(sorted(candidates))
+
+    cleaned = []
+    for row in raw:
+        norm_row = [_normalize_cell(v) for v in row]
+        if len(norm_row) < max(qcols) + 1:
+            norm_row += [None] * (max(qcols) + 1 - len(norm_row))
+        cleaned.append([norm_row[j] for j in qcols])
+    return [r for r in cleaned if any(v in (0, 1) for v in r)]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=58)
+    args = parser.parse_args()
+
+    rows, t_gen = timed(make_upload, args.rows, args.items)
+    print(f"Yuklama: {args.rows} x {args.items + 2} ({t_gen:.1f} s)")
+
+    legacy, t_legacy = timed(legacy_clean, rows)
+    cleaned, t_lists = timed(clean_response_matrix, rows)
+    compact, t_compact = timed(clean_response_matrix, rows, compact=True)
+
+    assert cleaned == legacy
+    assert compact.shape == (len(legacy), len(legacy[0]))
+
+    print(f"Oldingi (qatorma-qator):        {t_legacy:7.2f} s")
+    print(f"Vektorlashtirilgan (ro'yxat):   {t_lists:7.2f} s  x{t_legacy / t_lists:.1f}")
+    print(f"Vektorlashtirilgan (compact):   {t_compact:7.2f} s  x{t_legacy / t_compact:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+CSV yuklamani o'qish benchmarki: butun faylni ro'yxatga o'qib tozalash (oldingi bot yo'li)
+va oqimli bo'laklab o'qish (read_csv_compact) — vaqt va eng katta xotira (tracemalloc).
+
+    python benchmarks/bench_csv_ingest.py [--rows 300000] [--items 58]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.core.cleaning import clean_response_matrix
+from app.core.ingest import read_csv_compact
+
+
+def write_upload(path: str, n_rows: int, n_items: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Ism,Familiya," + ",".join(f"Q{j}" for j in range(1, n_items + 1)) + "\n")
+        for start in range(0, n_rows, 50_000):
+            block = np.where(rng.random((min(50_000, n_rows - start), n_items)) < 0.6, "1", "0")
+            f.write("".join(
+                f'Ism{start + i},"Familiya, {start + i}",' + ",".join(row) + "\n"
+                for i, row in enumerate(block.tolist())
+            ))
+
+
+def legacy_read(path: str):
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            rows.append(line.rstrip("\n").split(","))
+    return clean_response_matrix(rows, compact=True)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    out = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, elapsed, peak / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--items", type=int, default=58)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "upload.csv")
+        write_upload(path, args.rows, args.items)
+        print(f"Fayl: {args.rows} x {args.items + 2}, {os.path.getsize(path) / 1e6:.0f} MB")
+
+        legacy, t_legacy, m_legacy = measure(legacy_read, path)
+        (streamed, detection), t_stream, m_stream = measure(read_csv_compact, path)
+
+        print(f"Ro'yxatga o'qish + tozalash: {t_legacy:6.2f} s, eng katta xotira {m_legacy:7.1f} MB, {legacy!r}")
+        print(f"Oqimli (read_csv_compact):   {t_stream:6.2f} s, eng katta xotira {m_stream:7.1f} MB, {streamed!r}")
+        print(f"Savollar: {detection.describe()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Katta guruhlar uchun PDF hisobot benchmarki: talabgorlar ro'yxati bitta jadvalda (oldingi yo'l),
+sahifa hajmidagi bo'laklarda (large_report) va CSV ilovada (roster_appendix) — vaqt va xotira
+o'sishi (har bir o'lchov alohida jarayonda, ru_maxrss bo'yicha; tracemalloc kvadratik yo'lni
+o'nlab marta sekinlashtiradi).
+
+    python benchmarks/bench_pdf_report.py [--sizes 1000,5000,20000] [--items 40]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.core.estimation import estimate_rasch
+from app.services.pdf_generator import PDFGenerator, create_roster_appendix
+from app.services.scoring import enrich_person_scores
+
+MODES = {
+    "bitta jadval": dict(large_report=False, roster_appendix=False),
+    "bo'laklar": dict(large_report=True, roster_appendix=False),
+    "CSV ilova": dict(large_report=True, roster_appendix=True),
+}
+
+
+def simulate_result(n_persons: int, n_items: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    theta = rng.normal(0.0, 1.0, n_persons)
+    difficulties = np.linspace(-2.0, 2.0, n_items)
+    prob = 1.0 / (1.0 + np.exp(-(theta[:, None] - difficulties[None, :])))
+    return enrich_person_scores(estimate_rasch((rng.random(prob.shape) < prob).astype(float)))
+
+
+def render(n_persons: int, n_items: int, mode: str) -> tuple:
+    options = MODES[mode]
+    result = simulate_result(n_persons, n_items)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    size = len(PDFGenerator().generate_rasch_report(result, **options))
+    if options["roster_appendix"]:
+        size += len(create_roster_appendix(result, "csv"))
+    elapsed = time.perf_counter() - start
+    # ru_maxrss Linux da KB da
+    grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    return elapsed, grown / 1e3, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,5000,20000")
+    parser.add_argument("--items", type=int, default=40)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for n_persons in (int(v) for v in args.sizes.split(",")):
+        for mode in MODES:
+            with context.Pool(1) as pool:
+                elapsed, grown, size = pool.apply(render, (n_persons, args.items, mode))
+            print(
+                f"{n_persons:>7} talabgor, {mode:<13}: {elapsed:6.2f} s, "
+                f"xotira o'sishi {grown:6.1f} MB, {size / 1e3:7.0f} KB"
+            )
+
+
+if __name__ == "__main__":
+    main()
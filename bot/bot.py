@@ -1,11 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import io
 import json
 import os
 import tempfile
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
 from telegram import Update, Document
@@ -14,9 +15,19 @@ from telegram.ext import Application, CommandHandler, MessageHandler, filters, C
 # Reuse r_runner from the app package
 import sys
 sys.path.append(str(Path(__file__).resolve().parents[1]))
-from app.core.r_runner import run_rasch_model  # type: ignore
-from app.core.cleaning import clean_response_matrix  # type: ignore
-from app.services.pdf_generator import create_rasch_pdf_report  # type: ignore
+from app.core.engine import ENGINES, resolve_engine  # type: ignore
+from app.core.r_pool import start_pool, stop_pool  # type: ignore
+from app.core.cleaning import ColumnDetection, clean_response_matrix, detect_question_columns  # type: ignore
+from app.core.ingest import is_supported_upload, load_upload  # type: ignore
+from app.core.response_matrix import ResponseMatrix  # type: ignore
+from app.services.artifacts import get_artifact_store, new_job_id, save_report  # type: ignore
+from app.services.certificates import create_certificates_zip, stop_certificate_pool  # type: ignore
+from app.services.executor import get_executor, needs_process, render_pdf, render_roster, run_analysis, stop_executor  # type: ignore
+from app.services.pdf_generator import needs_roster_appendix  # type: ignore
+from app.services.scheduler import QueueFullError, estimate_cells, get_scheduler, send_queue_note  # type: ignore
+
+
+LOW_DETECTION_CONFIDENCE = 0.8
 
 
 def read_token() -> str:
@@ -44,8 +55,15 @@ async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "\n".join([
             "📋 Foydalanish:",
             "📊 CSV fayl yuboring (0/1, header bo'lishi mumkin) — natija PDF qaytariladi",
+            "📗 Excel (.xlsx) fayl ham yuborish mumkin — birinchi ma'lumotli varaq o'qiladi, boshqasi uchun izohga sheet=Nomi yoki sheet=2",
+            "🗃 Katta guruhlar uchun Parquet (.parquet), Arrow (.arrow/.feather) yoki NumPy (.npy) fayllar ham qabul qilinadi",
             "📄 /calcjson {\"responses\": [[...],[...]]} — natija PDF",
             "📋 /template — namunaviy CSV faylni olish",
+            f"⚙️ Hisoblash usuli: CSV izohiga engine=numpy yoki JSON ichida \"engine\": \"numpy\" ({', '.join(ENGINES)})",
+            "📌 Qotirilgan qiyinchiliklar: izohga anchors=-0.5,0.1,... yoki JSON ichida \"anchors\": [...] — faqat talabgorlar baholanadi",
+            "🗂 Savollar banki: form=ID — kalibrlashni saqlash, anchor=ID — saqlangan shakl bo'yicha baholash",
+            "🌊 To'lqinlar: exam=ID — yangi natijalarni oldingi to'lqinlarga qo'shib qayta kalibrlash (parametrlar anchor=exam:ID sifatida)",
+            "🎓 Sertifikatlar: izohga certificates=1 yoki JSON ichida \"certificates\": true — har bir talabgor uchun PDF sertifikatlar ZIP arxivda",
             "",
             "💡 Tavsiya: birinchi ustun(lar) talabgor (Ism,Fam), keyin Q1..Q40 (0/1)",
             "🔧 Boshqa ko'rinishlar tozalanadi, ammo xatolik ehtimoli bor",
@@ -54,73 +72,161 @@ async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             "• Umumiy ma'lumotlar (AIC, BIC, Log-Likelihood)",
             "• Item qiyinchilik parametrlari",
             "• Shaxs skorlari (EAP)",
-            "• Vizual grafiklar"
+            "• Vizual grafiklar (Wright xaritasi, axborot egri chizig'i, ballar taqsimoti)"
         ])
     )
 
 
-def _write_cleaned_to_csv(cleaned: List[List[Optional[int]]]) -> Path:
-    tmp = tempfile.NamedTemporaryFile(prefix="rasch_clean_", suffix=".csv", delete=False)
-    tmp_path = Path(tmp.name)
-    tmp.close()
-    with tmp_path.open("w", encoding="utf-8") as f:
-        for row in cleaned:
-            f.write(",".join("" if v is None else str(int(v)) for v in row) + "\n")
-    return tmp_path
-
-
-async def handle_csv(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    doc: Document | None = update.message.document if update.message else None
-    if not doc or not doc.file_name or not doc.file_name.lower().endswith(".csv"):
-        return
-
-    tf = tempfile.NamedTemporaryFile(prefix="rasch_csv_", suffix=".csv", delete=False)
-    tf_path = Path(tf.name)
-    tf.close()
+def _caption_options(caption: Optional[str]) -> Dict[str, str]:
+    # Hujjat izohidagi "engine=numpy anchors=-0.5,0.1,..." ko'rinishidagi parametrlar
+    options: Dict[str, str] = {}
+    for token in (caption or "").split():
+        key, sep, value = token.partition("=")
+        if sep:
+            options[key.strip().lower()] = value.strip()
+    return options
 
-    file = await doc.get_file()
-    await file.download_to_drive(custom_path=str(tf_path))
 
+def _parse_anchors(value: Any) -> Optional[List[float]]:
+    # Qotirilgan qiyinchiliklar: JSON ro'yxat yoki vergul bilan ajratilgan satr
+    if value is None:
+        return None
+    items = value.split(",") if isinstance(value, str) else value
     try:
-        # Read raw CSV (simple comma split)
-        rows: List[List[Any]] = []
-        with tf_path.open("r", encoding="utf-8") as f:
-            for line in f:
-                rows.append([c for c in line.rstrip("\n").split(",")])
-
-        cleaned = clean_response_matrix(rows)
-        if not cleaned:
-            await update.message.reply_text("⚠️ Jadvalni tozalash imkonsiz: savollar aniqlanmadi.")
-            tf_path.unlink(missing_ok=True)
-            return
-
-        n_students = len(cleaned)
-        n_questions = len(cleaned[0]) if cleaned and cleaned[0] is not None else 0
-        await update.message.reply_text(f"✅ {n_students} ta talabgor, {n_questions} ta savol aniqlandi. Hisoblanmoqda...")
+        return [float(v) for v in items]
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Qotirilgan qiyinchiliklar noto'g'ri: {e}") from e
+
+
+def _is_enabled(value: Any) -> bool:
+    # Izohdagi "certificates=1" yoki JSON dagi "certificates": true
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "ha", "zip")
+    return bool(value)
+
+
+def _detection_note(detection: ColumnDetection) -> str:
+    # Aniqlangan savol ustunlari va ishonch darajasi foydalanuvchiga ko'rsatiladi
+    note = f"🔎 Savollar: {detection.describe()}"
+    if detection.sampled:
+        note += f" — {detection.sample_rows} ta qator tanlanmasi bo'yicha"
+    if detection.confidence < LOW_DETECTION_CONFIDENCE:
+        note += "\n⚠️ Ishonch past: ustunlar to'g'ri aniqlanganini tekshiring (tavsiya: Ism,Fam, keyin Q1..Qn)"
+    return note
+
+
+async def _analyze_and_reply(
+    update: Update,
+    cleaned: ResponseMatrix,
+    detection: ColumnDetection,
+    engine: str,
+    anchors: Optional[List[float]],
+    discrimination: Optional[float],
+    form_id: Optional[str],
+    anchor_form: Optional[str],
+    exam_id: Optional[str],
+    certificates: bool = False,
+) -> None:
+    # Baholash va PDF jarayonlar havzasida: boshqa foydalanuvchilar kutib qolmaydi
+    executor = get_executor()
+    n_students, n_questions = cleaned.shape
+    await update.message.reply_text(
+        f"✅ {n_students} ta talabgor, {n_questions} ta savol aniqlandi.\n{_detection_note(detection)}\n🧮 Hisoblanmoqda..."
+    )
 
-        tmp_path = _write_cleaned_to_csv(cleaned)
-        try:
-            result: dict[str, Any] = run_rasch_model(tmp_path)
-        finally:
-            tmp_path.unlink(missing_ok=True)
+    try:
+        result: Dict[str, Any] = await executor.run(
+            run_analysis, cleaned, engine, anchors, discrimination, form_id, anchor_form, exam_id,
+            cpu=needs_process(engine),
+        )
     except Exception as e:
         await update.message.reply_text(f"❌ Hisoblash xatosi: {e}")
-        tf_path.unlink(missing_ok=True)
         return
 
-    tf_path.unlink(missing_ok=True)
-
     # PDF yaratish
     try:
-        pdf_content = create_rasch_pdf_report(result)
+        await update.message.reply_text("📄 Hisoblash tugadi, PDF tayyorlanmoqda...")
+        pdf_content = await executor.run(render_pdf, result)
+        if get_artifact_store() is not None:
+            await asyncio.to_thread(save_report, new_job_id(), result, pdf_content)
         bio = io.BytesIO(pdf_content)
         bio.name = "rasch_report.pdf"
         await update.message.reply_document(
             document=bio,
             caption=f"📊 Rasch Model Hisobot\n👥 {n_students} ta talabgor\n❓ {n_questions} ta savol"
         )
+        # Katta guruhda to'liq ro'yxat PDF ga kiritilmaydi — alohida CSV ilova
+        if needs_roster_appendix(result):
+            roster = io.BytesIO(await executor.run(render_roster, result, "csv"))
+            roster.name = "rasch_roster.csv"
+            await update.message.reply_document(document=roster, caption="📋 To'liq talabgorlar ro'yxati (CSV)")
     except Exception as e:
         await update.message.reply_text(f"❌ PDF yaratishda xato: {e}")
+        return
+
+    if certificates:
+        try:
+            await update.message.reply_text(f"🎓 {n_students} ta sertifikat tayyorlanmoqda...")
+            # Sertifikatlar o'z jarayonlar havzasida chiziladi — bu yerda faqat ZIP yig'iladi (oqimda)
+            archive = io.BytesIO(await executor.run(create_certificates_zip, result, cpu=False))
+            archive.name = "rasch_certificates.zip"
+            await update.message.reply_document(document=archive, caption=f"🎓 {n_students} ta sertifikat (ZIP)")
+        except Exception as e:
+            await update.message.reply_text(f"❌ Sertifikatlarni yaratishda xato: {e}")
+
+
+async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    doc: Document | None = update.message.document if update.message else None
+    if not doc or not doc.file_name or not is_supported_upload(doc.file_name):
+        return
+
+    tf = tempfile.NamedTemporaryFile(prefix="rasch_upload_", suffix=Path(doc.file_name).suffix.lower(), delete=False)
+    tf_path = Path(tf.name)
+    tf.close()
+
+    file = await doc.get_file()
+    await file.download_to_drive(custom_path=str(tf_path))
+
+    try:
+        options = _caption_options(update.message.caption)
+        engine = resolve_engine(options.get("engine"))
+        anchors = _parse_anchors(options.get("anchors"))
+        discrimination = float(options["discrimination"]) if "discrimination" in options else None
+        # Adolatli navbat: har bir chat o'z navbatida, chatlar navbatma-navbat xizmat qilinadi
+        ticket = get_scheduler().submit(update.message.chat_id, estimate_cells(tf_path.stat().st_size))
+    except Exception as e:
+        await update.message.reply_text(f"❌ {e}" if isinstance(e, QueueFullError) else f"❌ Hisoblash xatosi: {e}")
+        tf_path.unlink(missing_ok=True)
+        return
+
+    try:
+        await send_queue_note(ticket, update.message.reply_text)
+    except BaseException:
+        tf_path.unlink(missing_ok=True)
+        raise
+
+    async with ticket:
+        try:
+            # Fayl havzada to'g'ridan-to'g'ri ixcham (bitlarga joylangan) matritsaga yig'iladi:
+            # katta fayllarda ham xotira cheklangan, hodisalar sikli bloklanmaydi
+            await update.message.reply_text("📥 Fayl o'qilmoqda...")
+            cleaned, detection = await get_executor().run(
+                load_upload, str(tf_path), doc.file_name, options.get("sheet")
+            )
+            if not cleaned:
+                await update.message.reply_text("⚠️ Jadvalni tozalash imkonsiz: savollar aniqlanmadi.")
+                return
+        except Exception as e:
+            await update.message.reply_text(f"❌ Hisoblash xatosi: {e}")
+            return
+        finally:
+            tf_path.unlink(missing_ok=True)
+
+        await _analyze_and_reply(
+            update, cleaned, detection, engine, anchors, discrimination,
+            options.get("form"), options.get("anchor"), options.get("exam"),
+            _is_enabled(options.get("certificates")),
+        )
 
 
 async def calcjson(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -134,40 +240,31 @@ async def calcjson(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     try:
         payload = json.loads(payload_str)
-        matrix = payload.get("responses")
-        cleaned = clean_response_matrix(matrix)
-        if not isinstance(cleaned, list) or not cleaned:
+        engine = resolve_engine(payload.get("engine"))
+        anchors = _parse_anchors(payload.get("anchors"))
+        discrimination = payload.get("discrimination")
+        matrix = payload.get("responses") or []
+        detection = detect_question_columns(matrix)
+        cleaned = clean_response_matrix(matrix, compact=True, detection=detection)
+        if not cleaned or cleaned.n_items == 0:
             raise ValueError("Kiritma tozalanmadi yoki bo'sh.")
     except Exception as e:
         await update.message.reply_text(f"❌ JSON xato: {e}")
         return
 
-    n_students = len(cleaned)
-    n_questions = len(cleaned[0]) if cleaned and cleaned[0] is not None else 0
-    await update.message.reply_text(f"✅ {n_students} ta talabgor, {n_questions} ta savol aniqlandi. Hisoblanmoqda...")
-
-    with tempfile.TemporaryDirectory(prefix="rasch_") as td:
-        p = Path(td) / "inp.csv"
-        with p.open("w", encoding="utf-8") as f:
-            for row in cleaned:
-                f.write(",".join("" if v is None else str(int(v)) for v in row) + "\n")
-        try:
-            result = run_rasch_model(p)
-        except Exception as e:
-            await update.message.reply_text(f"❌ Hisoblash xatosi: {e}")
-            return
-
-    # PDF yaratish
     try:
-        pdf_content = create_rasch_pdf_report(result)
-        bio = io.BytesIO(pdf_content)
-        bio.name = "rasch_report.pdf"
-        await update.message.reply_document(
-            document=bio,
-            caption=f"📊 Rasch Model Hisobot\n👥 {n_students} ta talabgor\n❓ {n_questions} ta savol"
+        ticket = get_scheduler().submit(update.message.chat_id, cleaned.n_persons * cleaned.n_items)
+    except QueueFullError as e:
+        await update.message.reply_text(f"❌ {e}")
+        return
+    await send_queue_note(ticket, update.message.reply_text)
+
+    async with ticket:
+        await _analyze_and_reply(
+            update, cleaned, detection, engine, anchors, discrimination,
+            payload.get("form_id"), payload.get("anchor_form"), payload.get("exam_id"),
+            _is_enabled(payload.get("certificates")),
         )
-    except Exception as e:
-        await update.message.reply_text(f"❌ PDF yaratishda xato: {e}")
 
 
 async def template(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -198,11 +295,18 @@ def main() -> None:
     app.add_handler(CommandHandler("help", help_cmd))
     app.add_handler(CommandHandler("calcjson", calcjson))
     app.add_handler(CommandHandler("template", template))
-    app.add_handler(MessageHandler(filters.Document.ALL, handle_csv))
+    app.add_handler(MessageHandler(filters.Document.ALL, handle_document))
 
+    start_pool()
+    get_executor().warm_up()
     print("🤖 Telegram bot ishga tushdi!")
     print(f"🔗 Token: {token[:20]}...")
-    app.run_polling(close_loop=False)
+    try:
+        app.run_polling(close_loop=False)
+    finally:
+        stop_executor()
+        stop_certificate_pool()
+        stop_pool()
 
 
 if __name__ == "__main__":
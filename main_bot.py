@@ -5,13 +5,16 @@ Bu bot Rasch modeli tahlilini amalga oshiradi va natijalarni PDF formatida qayta
 Milliy sertifikat kabi ball berish tizimi bilan.
 """
 
+import asyncio
+import io
 import os
 import logging
 import json
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from app.services.scoring import RaschAnalyzer
-from app.services.pdf_generator import PDFGenerator
+from app.services.artifacts import get_artifact_store, new_job_id, save_report
+from app.services.executor import analyze_matrix, get_executor, render_pdf, stop_executor
+from app.services.scheduler import QueueFullError, get_scheduler, send_queue_note
 
 # Logging sozlamalari
 logging.basicConfig(
@@ -25,8 +28,9 @@ TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', 'your_bot_token_here')
 
 class RaschTelegramBot:
     def __init__(self):
-        self.rasch_analyzer = RaschAnalyzer()
-        self.pdf_generator = PDFGenerator()
+        # Tahlil va PDF jarayonlar havzasida bajariladi — bot boshqa foydalanuvchilarga javob beradi
+        self.executor = get_executor()
+        self.scheduler = get_scheduler()
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start buyrug'i"""
@@ -113,40 +117,54 @@ CSV formatida response matrix yuboring. Masalan:
             # Matrix ni parse qilish
             matrix = self._parse_csv_matrix(text)
             
-            # Tahlil qilish
-            await update.message.reply_text("🔄 Tahlil amalga oshirilmoqda...")
-            
-            results = self.rasch_analyzer.analyze_response_matrix(matrix)
-            
-            # PDF hisobot yaratish
-            pdf_path = self.pdf_generator.generate_rasch_report(results)
-            
-            # Natijalarni qisqacha ko'rsatish
-            summary = self._generate_summary(results)
-            
-            await update.message.reply_html(summary)
-            
-            # PDF faylni yuborish
-            with open(pdf_path, 'rb') as pdf_file:
-                await update.message.reply_document(
-                    document=pdf_file,
-                    filename="rasch_analysis_report.pdf",
-                    caption="📊 Rasch modeli tahlili hisoboti"
-                )
+            # Adolatli navbat: har bir chat o'z navbatida, chatlar navbatma-navbat xizmat qilinadi
+            try:
+                ticket = self.scheduler.submit(update.message.chat_id, len(matrix) * len(matrix[0]))
+            except QueueFullError as e:
+                await update.message.reply_text(f"❌ {e}")
+                return
+            await send_queue_note(ticket, update.message.reply_text)
             
-            # JSON natijalarni ham yuborish
-            json_path = "./results/rasch_result.json"
-            with open(json_path, 'rb') as json_file:
-                await update.message.reply_document(
-                    document=json_file,
-                    filename="rasch_results.json",
-                    caption="📋 Batafsil natijalar (JSON)"
-                )
+            async with ticket:
+                await self._analyze(update, matrix)
                 
         except Exception as e:
             logger.error(f"Tahlil xatosi: {str(e)}")
             await update.message.reply_text(f"❌ Xatolik yuz berdi: {str(e)}")
     
+    async def _analyze(self, update: Update, matrix: list):
+        """Tahlil, PDF va JSON — jarayonlar havzasida"""
+        # Tahlil qilish
+        await update.message.reply_text("🔄 Tahlil amalga oshirilmoqda...")
+        
+        results = await self.executor.run(analyze_matrix, matrix)
+        
+        # Natijalarni qisqacha ko'rsatish
+        summary = self._generate_summary(results)
+        
+        await update.message.reply_html(summary)
+        
+        # PDF hisobot yaratish
+        await update.message.reply_text("📄 PDF hisobot tayyorlanmoqda...")
+        pdf_content = await self.executor.run(render_pdf, results)
+        if get_artifact_store() is not None:
+            await asyncio.to_thread(save_report, new_job_id(), results, pdf_content)
+        
+        # PDF faylni yuborish
+        await update.message.reply_document(
+            document=io.BytesIO(pdf_content),
+            filename="rasch_analysis_report.pdf",
+            caption="📊 Rasch modeli tahlili hisoboti"
+        )
+        
+        # JSON natijalarni ham yuborish (parallel tahlillar umumiy faylni ezmasligi uchun xotiradan)
+        await update.message.reply_document(
+            document=io.BytesIO(json.dumps(results, ensure_ascii=False, indent=2).encode('utf-8')),
+            filename="rasch_results.json",
+            caption="📋 Batafsil natijalar (JSON)"
+        )
+    
+    
     def _is_valid_csv_matrix(self, text: str) -> bool:
         """CSV matrix formatini tekshirish"""
         lines = text.strip().split('\n')
@@ -234,7 +252,11 @@ async def main():
     
     # Bot ni ishga tushirish
     logger.info("Bot ishga tushirilmoqda...")
-    await application.run_polling()
+    bot.executor.warm_up()
+    try:
+        await application.run_polling()
+    finally:
+        stop_executor()
 
 if __name__ == '__main__':
     import asyncio
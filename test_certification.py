@@ -8,7 +8,11 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.services.scoring import RaschAnalyzer
-from app.services.pdf_generator import PDFGenerator
+from app.services.pdf_generator import ROSTER_CHUNK_ROWS, PDFGenerator, create_roster_appendix
+from app.services.certificates import create_certificates_zip
+from app.services.report_resources import get_report_resources
+from app.services.charts import report_charts, wright_map_data
+from app.core.result_cache import get_result_cache
 
 def test_certification_system():
     """Test ma'lumotlari bilan sertifikat tizimini sinab ko'rish"""
@@ -53,11 +57,12 @@ def test_certification_system():
     
     # PDF hisobot
     pdf_generator = PDFGenerator()
-    pdf_path = pdf_generator.generate_rasch_report(results)
+    pdf_content = pdf_generator.generate_rasch_report(results)
+    assert pdf_content.startswith(b"%PDF")
     
     print(f"✅ Test muvaffaqiyatli yakunlandi!")
     print(f"📊 Natijalar: {len(results['persons'])} talabgor")
-    print(f"📄 PDF hisobot: {pdf_path}")
+    print(f"📄 PDF hisobot: {len(pdf_content)} bayt (xotirada)")
     
     # Eng yaxshi 5 talabgor
     top_5 = sorted(results['persons'], key=lambda x: x['certification_score'], reverse=True)[:5]
@@ -77,5 +82,83 @@ def test_certification_system():
     print(f"🥉 Qoniqarli (C): {satisfactory} talabgor")
     print(f"📚 Yaxshilash kerak (D): {needs_improvement} talabgor")
 
+def test_large_report_chunks_roster_and_appendix():
+    """Katta guruh: ro'yxat sahifa hajmidagi jadvallarga bo'linadi, to'liq ro'yxat CSV ilovada"""
+    persons = [
+        {'person_index': i, 'eap': 50.0, 'certification_score': 70, 'certification_level': 'C',
+         'performance_category': "O'rtacha", 'detailed_feedback': 'Izoh'}
+        for i in range(1, 2 * ROSTER_CHUNK_ROWS + 6)
+    ]
+    results = {'persons': persons, 'items': [{'item_id': 'Item1', 'difficulty': 0.0}]}
+    generator = PDFGenerator()
+
+    tables = generator._roster_tables(persons, chunked=True)
+    assert len(tables) == 3 and all(table.repeatRows == 1 for table in tables)
+    assert sum(len(table._cellvalues) - 1 for table in tables) == len(persons)
+
+    chunked = generator.generate_rasch_report(results, large_report=True)
+    appendix = generator.generate_rasch_report(results, roster_appendix=True)
+    assert chunked.startswith(b"%PDF") and len(appendix) < len(chunked)
+
+    roster = create_roster_appendix(results, "csv").decode("utf-8-sig").splitlines()
+    assert len(roster) == len(persons) + 1 and roster[1].startswith("1,Talabgor 1,")
+
+
+def test_certificates_zip():
+    """Har bir baholangan talabgor uchun bitta PDF sertifikat; kirill nomlar ham chiziladi"""
+    import io
+    import zipfile
+
+    persons = [
+        {'person_index': 1, 'person_id': 'Ali Valiyev', 'eap': 72.5, 'scaled_score': 72.5,
+         'certification_score': 72, 'certification_level': 'B', 'performance_category': 'Yaxshi',
+         'detailed_feedback': '🎉 Yaxshi natija'},
+        {'person_index': 2, 'person_id': 'Анна Петрова', 'eap': 40.0, 'certification_score': 55,
+         'certification_level': 'C', 'performance_category': 'Qoniqarli', 'detailed_feedback': 'Izoh'},
+        {'person_index': 3, 'eap': None, 'certification_score': None},
+    ]
+    archive = zipfile.ZipFile(io.BytesIO(create_certificates_zip({'persons': persons, 'items': [{}] * 10})))
+    names = archive.namelist()
+    assert names == ['00001_Ali_Valiyev.pdf', '00002_Анна_Петрова.pdf']
+    assert all(archive.read(name).startswith(b"%PDF") for name in names)
+
+
+def test_report_resources_shared():
+    """Shriftlar, uslublar va statik jadval qatorlari hisobotlar orasida qayta yaratilmaydi"""
+    first, second = PDFGenerator(), PDFGenerator()
+    assert first.resources is second.resources is get_report_resources()
+
+    standards = {'excellent': {'min_score': 70, 'max_score': 93, 'description': "A'lo"}}
+    rows = first.resources.certification_rows(standards)
+    assert rows == [['Daraja', "Ball oralig'i", 'Tavsif'], ['Ajoyib (A)', '70-93', "A'lo"]]
+    rows.append(['boshqa'])
+    assert len(second.resources.certification_rows(standards)) == 2
+
+
+def test_report_charts_cached():
+    """Grafiklar guruhlangan ma'lumotdan chiziladi va aynan shu tahlil uchun keshdan olinadi"""
+    persons = [
+        {'person_index': i, 'eap': theta, 'certification_score': score}
+        for i, (theta, score) in enumerate([(-1.2, 35), (0.1, 58), (0.4, 64), (2.3, 91)], 1)
+    ]
+    items = [{'item_id': f'Item{i}', 'difficulty': b} for i, b in enumerate([-1.0, 0.0, 0.5, 1.5], 1)]
+    results = {'persons': persons, 'items': items}
+
+    wright = wright_map_data(results)
+    assert wright['persons'].sum() == 4 and wright['items'].sum() == 4
+
+    cache = get_result_cache()
+    first = report_charts(results)
+    hits = cache.hits
+    second = report_charts(results)
+    assert [name for name, _ in first] == ['wright', 'information', 'scores']
+    assert second == first and cache.hits == hits + 3
+    assert all(png.startswith(b"\x89PNG") for _, png in first)
+
+
 if __name__ == "__main__":
     test_certification_system()
+    test_large_report_chunks_roster_and_appendix()
+    test_certificates_zip()
+    test_report_resources_shared()
+    test_report_charts_cached()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Javoblarni tozalash va savol ustunlarini aniqlashni tekshirish
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import csv
+import tempfile
+
+import numpy as np
+
+from app.core.cleaning import clean_response_matrix, detect_question_columns
+from app.core.ingest import compact_from_stream, load_columnar, read_csv_compact
+
+
+def _upload(n_rows, n_items=40, seed=3):
+    rng = np.random.default_rng(seed)
+    header = ["Ism", "Fam"] + [f"Q{j}" for j in range(1, n_items + 1)] + ["Jami"]
+    rows = [header]
+    for i in range(n_rows):
+        answers = np.where(rng.random(n_items) < 0.5, "1", "0").tolist()
+        rows.append([f"Ism{i}", f"Fam{i}"] + answers + [str(answers.count("1"))])
+    return rows
+
+
+def test_sampled_detection_matches_full_scan():
+    """Tanlanma bo'yicha aniqlangan ustunlar to'liq skan natijasi bilan bir xil bo'lishi kerak"""
+    rows = _upload(3000)
+    full = detect_question_columns(rows, sample_rows=len(rows))
+    sampled = detect_question_columns(rows, sample_rows=500, head_rows=100)
+
+    assert sampled.sampled and not full.sampled
+    assert sampled.question_columns == full.question_columns == list(range(2, 42))
+    assert sampled.labels[0] == "Q1" and sampled.labels[-1] == "Q40"
+    assert sampled.confidence > 0.95
+
+    cleaned = clean_response_matrix(rows, detection=sampled)
+    assert len(cleaned) == 3000 and len(cleaned[0]) == 40
+    assert cleaned == clean_response_matrix(rows)
+    print(f"✅ Aniqlash: {sampled.describe()}")
+
+
+def test_detection_confidence_drops_for_noisy_columns():
+    """0/1 bo'lmagan qiymatlar ko'p bo'lsa ishonch past bo'lishi kerak"""
+    rows = [["Ism", "Q1", "Q2", "Q3"]] + [["Ali", "1", "0", "?"], ["Vali", "?", "1", "-5"], ["Soli", "0", "ok", "1"]] * 20
+    detection = detect_question_columns(rows)
+    assert detection.question_columns == [1, 2, 3]
+    assert detection.labels == ["Q1", "Q2", "Q3"]
+    assert detection.confidence < 0.8
+
+
+def test_streaming_csv_matches_in_memory_cleaning():
+    """Bo'laklab o'qilgan CSV (qo'shtirnoqli ismlar bilan) xotiradagi tozalash bilan bir xil"""
+    rows = _upload(2500)
+    for i, row in enumerate(rows[1:], start=1):
+        row[1] = f"Valiyev, {i}"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "upload.csv")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write("\n")
+            csv.writer(f).writerows(rows)
+        streamed, detection = read_csv_compact(path, chunk_rows=300, sample_rows=400, head_rows=100)
+
+    expected = clean_response_matrix(rows, compact=True)
+    assert detection.question_columns == list(range(2, 42))
+    assert streamed.shape == expected.shape == (2500, 40)
+    assert np.array_equal(streamed.correct, expected.correct)
+    assert np.array_equal(streamed.observed, expected.observed)
+
+
+def test_single_pass_stream_matches_in_memory_cleaning():
+    """Bir martalik oqim (.xlsx yo'li): ustunlar fayl boshi bo'yicha, natija xotiradagi bilan bir xil"""
+    rows = [("", " ")] + [tuple(row) for row in _upload(2000)]
+    chunks = (rows[i : i + 250] for i in range(0, len(rows), 250))
+    streamed, detection = compact_from_stream(chunks, sample_rows=600)
+
+    expected = clean_response_matrix([list(row) for row in rows], compact=True)
+    assert detection.header_row == 1 and detection.sample_rows == 600 and detection.total_rows == 2000
+    assert np.array_equal(streamed.correct, expected.correct)
+    assert np.array_equal(streamed.observed, expected.observed)
+
+
+def test_npy_upload_skips_cell_normalization():
+    """.npy: sof 0/1 massiv to'g'ridan-to'g'ri, ID ustunli massiv esa ustunlarni aniqlash orqali"""
+    rng = np.random.default_rng(5)
+    answers = (rng.random((300, 40)) < 0.5).astype(float)
+    answers[rng.random(answers.shape) < 0.05] = np.nan
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "upload.npy")
+        np.save(path, answers)
+        binary, detection = load_columnar(path, "npy")
+        np.save(path, np.hstack([np.arange(300)[:, None] + 1000.0, answers]))
+        with_ids, id_detection = load_columnar(path, "npy")
+
+    expected = clean_response_matrix(
+        [[None if np.isnan(v) else v for v in row] for row in answers.tolist()], compact=True
+    )
+    assert detection.question_columns == list(range(40)) and detection.confidence == 1.0
+    assert id_detection.question_columns == list(range(1, 41))
+    for compact in (binary, with_ids):
+        assert np.array_equal(compact.correct, expected.correct)
+        assert np.array_equal(compact.observed, expected.observed)
+
+
+if __name__ == "__main__":
+    test_sampled_detection_matches_full_scan()
+    test_detection_confidence_drops_for_noisy_columns()
+    test_streaming_csv_matches_in_memory_cleaning()
+    test_single_pass_stream_matches_in_memory_cleaning()
+    test_npy_upload_skips_cell_normalization()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+NumPy Rasch baholash (CML + EAP) ni simulyatsiya qilingan ma'lumotlarda tekshirish
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from app.core import estimation
+from app.core.estimation import booklet_matrix, estimate_rasch, eap_scores, fit_statistics, update_calibration
+from app.core.response_matrix import ResponseMatrix
+from app.core.result_cache import ResultCache, matrix_key
+from app.services.scoring import RaschAnalyzer, raw_score_table
+
+
+def _simulate(n_persons=1500, n_items=30, seed=7):
+    rng = np.random.default_rng(seed)
+    theta = rng.normal(0.0, 1.0, n_persons)
+    difficulties = np.linspace(-2.0, 2.0, n_items)
+    prob = 1.0 / (1.0 + np.exp(-(theta[:, None] - difficulties[None, :])))
+    return (rng.random(prob.shape) < prob).astype(float), difficulties
+
+
+def test_numpy_engine_recovers_difficulties():
+    """Qiyinchiliklar simulyatsiya parametrlariga yaqin bo'lishi kerak"""
+    matrix, difficulties = _simulate()
+    result = estimate_rasch(matrix)
+
+    estimated = np.array([item['difficulty'] for item in result['items']])
+    assert np.corrcoef(estimated, difficulties)[0, 1] > 0.99
+    assert abs(result['items'][0]['discrimination'] - 1.0) < 0.15
+    assert len(result['persons']) == matrix.shape[0]
+    assert result['fit']['AIC'] > -2 * result['fit']['logLik']
+    print(f"✅ CML: r = {np.corrcoef(estimated, difficulties)[0, 1]:.4f}")
+
+
+def test_eap_ignores_missing_responses():
+    """Yo'q javoblar (None) ball va standart xatoga ta'sir qilmasligi kerak"""
+    difficulties = [-1.0, 0.0, 1.0]
+    eap, sd = eap_scores([[1, 0, None], [1, 0, 1], [None, None, None]], difficulties)
+    eap_two, sd_two = eap_scores([[1, 0]], difficulties[:2])
+
+    assert np.isclose(eap[0], eap_two[0]) and np.isclose(sd[0], sd_two[0])
+    assert eap[1] > eap[0]
+    assert np.isclose(eap[2], 0.0) and np.isclose(sd[2], 1.0)
+
+
+def test_raw_score_table_matches_eap():
+    """To'liq javoblar uchun jadvaldagi qiymatlar to'g'ridan-to'g'ri EAP bilan bir xil"""
+    matrix, difficulties = _simulate(n_persons=200, n_items=12)
+    table = raw_score_table(difficulties.tolist())
+    eap, sd = eap_scores(matrix, difficulties, collapse=False)
+    raw = matrix.sum(axis=1).astype(int)
+
+    assert np.allclose(table['theta'][raw], eap) and np.allclose(table['theta_se'][raw], sd)
+    assert raw_score_table(difficulties.tolist()) is table
+
+
+def test_incremental_calibration_matches_full_fit():
+    """Ikki to'lqinni ketma-ket qo'shish butun matritsani bir marta baholash bilan bir xil"""
+    matrix, _ = _simulate(n_persons=800, n_items=15)
+    _, state = update_calibration(matrix[:500])
+    result, state = update_calibration(matrix[500:], state)
+    full = estimate_rasch(matrix)
+
+    incremental = np.array([item['difficulty'] for item in result['items']])
+    reference = np.array([item['difficulty'] for item in full['items']])
+    assert np.allclose(incremental, reference, atol=1e-5)
+    assert result['fit']['n_obs'] == 800 and len(result['persons']) == 300
+
+
+def test_sparse_booklet_matches_dense():
+    """Booklet dizayni: siyrak va NaN li zich matritsa bir xil natija beradi"""
+    matrix, _ = _simulate(n_persons=900, n_items=24)
+    booklet = np.arange(matrix.shape[0]) % 3
+    for b in range(3):
+        # Har bir booklet: 8 ta umumiy savol + o'zining 8 ta savoli
+        hidden = np.ones(24, dtype=bool)
+        hidden[:8] = False
+        hidden[8 + 8 * b: 16 + 8 * b] = False
+        matrix[np.ix_(booklet == b, hidden)] = np.nan
+
+    rows, cols = np.nonzero(~np.isnan(matrix))
+    sparse_result = estimate_rasch(booklet_matrix(rows, cols, matrix[rows, cols], shape=matrix.shape))
+    dense_result = estimate_rasch(matrix)
+
+    for key in ('items', 'persons'):
+        field = 'difficulty' if key == 'items' else 'eap'
+        a = np.array([entry[field] for entry in sparse_result[key]])
+        b = np.array([entry[field] for entry in dense_result[key]])
+        assert np.allclose(a, b, atol=1e-6)
+
+
+def test_response_matrix_matches_dense():
+    """Bitlarga joylangan ResponseMatrix zich massiv bilan bir xil natija beradi"""
+    matrix, _ = _simulate(n_persons=600, n_items=20)
+    matrix[::7, 3] = np.nan
+    compact = ResponseMatrix.from_rows(
+        [None if np.isnan(v) else int(v) for v in row] for row in matrix
+    )
+
+    assert compact.nbytes == 2 * 600 * 3
+    assert np.array_equal(np.isnan(np.asarray(compact)), np.isnan(matrix))
+    a = np.array([p['eap'] for p in estimate_rasch(compact)['persons']])
+    b = np.array([p['eap'] for p in estimate_rasch(matrix)['persons']])
+    assert np.allclose(a, b)
+
+
+def test_result_cache_shares_list_and_compact_matrices():
+    """Bir xil javoblar ro'yxat yoki ixcham ko'rinishda kelsa ham keshdan olinadi, disk qavati ham ishlaydi"""
+    import tempfile
+
+    matrix, _ = _simulate(n_persons=300, n_items=12)
+    matrix[::5, 2] = np.nan
+    rows = [[None if np.isnan(v) else int(v) for v in row] for row in matrix]
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return estimate_rasch(matrix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(directory=tmp, disk_bytes=1e6)
+        first = cache.result(matrix_key(rows, engine="numpy"), compute)
+        second = cache.result(matrix_key(ResponseMatrix.from_rows(rows), engine="numpy"), compute)
+        from_disk = ResultCache(directory=tmp, disk_bytes=1e6).result(matrix_key(matrix, engine="numpy"), compute)
+
+    assert len(calls) == 1
+    assert second['items'] == first['items'] and from_disk['items'] == first['items']
+    assert matrix_key(rows, engine="numpy") != matrix_key(rows, engine="r")
+
+
+def test_cached_analysis_gets_fresh_timestamp(monkeypatch):
+    """Keshga vaqtsiz natija yoziladi: qayta so'rov yangi 'timestamp' oladi, PDF keshi kaliti o'zgarmaydi"""
+    import json
+
+    from app.core import result_cache
+    from app.core.result_cache import result_digest
+    from app.services.executor import analyze_matrix
+
+    cache = ResultCache(directory=None)
+    monkeypatch.setattr(result_cache, "_cache", cache)
+    matrix, _ = _simulate(n_persons=200, n_items=10)
+    rows = matrix.astype(int).tolist()
+
+    first = analyze_matrix(rows)
+    stored = json.loads(cache.get("json", matrix_key(rows, analyzer="RaschAnalyzer")))
+    second = analyze_matrix(rows)
+
+    assert 'timestamp' not in stored
+    assert first['timestamp'] <= second['timestamp'] and second is not first
+    assert result_digest(first) == result_digest(second)
+
+    # PDF keshi: chizish parametrlari berilganda ham kalit 'timestamp' ga bog'liq emas
+    renders = []
+
+    def render(result, **options):
+        renders.append(options)
+        return b"%PDF"
+
+    for result in (first, second):
+        cache.pdf(result, render)
+        cache.pdf(result, render, roster_appendix=False)
+    assert renders == [{}, {'roster_appendix': False}]
+
+
+def test_fit_statistics_flag_misfit_and_ignore_chunking():
+    """Modelga mos savollarda MNSQ ~ 1, tasodifiy savol ajralib chiqadi; bo'laklash natijani o'zgartirmaydi"""
+    matrix, difficulties = _simulate(n_persons=2000, n_items=20)
+    rng = np.random.default_rng(3)
+    matrix[:, 4] = rng.random(matrix.shape[0]) < 0.5
+    matrix[rng.random(matrix.shape) < 0.1] = np.nan
+    theta = np.array([p['eap'] for p in estimate_rasch(matrix)['persons']])
+
+    stats = fit_statistics(matrix, difficulties, theta)
+    infit = stats['items']['infit']
+    assert infit[4] > 1.5 and stats['items']['infit_zstd'][4] > 3
+    assert np.all(np.abs(np.delete(infit, 4) - 1.0) < 0.2)
+
+    chunk = estimation._FIT_CHUNK
+    estimation._FIT_CHUNK = 128
+    try:
+        chunked = fit_statistics(ResponseMatrix.from_dense(matrix), difficulties, theta)
+    finally:
+        estimation._FIT_CHUNK = chunk
+    for key in ('items', 'persons'):
+        for name, values in stats[key].items():
+            assert np.allclose(chunked[key][name], values, equal_nan=True)
+
+
+def test_analyzer_fit_is_computed():
+    """RaschAnalyzer moslik ko'rsatkichlari ma'lumotdan hisoblanadi (qattiq yozilgan qiymatlar emas)"""
+    matrix, _ = _simulate(n_persons=200, n_items=10)
+    first = RaschAnalyzer().analyze_response_matrix(matrix.astype(int).tolist())
+    second = RaschAnalyzer().analyze_response_matrix(matrix[:100].astype(int).tolist())
+    assert first['fit']['logLik'] != second['fit']['logLik']
+    assert abs(first['fit']['AIC'] - (-2 * first['fit']['logLik'] + 2 * 10)) < 1e-5
+    assert {'infit', 'outfit', 'infit_zstd', 'outfit_zstd'} <= set(first['items'][0]) & set(first['persons'][0])
+
+
+def test_r_fit_statistics_use_r_discrimination():
+    """R natijasidagi umumiy diskriminatsiya (Dscrmn) infit/outfit da ishlatiladi"""
+    from app.core.engine import _with_fit_statistics
+
+    matrix, difficulties = _simulate(n_persons=500, n_items=12)
+    theta = np.random.default_rng(5).normal(0.0, 1.0, matrix.shape[0])
+    a = 1.7
+    result = {
+        'items': [{'item_id': f'Item{j + 1}', 'difficulty': float(b), 'discrimination': a} for j, b in enumerate(difficulties)],
+        'persons': [{'person_index': i + 1, 'eap': float(t), 'se': 0.5} for i, t in enumerate(theta)],
+    }
+    _with_fit_statistics(result, matrix)
+
+    expected = fit_statistics(matrix, difficulties, theta, discrimination=a)
+    unit = fit_statistics(matrix, difficulties, theta, discrimination=1.0)
+    outfit = np.array([item['outfit'] for item in result['items']])
+    assert np.allclose(outfit, np.round(expected['items']['outfit'], 4))
+    assert not np.allclose(outfit, np.round(unit['items']['outfit'], 4))
+
+    # Diskriminatsiyasiz (eski R chiqishi) — statistikalar qo'shilmaydi
+    legacy = {'items': [{'difficulty': 0.0}] * 12, 'persons': [{'eap': 0.0}] * matrix.shape[0]}
+    assert 'infit' not in _with_fit_statistics(legacy, matrix)['items'][0]
+
+
+def test_add_wave_fits_outside_lock_and_remerges():
+    """To'lqin baholanayotganda boshqa yozuvchi bloklanmaydi; oraliqda qo'shilgan to'lqin qayta birlashtiriladi"""
+    import tempfile
+    from app.services import item_bank
+
+    matrix, _ = _simulate(n_persons=400, n_items=10)
+    first_wave, second_wave = matrix[:200], matrix[200:]
+    with tempfile.TemporaryDirectory() as tmp:
+        bank = item_bank.ItemBank(os.path.join(tmp, "bank.sqlite3"))
+        bank.save_calibration("2024-A", estimate_rasch(first_wave), engine="numpy")
+
+        fit = item_bank.update_calibration
+        calls = []
+
+        def concurrent_fit(wave, previous):
+            calls.append(previous)
+            if len(calls) == 1:
+                # Baholash paytida boshqa so'rov shu imtihonga to'lqin qo'shadi (qulf ushlanmagan)
+                bank.add_wave("2024-A", second_wave)
+            return fit(wave, previous)
+
+        item_bank.update_calibration = concurrent_fit
+        try:
+            result = bank.add_wave("2024-A", first_wave)
+        finally:
+            item_bank.update_calibration = fit
+
+        assert calls[0] is None and calls[-1] is not None
+        assert result['exam'] == {'exam_id': '2024-A', 'form_id': 'exam:2024-A', 'n_waves': 2, 'n_persons': 400}
+        # Oddiy shakl to'lqinlar bilan almashtirilmaydi
+        assert bank.load_calibration("2024-A")['n_persons'] == 200
+        assert bank.load_calibration("exam:2024-A") is not None
+
+
+if __name__ == "__main__":
+    test_numpy_engine_recovers_difficulties()
+    test_eap_ignores_missing_responses()
+    test_raw_score_table_matches_eap()
+    test_incremental_calibration_matches_full_fit()
+    test_sparse_booklet_matches_dense()
+    test_response_matrix_matches_dense()
+    test_result_cache_shares_list_and_compact_matrices()
+    test_fit_statistics_flag_misfit_and_ignore_chunking()
+    test_analyzer_fit_is_computed()
+    test_r_fit_statistics_use_r_discrimination()
+    test_add_wave_fits_outside_lock_and_remerges()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Fon ishlari API sini (POST /jobs, GET /jobs/{id}, GET /jobs/{id}/result) tekshirish
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.artifacts import ArtifactStore
+
+
+def _wait(client, job_id, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] in ("done", "failed"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Ish {timeout} soniyada tugamadi")
+
+
+def test_job_result_matches_sync_calculate():
+    """Fon ishi natijasi /calculate bilan bir xil, xato esa ish holatida qaytadi"""
+    rng = np.random.default_rng(11)
+    responses = (rng.random((150, 15)) < 0.55).astype(int).tolist()
+    client = TestClient(app)
+
+    submitted = client.post("/jobs?engine=numpy", json={"responses": responses})
+    assert submitted.status_code == 202
+    status = _wait(client, submitted.json()["job_id"])
+    assert status["status"] == "done" and status["progress"] == 1.0
+    assert [stage["name"] for stage in status["stages"]] == ["cleaning", "estimation"]
+
+    result = client.get(f"/jobs/{status['job_id']}/result").json()
+    expected = client.post("/calculate?engine=numpy", json={"responses": responses}).json()
+    assert [item["difficulty"] for item in result["items"]] == [item["difficulty"] for item in expected["items"]]
+
+    failed = client.post("/jobs?engine=numpy", json={"responses": [["a", "b"], ["c", "d"]]}).json()
+    assert _wait(client, failed["job_id"])["status"] == "failed"
+    assert client.get(f"/jobs/{failed['job_id']}/result").status_code == 400
+    assert client.get("/jobs/yoq").status_code == 404
+
+
+def test_artifact_store_keeps_jobs_apart_and_expires():
+    """Har bir ish o'z papkasida saqlanadi, muddati o'tganlari tozalanadi"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArtifactStore(tmp, ttl=60)
+        store.save("job1", {"report.pdf": b"%PDF-1"})
+        store.save("job2", {"report.pdf": b"%PDF-2"})
+        assert store.load("job1", "report.pdf") == b"%PDF-1"
+        assert store.load("job2", "report.pdf") == b"%PDF-2"
+
+        old = time.time() - 120
+        os.utime(os.path.join(tmp, "job1"), (old, old))
+        assert store.load("job1", "report.pdf") is None
+        assert store.cleanup(force=True) == 1
+        assert sorted(os.listdir(tmp)) == ["job2"]
+
+
+def test_npy_upload_supports_anchors():
+    """Ustunli yuklama /calculate kabi qotirilgan qiyinchiliklar bilan baholanadi"""
+    import io
+
+    rng = np.random.default_rng(13)
+    matrix = (rng.random((120, 5)) < 0.6).astype(np.int8)
+    buffer = io.BytesIO()
+    np.save(buffer, matrix)
+    client = TestClient(app)
+    anchors = [-1.0, -0.5, 0.0, 0.5, 1.0]
+
+    query = "&".join(f"anchor_difficulties={b}" for b in anchors)
+    uploaded = client.post(
+        f"/calculate/upload?engine=numpy&anchor_discrimination=1.2&{query}",
+        files={"file": ("matrix.npy", buffer.getvalue())},
+    )
+    assert uploaded.status_code == 200
+    items = uploaded.json()["items"]
+    assert [item["difficulty"] for item in items] == anchors and items[0]["discrimination"] == 1.2
+
+    expected = client.post(
+        "/calculate?engine=numpy",
+        json={"responses": matrix.tolist(), "anchor_difficulties": anchors, "anchor_discrimination": 1.2},
+    ).json()
+    assert [p["eap"] for p in uploaded.json()["persons"]] == [p["eap"] for p in expected["persons"]]
+
+
+def test_upload_reports_only_missing_dependency_as_501():
+    """501 faqat ixtiyoriy kutubxona yo'qligida; boshqa o'qish xatolari — 400"""
+    import app.main as api
+    from app.core.ingest import MissingDependencyError
+
+    client = TestClient(app)
+    saved = api.load_columnar
+    try:
+        for error, status in ((MissingDependencyError("pyarrow o'rnatilmagan"), 501), (RuntimeError("buzuq fayl"), 400)):
+            def failing(path, fmt, error=error):
+                raise error
+
+            api.load_columnar = failing
+            response = client.post("/calculate/upload?engine=numpy", files={"file": ("matrix.parquet", b"PAR1")})
+            assert response.status_code == status
+    finally:
+        api.load_columnar = saved
+
+
+def test_api_pdf_keeps_full_roster():
+    """API PDF ro'yxatni ilovaga chiqarmaydi (mijoz ilovani alohida olmaydi): to'liq jadvalli hisobot bilan bir xil"""
+    from datetime import datetime
+
+    from reportlab import rl_config
+
+    from app.core import result_cache
+    from app.services import pdf_generator
+
+    class FixedTime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2026, 1, 1, 12, 0, 0)
+
+    # Qo'lda almashtiriladi (pytest siz ham ishga tushishi uchun): PDF sanasi va ID qotiriladi, kesh yangi
+    saved = (pdf_generator.ROSTER_APPENDIX_PERSONS, pdf_generator.datetime, rl_config.invariant, result_cache._cache)
+    pdf_generator.ROSTER_APPENDIX_PERSONS = 20
+    pdf_generator.datetime = FixedTime
+    rl_config.invariant = 1
+    result_cache._cache = result_cache.ResultCache(directory=None)
+    try:
+        rng = np.random.default_rng(5)
+        responses = (rng.random((120, 12)) < 0.5).astype(int).tolist()
+        client = TestClient(app)
+
+        result = client.post("/calculate?engine=numpy", json={"responses": responses}).json()
+        assert pdf_generator.needs_roster_appendix(result)
+        pdf = client.post("/calculate?engine=numpy&format=pdf", json={"responses": responses})
+        assert pdf.status_code == 200
+
+        generator = pdf_generator.PDFGenerator()
+        assert pdf.content == generator.generate_rasch_report(result, roster_appendix=False)
+        assert pdf.content != generator.generate_rasch_report(result, roster_appendix=True)
+    finally:
+        (pdf_generator.ROSTER_APPENDIX_PERSONS, pdf_generator.datetime,
+         rl_config.invariant, result_cache._cache) = saved
+
+
+if __name__ == "__main__":
+    test_job_result_matches_sync_calculate()
+    test_artifact_store_keeps_jobs_apart_and_expires()
+    test_npy_upload_supports_anchors()
+    test_upload_reports_only_missing_dependency_as_501()
+    test_api_pdf_keeps_full_roster()
+    print("✅ Fon ishlari testi o'tdi")
+
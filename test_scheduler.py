@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Bot ishlari uchun adolatli navbatni tekshirish
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+
+from app.services.scheduler import FairScheduler, QueueFullError, send_queue_note
+
+
+def test_round_robin_between_chats_and_per_chat_limit():
+    """Bir chat ko'p ish yuborsa ham boshqa chatlar har aylanishda navbat oladi"""
+    async def scenario():
+        scheduler = FairScheduler(concurrency=1, max_per_chat=3)
+        tickets = [("A", scheduler.submit("A", 1000)) for _ in range(3)]
+        try:
+            scheduler.submit("A", 1000)
+            raise AssertionError("QueueFullError kutilgan edi")
+        except QueueFullError:
+            pass
+        tickets += [("B", scheduler.submit("B", 1000)) for _ in range(2)]
+        tickets.append(("C", scheduler.submit("C", 1000)))
+        positions = [ticket.position() for _, ticket in tickets]
+        etas = [ticket.eta() for _, ticket in tickets]
+
+        order = []
+
+        async def job(chat_id, ticket):
+            async with ticket:
+                order.append(chat_id)
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(job(chat_id, ticket) for chat_id, ticket in tickets))
+        return scheduler, positions, etas, order
+
+    scheduler, positions, etas, order = asyncio.run(scenario())
+    assert order == ["A", "A", "B", "C", "A", "B"]
+    assert positions == [0, 1, 4, 2, 5, 3]
+    assert sorted(etas[1:]) == [etas[i] for i in (1, 3, 5, 2, 4)]
+    assert scheduler.pending == 0 and scheduler.running == 0
+
+
+
+def test_failed_queue_note_releases_ticket():
+    """Navbat xabari yuborilmasa ish navbatdan olinadi: o'rin va chat hisobi bo'shaydi"""
+    async def scenario():
+        scheduler = FairScheduler(concurrency=1, max_per_chat=1)
+        running = scheduler.submit("A", 1000)
+        waiting = scheduler.submit("B", 1000)
+
+        async def reply(text):
+            raise ConnectionError("Telegram javob bermadi")
+
+        try:
+            await send_queue_note(waiting, reply)
+            raise AssertionError("ConnectionError kutilgan edi")
+        except ConnectionError:
+            pass
+        async with running:
+            pass
+        # Chat B yana ish yubora oladi va u darhol boshlanadi
+        again = scheduler.submit("B", 1000)
+        return scheduler, again
+
+    scheduler, again = asyncio.run(scenario())
+    assert again.started and scheduler.pending == 0 and scheduler.running == 1
+
+
+if __name__ == "__main__":
+    test_round_robin_between_chats_and_per_chat_limit()
+    test_failed_queue_note_releases_ticket()
+    print("✅ Navbat testi o'tdi")